@@ -0,0 +1,276 @@
+"""Offline benchmarks for the covers2colors palette pipeline.
+
+Each stage of palette generation is timed on synthetic covers and on the
+sample images bundled in ``images/`` at several resolutions:
+
+* ``decode`` - decoding an encoded cover into ``CoverPalette.pixels``
+* ``sweep`` - fitting every k used by ``generate_optimal_cmap``
+* ``adaptive`` - the adaptive k search including its knee detection
+* ``knee`` - locating the elbow of the SSD curve
+* ``distinct`` - selecting distinct colors from every candidate colormap
+* ``cvd`` - checking the selected palette for color-blind friendliness
+* ``save``/``list`` - writing to and paginating ``index.json`` at several sizes
+
+Results include wall time, throughput and peak traced memory and are written
+as JSON so runs from different commits can be compared::
+
+    python benchmarks/bench_pipeline.py -o before.json
+    python benchmarks/bench_pipeline.py -o after.json --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from kneed import KneeLocator
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import covers2colors  # noqa: E402
+from covers2colors import convert  # noqa: E402
+from covers2colors.colorblind import is_colorblind_friendly  # noqa: E402
+from covers2colors.convert import CoverPalette  # noqa: E402
+
+RESOLUTIONS = (250, 500, 1000)
+INDEX_SIZES = (1_000, 10_000, 100_000)
+
+
+def synthetic_cover(size: int, n_regions: int = 6, seed: int = 0) -> Image.Image:
+    """Return a ``size`` x ``size`` cover made of noisy color regions and a gradient."""
+
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, size=(n_regions, 3))
+    yy, xx = np.mgrid[0:size, 0:size]
+    region = ((xx * n_regions) // size + (yy * 2) // size) % n_regions
+    pixels = base[region].astype(np.float64)
+    pixels += (xx / size * 40)[..., None]
+    pixels += rng.normal(0, 12, size=pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+
+
+def sample_covers(resolutions=RESOLUTIONS):
+    """Yield ``(name, PIL image)`` pairs of synthetic and bundled covers."""
+
+    for size in resolutions:
+        yield f"synthetic-{size}", synthetic_cover(size)
+    for path in sorted((ROOT / "images").glob("*.png")):
+        with Image.open(path) as img:
+            img = img.convert("RGB")
+        for size in resolutions:
+            resized = img.copy()
+            resized.thumbnail((size, size))
+            yield f"{path.stem}-{size}", resized
+
+
+def measure(func, repeat: int = 1):
+    """Run ``func`` ``repeat`` times and return ``(result, best seconds, peak bytes)``.
+
+    tracemalloc slows allocation-heavy code by different amounts per stage,
+    so the timed runs are untraced and the peak comes from one more run
+    under tracemalloc.
+    """
+
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def record(results, stage, name, seconds, peak, items=None, unit=None, **extra):
+    entry = {
+        "stage": stage,
+        "case": name,
+        "seconds": seconds,
+        "peak_bytes": peak,
+    }
+    if items is not None:
+        entry["throughput"] = items / seconds if seconds else None
+        entry["unit"] = f"{unit}/s"
+    entry.update(extra)
+    results.append(entry)
+    rate = f" {entry['throughput']:.3g} {entry['unit']}" if items is not None else ""
+    print(f"{stage:>9} {name:<32} {seconds * 1000:10.2f} ms {peak / 2**20:8.2f} MiB{rate}")
+
+
+def bench_cover(results, name, image, max_colors, n_distinct, random_state, repeat):
+    encoded = io.BytesIO()
+    image.save(encoded, "PNG")
+    data = encoded.getvalue()
+
+    palette, seconds, peak = measure(
+        lambda: CoverPalette.from_image(Image.open(io.BytesIO(data)), "bench", name), repeat
+    )
+    n_pixels = palette.n_pixels
+    record(results, "decode", name, seconds, peak, n_pixels, "pixels", pixels=n_pixels)
+
+    def sweep():
+        cmaps, ssd = {}, {}
+        for k in range(2, max_colors + 1):
+            cmaps[k] = palette.generate_cmap(n_colors=k, random_state=random_state)
+            ssd[k] = palette.inertia
+        return cmaps, ssd
+
+    (cmaps, ssd), seconds, peak = measure(sweep, repeat)
+    record(
+        results, "sweep", name, seconds, peak, n_pixels * (max_colors - 1), "pixel-fits",
+        pixels=n_pixels, max_colors=max_colors,
+    )
+
+    _, seconds, peak = measure(
+        lambda: palette.generate_optimal_cmap(max_colors, random_state=random_state, search="adaptive"),
+        repeat,
+    )
+    record(
+        results, "adaptive", name, seconds, peak, n_pixels * len(palette.fitted_k), "pixel-fits",
+        pixels=n_pixels, fitted_k=palette.fitted_k,
+    )
+
+    knee, seconds, peak = measure(
+        lambda: KneeLocator(
+            list(ssd.keys()), list(ssd.values()), curve="convex", direction="decreasing"
+        ).knee,
+        repeat,
+    )
+    knee = int(knee) if knee is not None else None
+    record(results, "knee", name, seconds, peak, 1, "curves", knee=knee)
+
+    def distinct():
+        chosen = None
+        for cmap in cmaps.values():
+            if len(cmap.colors) >= n_distinct:
+                chosen, _ = palette.get_distinct_colors(cmap, n_distinct)
+        return chosen
+
+    colors, seconds, peak = measure(distinct, repeat)
+    record(results, "distinct", name, seconds, peak, len(cmaps), "colormaps")
+
+    n_checks = 1000
+    _, seconds, peak = measure(
+        lambda: [is_colorblind_friendly(colors) for _ in range(n_checks)], repeat
+    )
+    record(results, "cvd", name, seconds, peak, n_checks, "checks")
+
+
+@contextlib.contextmanager
+def palette_dir(path: Path):
+    """Temporarily point the palette store at ``path``."""
+
+    saved = (convert.PALETTE_DIR, convert.INDEX_FILE, convert.PREVIEW_DIR)
+    convert.PALETTE_DIR = path
+    convert.INDEX_FILE = path / "index.json"
+    convert.PREVIEW_DIR = path / "previews"
+    try:
+        yield
+    finally:
+        convert.PALETTE_DIR, convert.INDEX_FILE, convert.PREVIEW_DIR = saved
+
+
+def bench_index(results, sizes, repeat):
+    palette = CoverPalette.from_image(synthetic_cover(64), "bench", "index")
+    palette.hexcodes = ["#112233", "#445566", "#778899", "#aabbcc"]
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp, palette_dir(Path(tmp)):
+            entries = [
+                {
+                    "id": i + 1,
+                    "artist": f"artist {i}",
+                    "album": f"album {i}",
+                    "n_colors": 4,
+                    "image_url": f"https://example.com/{i}.jpg",
+                    "hexcodes": palette.hexcodes,
+                    "path": None,
+                }
+                for i in range(size)
+            ]
+            convert._ensure_palette_dir()
+            with convert.INDEX_FILE.open("w") as f:
+                json.dump(entries, f, indent=2)
+
+            _, seconds, peak = measure(palette.save_palette, repeat)
+            record(results, "save", f"index-{size}", seconds, peak, 1, "palettes", index_size=size)
+
+            _, seconds, peak = measure(lambda: CoverPalette.list_palettes(page=2), repeat)
+            record(results, "list", f"index-{size}", seconds, peak, 1, "pages", index_size=size)
+
+
+def environment() -> dict:
+    import sklearn
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=False
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "covers2colors": covers2colors.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r") as f:
+        baseline = {(r["stage"], r["case"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for entry in results:
+        old = baseline.get((entry["stage"], entry["case"]))
+        if not old:
+            continue
+        ratio = entry["seconds"] / old["seconds"] if old["seconds"] else float("nan")
+        print(f"{entry['stage']:>9} {entry['case']:<32} {ratio:6.2f}x time")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-o", "--output", default="bench_results.json", help="JSON output path")
+    parser.add_argument("--resolutions", type=int, nargs="+", default=list(RESOLUTIONS))
+    parser.add_argument("--index-sizes", type=int, nargs="+", default=list(INDEX_SIZES))
+    parser.add_argument("--max-colors", type=int, default=10)
+    parser.add_argument("--n-colors", type=int, default=4)
+    parser.add_argument("--random-state", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Repetitions per stage (best is kept)")
+    parser.add_argument("--compare", metavar="JSON", help="Previous results to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, image in sample_covers(args.resolutions):
+        bench_cover(
+            results, name, image, args.max_colors, args.n_colors, args.random_state, args.repeat
+        )
+    bench_index(results, args.index_sizes, args.repeat)
+
+    output = {"environment": environment(), "parameters": vars(args), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
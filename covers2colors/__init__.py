@@ -1,14 +1,79 @@
-from typing import Optional
+import importlib
+from typing import TYPE_CHECKING, Optional
 
-from .convert import CoverPalette
-from .album_art import get_best_cover_art_url
-from .colorblind import is_colorblind_friendly
+if TYPE_CHECKING:
+    from .aggregate import PaletteAggregator
+    from .aio import set_executors
+    from .album_art import get_best_cover_art_url
+    from .batch import run_batch
+    from .cache import ResultCache
+    from .colorblind import is_colorblind_friendly
+    from .convert import CoverPalette
+    from .library import export_library, load_library
+    from .profiling import Tracer
 
+# Public names and their modules. They are imported on first access so that
+# ``coverpalette --server`` does not load scikit-learn, scipy and matplotlib.
+_EXPORTS = {
+    "CoverPalette": "convert",
+    "get_best_cover_art_url": "album_art",
+    "is_colorblind_friendly": "colorblind",
+    "Tracer": "profiling",
+    "ResultCache": "cache",
+    "PaletteAggregator": "aggregate",
+    "run_batch": "batch",
+    "set_executors": "aio",
+    "export_library": "library",
+    "load_library": "library",
+}
 
-def get_cmap(artist: str, album: str, n_colors: int = 4, random_state: Optional[int] = None):
-    """Return a colormap for ``artist`` and ``album`` in a single call."""
 
-    palette = CoverPalette(artist, album)
-    return palette.generate_cmap(n_colors=n_colors, random_state=random_state)
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+def get_cmap(
+    artist: str,
+    album: str,
+    n_colors: int = 4,
+    random_state: Optional[int] = None,
+    cache: Optional["ResultCache"] = None,
+    space: str = "rgb",
+):
+    """Return a colormap for ``artist`` and ``album`` in a single call.
+
+    Seeded results are reused from ``cache`` when one is given. ``space``
+    selects the color space used for clustering (``"rgb"``, ``"lab"`` or
+    ``"oklab"``).
+    """
+
+    from .convert import CoverPalette
+
+    palette = CoverPalette(artist, album, cache=cache)
+    return palette.generate_cmap(n_colors=n_colors, random_state=random_state, space=space)
+
+
+async def aget_cmap(
+    artist: str,
+    album: str,
+    n_colors: int = 4,
+    random_state: Optional[int] = None,
+    cache: Optional["ResultCache"] = None,
+    space: str = "rgb",
+):
+    """Async :func:`get_cmap` that does not block the event loop."""
+
+    from .convert import CoverPalette
+
+    palette = await CoverPalette.acreate(artist, album, cache=cache)
+    return await palette.agenerate_cmap(n_colors=n_colors, random_state=random_state, space=space)
 
 __version__ = "0.1"
@@ -0,0 +1,156 @@
+"""Combined palettes for many covers, e.g. a whole discography.
+
+:class:`PaletteAggregator` keeps one running color histogram for every cover
+that was added. Each cover contributes either its compact color histogram
+(see :class:`covers2colors.streaming.ColorHistogram`) or a handful of
+weighted centroids and is stored sparsely, so covers can be added and removed
+in any order without touching the others. The combined palette is a weighted
+k-means over the occupied bins, which costs the same whether the histogram
+was built from two covers or two thousand::
+
+    aggregator = PaletteAggregator()
+    for album in albums:
+        aggregator.add_palette(album, CoverPalette("Nirvana", album))
+    cmap = aggregator.generate_cmap(n_colors=6, random_state=0)
+"""
+
+import threading
+from typing import Hashable, Optional
+
+import matplotlib as mpl
+import numpy as np
+from sklearn.cluster import KMeans
+
+from .colorspace import SPACES, from_space, to_space
+from .convert import CoverPalette
+from .streaming import DEFAULT_BITS, ColorHistogram
+
+
+class PaletteAggregator:
+    """Incrementally merged color statistics of many covers.
+
+    Parameters
+    ----------
+    bits : int, optional
+        Bits per channel of the combined histogram. Defaults to 6.
+    normalize : bool, optional
+        Give every cover the same total weight so large scans do not dominate
+        the combined palette. Defaults to ``True``.
+    """
+
+    def __init__(self, bits: int = DEFAULT_BITS, normalize: bool = True):
+        self.bits = bits
+        self.normalize = normalize
+        n_bins = 1 << (3 * bits)
+        self.weights = np.zeros(n_bins, dtype=np.float64)
+        self.sums = np.zeros((n_bins, 3), dtype=np.float64)
+        self.hexcodes = None
+        self._covers = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._covers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._covers
+
+    def _bin(self, points: np.ndarray, weights: np.ndarray):
+        """Group 0-255 RGB ``points`` into sparse ``(bins, weights, sums)``."""
+
+        q = np.clip(points, 0, 255).astype(np.intp) >> (8 - self.bits)
+        idx = (q[:, 0] << (2 * self.bits)) | (q[:, 1] << self.bits) | q[:, 2]
+        bins, inverse = np.unique(idx, return_inverse=True)
+        binned = np.bincount(inverse, weights=weights)
+        sums = np.stack(
+            [np.bincount(inverse, weights=weights * points[:, c]) for c in range(3)], axis=1
+        )
+        return bins, binned, sums
+
+    def _add(self, key: Hashable, bins: np.ndarray, weights: np.ndarray, sums: np.ndarray) -> None:
+        total = weights.sum()
+        if total <= 0:
+            raise ValueError(f"Cover {key!r} has no pixels")
+        if self.normalize:
+            weights = weights / total
+            sums = sums / total
+        with self._lock:
+            if key in self._covers:
+                self._remove(key)
+            self._covers[key] = (bins, weights, sums)
+            self.weights[bins] += weights
+            self.sums[bins] += sums
+
+    def add_centroids(self, key: Hashable, centroids, weights=None) -> None:
+        """Add a cover described by 0-255 RGB ``centroids`` and their pixel ``weights``.
+
+        Without ``weights`` every centroid counts equally.
+        """
+
+        points = np.asarray(centroids, dtype=np.float64)[:, :3]
+        weights = np.ones(len(points)) if weights is None else np.asarray(weights, dtype=np.float64)
+        self._add(key, *self._bin(points, weights))
+
+    def add_histogram(self, key: Hashable, histogram: ColorHistogram) -> None:
+        """Add a cover from its :class:`~covers2colors.streaming.ColorHistogram`."""
+
+        if histogram.bits == self.bits:
+            bins = np.flatnonzero(histogram.counts)
+            self._add(key, bins, histogram.counts[bins].astype(np.float64), histogram.sums[bins].copy())
+        else:
+            means, counts = histogram.weighted_means()
+            self._add(key, *self._bin(means, counts.astype(np.float64)))
+
+    def add_palette(self, key: Hashable, palette) -> None:
+        """Add the cover of a :class:`~covers2colors.convert.CoverPalette`."""
+
+        self.add_histogram(key, palette.color_histogram(self.bits))
+
+    def _remove(self, key: Hashable) -> None:
+        bins, weights, sums = self._covers.pop(key)
+        self.weights[bins] -= weights
+        self.sums[bins] -= sums
+        # Clear rounding residue so emptied bins are not clustered
+        empty = bins[self.weights[bins] <= 1e-12]
+        self.weights[empty] = 0
+        self.sums[empty] = 0
+
+    def remove(self, key: Hashable) -> bool:
+        """Remove the cover added as ``key``. Returns ``False`` if it is unknown."""
+
+        with self._lock:
+            if key not in self._covers:
+                return False
+            self._remove(key)
+            return True
+
+    def weighted_means(self):
+        """Return ``(means, weights)`` of the occupied bins of all covers."""
+
+        with self._lock:
+            occupied = np.flatnonzero(self.weights)
+            weights = self.weights[occupied].copy()
+            return self.sums[occupied] / weights[:, None], weights
+
+    def generate_cmap(
+        self,
+        n_colors: int = 4,
+        palette_name: Optional[str] = None,
+        random_state: Optional[int] = None,
+        space: str = "rgb",
+    ):
+        """Return a ListedColormap of ``n_colors`` summarizing every added cover.
+
+        ``space`` selects the color space the bins are clustered in, see
+        :meth:`covers2colors.convert.CoverPalette.generate_cmap`.
+        """
+
+        if space not in SPACES:
+            raise ValueError(f"Unknown color space: {space}")
+        means, weights = self.weighted_means()
+        if len(means) == 0:
+            raise ValueError("No covers have been added")
+        kmeans = KMeans(n_clusters=min(n_colors, len(means)), random_state=random_state, n_init=3)
+        kmeans.fit(to_space(means / 255, space), sample_weight=weights)
+        cmap = CoverPalette._make_cmap(from_space(kmeans.cluster_centers_, space), palette_name)
+        self.hexcodes = [mpl.colors.rgb2hex(c) for c in cmap.colors]
+        return cmap
@@ -0,0 +1,109 @@
+"""Use covers2colors from asyncio code without blocking the event loop.
+
+The provider clients (pylast, musicbrainzngs, discogs_client) and the cover
+download are synchronous, so they run on a thread pool reserved for I/O that
+is sized for many lookups waiting on the network at once. Decoding and
+clustering are CPU bound and run on a separate, smaller executor so a burst
+of lookups never starves them and vice versa::
+
+    palette = await CoverPalette.acreate("Nirvana", "Nevermind")
+    colors, cmap = await palette.agenerate_distinct_optimal_cmap(n_distinct_colors=5)
+
+Both executors are created on first use and can be replaced with
+:func:`set_executors`, e.g. to share the application's own pools. Palettes
+are mutated in place by the generation methods, so the CPU executor must run
+in the same process (a ``ThreadPoolExecutor``); numpy and scikit-learn release
+the GIL for the heavy parts.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .album_art import fetch_cover_bytes, get_best_cover_art_url, load_api_keys
+
+IO_WORKERS = 64
+CPU_WORKERS = os.cpu_count() or 1
+
+_io_executor = None
+_cpu_executor = None
+_lock = threading.Lock()
+
+
+def set_executors(io: Optional[Executor] = None, cpu: Optional[Executor] = None) -> None:
+    """Replace the executors used for provider I/O and for CPU bound work.
+
+    Executors that are not given are left unchanged. The previous executors
+    are not shut down.
+    """
+
+    global _io_executor, _cpu_executor
+    with _lock:
+        if io is not None:
+            _io_executor = io
+        if cpu is not None:
+            _cpu_executor = cpu
+
+
+def io_executor() -> Executor:
+    """Return the executor running provider lookups and downloads."""
+
+    global _io_executor
+    with _lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="covers-io")
+        return _io_executor
+
+
+def cpu_executor() -> Executor:
+    """Return the executor running decoding and clustering."""
+
+    global _cpu_executor
+    with _lock:
+        if _cpu_executor is None:
+            _cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="covers-cpu")
+        return _cpu_executor
+
+
+async def run_io(func: Callable, *args, executor: Optional[Executor] = None, **kwargs):
+    """Await ``func(*args, **kwargs)`` on the I/O executor or ``executor``."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor or io_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+async def run_cpu(func: Callable, *args, executor: Optional[Executor] = None, **kwargs):
+    """Await ``func(*args, **kwargs)`` on the CPU executor or ``executor``."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor or cpu_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+async def aget_best_cover_art_url(artist_name: str, album_name: str, tracer=None, mb_index=None, executor=None):
+    """Async :func:`~covers2colors.album_art.get_best_cover_art_url` using the stored API keys."""
+
+    def lookup():
+        api_key, discogs_token = load_api_keys()
+        return get_best_cover_art_url(
+            artist_name,
+            album_name,
+            api_key=api_key,
+            user_token=discogs_token,
+            tracer=tracer,
+            mb_index=mb_index,
+        )
+
+    return await run_io(lookup, executor=executor)
+
+
+async def afetch_cover_bytes(url: str, tracer=None, executor=None) -> bytes:
+    """Async :func:`~covers2colors.album_art.fetch_cover_bytes`."""
+
+    return await run_io(fetch_cover_bytes, url, tracer, executor=executor)
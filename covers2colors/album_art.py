@@ -6,7 +6,11 @@ import pkg_resources
 import musicbrainzngs
 import discogs_client
 import time
+from urllib.request import urlopen
 from fuzzywuzzy import fuzz
+from .mb_index import load_mb_index
+from .profiling import NULL_TRACER
+from .replay import get_cassette
 
 api_key = None
 discogs_token = None
@@ -34,6 +38,25 @@ USER_AGENT = "covers2colors"
 USER_AGENT_VERSION = "0.1"
 USER_AGENT_URL = "http://idonthaveawebsite.com"
 COVER_ART_URL_TEMPLATE = "https://coverartarchive.org/release/{}/front-500"
+# Overridden by use_endpoints to talk to a local stand-in server
+DISCOGS_BASE_URL = None
+
+def use_endpoints(base_url, rate_limit=False):
+    """Point the MusicBrainz, Cover Art Archive and Discogs lookups at ``base_url``.
+
+    Used with :mod:`covers2colors.fakeserver` for offline load tests. Last.fm
+    is not redirected because pylast always connects over https, so leave the
+    Last.fm key unset when using a stand-in server. ``rate_limit`` keeps
+    musicbrainzngs' one request per second limit.
+    """
+    global COVER_ART_URL_TEMPLATE, DISCOGS_BASE_URL
+    base_url = base_url.rstrip("/")
+    scheme, _, host = base_url.partition("://")
+    musicbrainzngs.set_hostname(host, use_https=scheme == "https")
+    musicbrainzngs.set_rate_limit(limit_or_interval=1.0 if rate_limit else False)
+    COVER_ART_URL_TEMPLATE = base_url + "/release/{}/front-500"
+    DISCOGS_BASE_URL = base_url + "/discogs"
+
 
 def get_lastfm_cover_art_url(api_key, artist_name, album_name, max_retries=3):
     """ Fetches the album cover art URL from the Last.fm API for a given artist and album."""
@@ -109,9 +132,30 @@ def get_mb_cover_art_url(artist_name, album_name):
 
     return None
 
+def get_local_mb_cover_art_url(artist_name, album_name, mb_index):
+    """ Get cover art URL from a local MusicBrainz index, only checking the artwork exists when the dump did not say """
+    match = mb_index.find(artist_name, album_name)
+    if match is None:
+        print(f"Release group not found in local MusicBrainz index for {artist_name} - {album_name}")
+        return None
+    cover_art_url = COVER_ART_URL_TEMPLATE.format(match["release"])
+    if match["front"] is not True:
+        # The dump did not say whether the release has front artwork
+        try:
+            with requests.get(cover_art_url, stream=True) as response:
+                if response.status_code != 200:
+                    print(f"Cover art not found for {artist_name} - {album_name}")
+                    return None
+        except requests.exceptions.RequestException as e:
+            print(f"Error checking cover art existence for {artist_name} - {album_name}: {e}")
+            return None
+    return cover_art_url
+
 def get_discogs_cover_art_url(artist_name, album_name, user_token):
     """ Fetches the album cover art URL from the Discogs API for a given artist and album."""
     d = discogs_client.Client("covers2colors/0.1", user_token=user_token)
+    if DISCOGS_BASE_URL:
+        d._base_url = DISCOGS_BASE_URL
     try:
         discogs_search = d.search(artist=artist_name, release_title=album_name, type="release")
         results = discogs_search.page(1)
@@ -132,8 +176,47 @@ def get_discogs_cover_art_url(artist_name, album_name, user_token):
 
     return None
 
-def get_best_cover_art_url(artist_name, album_name, api_key=None, user_token=None):
-    """Fetch the album cover art URL using the best available method."""
+def _traced_lookup(tracer, provider, artist_name, album_name, func):
+    """Call provider ``func`` inside a tracer span and count hits and misses.
+
+    The lookup is recorded to or replayed from the active cassette if any.
+    """
+    cassette = get_cassette()
+    with tracer.span(f"provider.{provider}") as span:
+        if cassette is not None:
+            cover_art_url = cassette.lookup(provider, artist_name, album_name, func)
+        else:
+            cover_art_url = func()
+        span["hit"] = bool(cover_art_url)
+    tracer.count(f"provider.{provider}.{'hit' if cover_art_url else 'miss'}")
+    return cover_art_url
+
+def fetch_cover_bytes(url, tracer=None):
+    """Download the cover at ``url`` through the active cassette if any."""
+    tracer = tracer or NULL_TRACER
+
+    def download():
+        with urlopen(url) as response:
+            return response.read()
+
+    cassette = get_cassette()
+    with tracer.span("download", url=url) as span:
+        data = cassette.fetch(url, download) if cassette is not None else download()
+        span["bytes"] = len(data)
+    tracer.count("bytes_downloaded", len(data))
+    return data
+
+def get_best_cover_art_url(artist_name, album_name, api_key=None, user_token=None, tracer=None, mb_index=None):
+    """Fetch the album cover art URL using the best available method.
+
+    ``tracer`` records the duration and hit or miss of every provider tried.
+    ``mb_index`` is a :class:`~covers2colors.mb_index.LocalMusicBrainzIndex`
+    consulted before the MusicBrainz API. When omitted the index built with
+    ``coverpalette mb-index`` is used if it exists.
+    """
+    tracer = tracer or NULL_TRACER
+    if mb_index is None:
+        mb_index = load_mb_index()
     if api_key is None or user_token is None:
         loaded_api_key, loaded_discogs = load_api_keys()
         if api_key is None:
@@ -146,16 +229,33 @@ def get_best_cover_art_url(artist_name, album_name, api_key=None, user_token=Non
     if api_key:
         # Try Last.fm first if API key is provided
         print("Attempting to get cover art from last.fm")
-        cover_art_url = get_lastfm_cover_art_url(api_key, artist_name, album_name)
+        cover_art_url = _traced_lookup(
+            tracer, "lastfm", artist_name, album_name,
+            lambda: get_lastfm_cover_art_url(api_key, artist_name, album_name),
+        )
     
+    if not cover_art_url and mb_index is not None:
+        # Try the local MusicBrainz index before hitting the MusicBrainz API
+        print("Attempting to get cover art from the local MusicBrainz index")
+        cover_art_url = _traced_lookup(
+            tracer, "musicbrainz_local", artist_name, album_name,
+            lambda: get_local_mb_cover_art_url(artist_name, album_name, mb_index),
+        )
+
     if not cover_art_url:
         # Try MusicBrainz if no cover art was found or if no Last.fm API key was provided
         print("Attempting to get cover art from MusicBrainz")
-        cover_art_url = get_mb_cover_art_url(artist_name, album_name)
+        cover_art_url = _traced_lookup(
+            tracer, "musicbrainz", artist_name, album_name,
+            lambda: get_mb_cover_art_url(artist_name, album_name),
+        )
 
     if not cover_art_url and user_token != None:
         # Try Discogs if no cover art was found in previous methods if discog token is provided
         print("Attempting to get cover art from Discogs")
-        cover_art_url = get_discogs_cover_art_url(artist_name, album_name, user_token)
+        cover_art_url = _traced_lookup(
+            tracer, "discogs", artist_name, album_name,
+            lambda: get_discogs_cover_art_url(artist_name, album_name, user_token),
+        )
 
     return cover_art_url
@@ -0,0 +1,341 @@
+"""Generate palettes for many albums in one run.
+
+:func:`run_batch` fetches and clusters covers on a thread pool, reports each
+result as soon as it is ready and optionally feeds every decoded cover into a
+:class:`~covers2colors.aggregate.PaletteAggregator` for a combined palette.
+Covers whose perceptual hash and coarse colors match one already processed in
+the run reuse that palette instead of clustering the same artwork again::
+
+    aggregator = PaletteAggregator()
+    results = run_batch([("Nirvana", "Nevermind"), ("Nirvana", "In Utero")], aggregator=aggregator)
+    cmap = aggregator.generate_cmap(n_colors=6)
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from .aggregate import PaletteAggregator
+from .cache import ResultCache
+from .convert import CoverPalette
+from .kmeans import fit_histograms
+from .phash import HashIndex
+
+BATCH_DEFAULTS = {
+    "n_colors": 4,
+    "max_colors": 10,
+    "random_state": None,
+    "hue": False,
+    "light": False,
+    "dark": False,
+    "bold": False,
+    "search": "full",
+    "space": "rgb",
+    "colorblind": False,
+    "streaming": False,
+    "prefilter": None,
+    "save": False,
+}
+
+
+def read_album_list(path: str) -> List[Tuple[str, str]]:
+    """Read ``artist - album`` lines from ``path``, skipping blanks and ``#`` comments."""
+
+    albums = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            artist, sep, album = line.partition(" - ")
+            if not sep or not artist.strip() or not album.strip():
+                raise ValueError(f"{path}:{number}: expected 'artist - album', got {line!r}")
+            albums.append((artist.strip(), album.strip()))
+    return albums
+
+
+def _generate(palette: CoverPalette, params: dict) -> dict:
+    method = (
+        palette.generate_hue_distinct_optimal_cmap
+        if params["hue"]
+        else palette.generate_distinct_optimal_cmap
+    )
+    method(
+        n_distinct_colors=params["n_colors"],
+        max_colors=params["max_colors"],
+        random_state=params["random_state"],
+        light=params["light"],
+        dark=params["dark"],
+        bold=params["bold"],
+        search=params["search"],
+        space=params["space"],
+        colorblind=params["colorblind"],
+    )
+    return {
+        "artist": palette.artist,
+        "album": palette.album,
+        "image_url": palette.image_path,
+        "hexcodes": palette.hexcodes,
+        "colorblind_friendly": palette.is_colorblind_friendly,
+        "fitted_k": palette.fitted_k,
+    }
+
+
+def _reuse(palette: CoverPalette, original: dict) -> dict:
+    """Copy the palette of a near-duplicate cover onto ``palette``."""
+
+    palette.hexcodes = original["hexcodes"]
+    palette.is_colorblind_friendly = original["colorblind_friendly"]
+    palette.fitted_k = original["fitted_k"]
+    result = {key: value for key, value in original.items() if key not in ("id", "duplicate_of")}
+    result.update(
+        artist=palette.artist,
+        album=palette.album,
+        image_url=palette.image_path,
+        duplicate_of=original.get("duplicate_of") or f"{original['artist']} - {original['album']}",
+    )
+    return result
+
+
+def _load(
+    artist: str,
+    album: str,
+    params: dict,
+    cache: Optional[ResultCache],
+    hash_index: Optional[HashIndex],
+    locks: dict,
+):
+    """Fetch and decode a cover and claim its perceptual hash.
+
+    Returns ``(palette, match, claim)``. ``match`` is the future of an
+    earlier cover with the same artwork, ``claim`` the future this cover
+    resolves for later duplicates.
+    """
+
+    palette = CoverPalette(
+        artist, album, cache=cache, streaming=params["streaming"], prefilter=params["prefilter"]
+    )
+
+    match = None
+    claim = None
+    if hash_index is not None:
+        # The first cover with a hash claims it, near-duplicates wait for its result
+        with locks["hash"]:
+            match = hash_index.find(palette.phash, palette.color_signature)
+            if match is None:
+                claim = Future()
+                hash_index.add(palette.phash, claim, palette.color_signature)
+    return palette, match, claim
+
+
+def _finish(
+    palette: CoverPalette,
+    match: Optional[Future],
+    claim: Optional[Future],
+    params: dict,
+    aggregator: Optional[PaletteAggregator],
+    locks: dict,
+) -> dict:
+    """Generate or reuse the palette of a loaded cover and save it if requested."""
+
+    original = None
+    if match is not None:
+        try:
+            original = match.result()
+        except Exception:
+            original = None
+
+    if original is not None:
+        result = _reuse(palette, original)
+    else:
+        try:
+            result = _generate(palette, params)
+        except BaseException as e:
+            if claim is not None:
+                claim.set_exception(e)
+            raise
+        if claim is not None:
+            claim.set_result(result)
+        # Repeated artwork is only counted once in the combined palette
+        if aggregator is not None:
+            aggregator.add_palette(f"{palette.artist} - {palette.album}", palette)
+
+    if params["save"]:
+        # save_palette rewrites index.json so saves must not interleave
+        with locks["index"]:
+            result["id"] = palette.save_palette(store_previews=True)
+    return result
+
+
+def _process(
+    artist: str,
+    album: str,
+    params: dict,
+    cache: Optional[ResultCache],
+    aggregator: Optional[PaletteAggregator],
+    hash_index: Optional[HashIndex],
+    locks: dict,
+) -> dict:
+    palette, match, claim = _load(artist, album, params, cache, hash_index, locks)
+    return _finish(palette, match, claim, params, aggregator, locks)
+
+
+def _fit_together(palettes: List[CoverPalette], params: dict) -> List[Optional[Exception]]:
+    """Fit the k-means sweep of all ``palettes`` with the batched kernel.
+
+    Returns the error of every palette whose pixels could not be prepared,
+    ``None`` for the others. If the batched fit itself fails, the palettes
+    are left to be fitted one at a time.
+    """
+
+    errors = [None] * len(palettes)
+    ks = range(2, params["max_colors"] + 1)
+    if not palettes or not ks:
+        return errors
+    histograms, fitted = [], []
+    for n, palette in enumerate(palettes):
+        try:
+            histograms.append(palette.color_histogram())
+            fitted.append(palette)
+        except (ValueError, OSError, LookupError) as e:
+            errors[n] = e
+    if not fitted:
+        return errors
+    space = params["space"]
+    try:
+        fits = fit_histograms(histograms, ks, space=space, random_state=params["random_state"])
+    except (ValueError, MemoryError) as e:
+        print(f"Batched k-means failed, fitting covers separately: {e}")
+        return errors
+    for palette, cover_fits in zip(fitted, fits):
+        palette.add_fits(cover_fits, space)
+    return errors
+
+
+def run_batch(
+    albums: Iterable[Tuple[str, str]],
+    workers: int = 4,
+    cache: Optional[ResultCache] = None,
+    aggregator: Optional[PaletteAggregator] = None,
+    on_result: Optional[Callable[[dict], None]] = None,
+    dedup: bool = True,
+    hash_index: Optional[HashIndex] = None,
+    kmeans_batch: int = 16,
+    **params,
+) -> List[dict]:
+    """Generate a distinct palette for every ``(artist, album)`` pair.
+
+    Parameters
+    ----------
+    albums : iterable of (str, str)
+        Artist and album pairs to process.
+    workers : int, optional
+        Number of covers fetched and clustered concurrently. Defaults to 4.
+    cache : ResultCache, optional
+        Cache of seeded palette results shared by all covers.
+    aggregator : PaletteAggregator, optional
+        Receives the color histogram of every successfully decoded cover.
+        Near-duplicate covers are only added once.
+    on_result : callable, optional
+        Called with each result dict as soon as it is ready.
+    dedup : bool, optional
+        Reuse the palette of covers whose perceptual hash matches a cover
+        already processed in this run. Reused results name the original in
+        ``"duplicate_of"``. Defaults to ``True``.
+    hash_index : HashIndex, optional
+        Index of processed covers, e.g. to share one across several runs with
+        the same settings or to change ``max_distance``.
+    kmeans_batch : int, optional
+        Number of covers whose k-means sweeps are fitted together with
+        :func:`covers2colors.kmeans.fit_histograms` instead of one
+        scikit-learn fit per k and cover. The next group is downloaded while
+        one is clustered. ``0`` or ``1`` fits every cover on its own, as
+        does ``search="adaptive"``, whose k values depend on earlier fits.
+        Defaults to 16.
+    **params
+        Generation settings, see ``BATCH_DEFAULTS``.
+
+    Returns
+    -------
+    list of dict
+        One result per album in input order. Albums that failed carry an
+        ``"error"`` message instead of ``"hexcodes"``.
+    """
+
+    unknown = set(params) - set(BATCH_DEFAULTS)
+    if unknown:
+        raise TypeError(f"Unknown batch parameters: {', '.join(sorted(unknown))}")
+    params = dict(BATCH_DEFAULTS, **params)
+    albums = list(albums)
+    results = [None] * len(albums)
+    if dedup and hash_index is None:
+        hash_index = HashIndex()
+    locks = {"hash": threading.Lock(), "index": threading.Lock()}
+
+    def report(i: int, result: dict) -> None:
+        results[i] = result
+        if on_result is not None:
+            on_result(result)
+
+    def failed(i: int, e: Exception) -> dict:
+        artist, album = albums[i]
+        return {"artist": artist, "album": album, "error": str(e)}
+
+    def job(i: int) -> None:
+        artist, album = albums[i]
+        try:
+            result = _process(
+                artist, album, params, cache, aggregator, hash_index if dedup else None, locks
+            )
+        except (ValueError, OSError, LookupError) as e:
+            result = failed(i, e)
+        report(i, result)
+
+    def load(i: int):
+        artist, album = albums[i]
+        try:
+            return _load(artist, album, params, cache, hash_index if dedup else None, locks)
+        except (ValueError, OSError, LookupError) as e:
+            report(i, failed(i, e))
+            return None
+
+    def finish(item) -> None:
+        i, (palette, match, claim) = item
+        try:
+            result = _finish(palette, match, claim, params, aggregator, locks)
+        except (ValueError, OSError, LookupError) as e:
+            result = failed(i, e)
+        report(i, result)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+        # The adaptive search picks each k from the previous fits, so it cannot be batched
+        if kmeans_batch <= 1 or params["search"] != "full":
+            # list() re-raises unexpected errors from the workers
+            list(executor.map(job, range(len(albums))))
+            return results
+
+        groups = [
+            range(start, min(start + kmeans_batch, len(albums)))
+            for start in range(0, len(albums), kmeans_batch)
+        ]
+        pending = [executor.submit(load, i) for i in groups[0]] if groups else []
+        for n, group in enumerate(groups):
+            loaded = [(i, future.result()) for i, future in zip(group, pending)]
+            loaded = [(i, entry) for i, entry in loaded if entry is not None]
+            # Download the next group while this one is clustered
+            if n + 1 < len(groups):
+                pending = [executor.submit(load, i) for i in groups[n + 1]]
+            originals = [(i, entry) for i, entry in loaded if entry[1] is None]
+            duplicates = [(i, entry) for i, entry in loaded if entry[1] is not None]
+            errors = _fit_together([entry[0] for _, entry in originals], params)
+            for (i, (_, _, claim)), error in zip(originals, errors):
+                if error is not None:
+                    # Duplicates waiting on this cover fall back to their own fit
+                    if claim is not None:
+                        claim.set_exception(error)
+                    report(i, failed(i, error))
+            originals = [item for item, error in zip(originals, errors) if error is None]
+            # Originals resolve their hash claims before duplicates wait on them
+            list(executor.map(finish, originals))
+            list(executor.map(finish, duplicates))
+    return results
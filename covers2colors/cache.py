@@ -0,0 +1,138 @@
+"""On-disk cache of palette generation results.
+
+Results are keyed by a hash of the decoded pixels, the name of the operation
+and a canonical JSON encoding of its parameters together with
+``ENGINE_VERSION`` and the installed scikit-learn version, so any change that
+could alter the clustering produces a different key. Each entry is a small
+JSON file written atomically with :func:`os.replace`, which makes the cache
+safe to share between processes. Reads refresh an entry's modification time
+and the least recently used entries are evicted once the cache grows past
+``max_entries`` or ``max_bytes``.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Union
+
+import sklearn
+
+# Bump when a change to the clustering or selection code alters results
+ENGINE_VERSION = "1"
+
+CACHE_DIR = Path.home() / ".covers2colors" / "cache"
+
+
+class ResultCache:
+    """Bounded least-recently-used cache of JSON results on disk.
+
+    Parameters
+    ----------
+    directory : str or Path, optional
+        Where entries are stored. Defaults to ``CACHE_DIR``.
+    max_entries : int, optional
+        Maximum number of stored results. Defaults to 1000.
+    max_bytes : int, optional
+        Maximum total size of stored results. Unlimited when ``None``.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Union[str, Path]] = None,
+        max_entries: int = 1000,
+        max_bytes: Optional[int] = None,
+    ):
+        self.directory = Path(directory) if directory else CACHE_DIR
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(content_hash: str, operation: str, params: dict) -> str:
+        """Return the cache key for ``operation`` with ``params`` on an image."""
+
+        payload = {
+            "engine": ENGINE_VERSION,
+            "sklearn": sklearn.__version__,
+            "image": content_hash,
+            "operation": operation,
+            "params": params,
+        }
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the stored result for ``key`` or ``None``."""
+
+        path = self._path(key)
+        try:
+            with path.open("r") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return value
+
+    def put(self, key: str, value: dict) -> None:
+        """Store ``value`` under ``key`` and evict old entries if needed."""
+
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(value, f)
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            print(f"Error writing cache entry {key}: {e}")
+            return
+        self._evict()
+
+    def _entries(self) -> list:
+        """Return ``(mtime, size, path)`` for every stored entry."""
+
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda e: e[0])
+        total = sum(size for _, size, _ in entries)
+        while entries and (
+            len(entries) > self.max_entries
+            or (self.max_bytes is not None and total > self.max_bytes)
+        ):
+            _, size, path = entries.pop(0)
+            total -= size
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        """Remove every stored result."""
+
+        for _, _, path in self._entries():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self._entries())
@@ -1,6 +1,118 @@
 import argparse
+import json
+import os
 import sys
-from .convert import CoverPalette
+from urllib.error import HTTPError, URLError
+from .colorspace import SPACES
+from .streaming import DEFAULT_TILE_PIXELS
+
+# convert, cache and the other modules pulling in scikit-learn, scipy and
+# matplotlib are imported where they are used, so --server stays fast to start
+
+
+# Options only a local run can honor, refused with --server
+LOCAL_ONLY_OPTIONS = (
+    ("--profile", "profile"),
+    ("--no-cache", "no_cache"),
+    ("--preview-out", "preview_out"),
+    ("--renderer", "renderer"),
+    ("--posterize", "posterize"),
+    ("--streaming", "streaming"),
+    ("--tile-pixels", "tile_pixels"),
+    ("--trim-borders", "trim_borders"),
+    ("--max-pixels", "max_pixels"),
+    ("--filter-pixels", "filter_pixels"),
+    ("--providers", "providers"),
+    ("--record", "record"),
+    ("--replay", "replay"),
+)
+
+
+def _prefilter(args):
+    """Return the ``PixelFilter`` requested on the command line or ``None``."""
+
+    filter_pixels = getattr(args, "filter_pixels", False)
+    if not (args.trim_borders or args.max_pixels or filter_pixels):
+        return None
+    from .prefilter import PixelFilter
+
+    return PixelFilter(
+        borders=args.trim_borders,
+        light=filter_pixels and args.light,
+        dark=filter_pixels and args.dark,
+        bold=filter_pixels and args.bold,
+        max_pixels=args.max_pixels,
+    )
+
+
+def _generate_remote(args) -> None:
+    """Generate a palette through a ``coverpalette serve`` instance."""
+
+    from .client import request_palette
+
+    params = {
+        "artist": args.artist,
+        "album": args.album,
+        "n_colors": args.n_colors,
+        "max_colors": args.max_colors,
+        "random_state": args.random_state,
+        "hue": args.hue,
+        "light": args.light,
+        "dark": args.dark,
+        "bold": args.bold,
+        "search": args.search,
+        "space": args.space,
+        "colorblind": args.colorblind,
+        "save": args.save,
+    }
+    try:
+        result = request_palette(args.server, params)
+    except HTTPError as e:
+        try:
+            message = json.loads(e.read()).get("error")
+        except ValueError:
+            message = e.reason
+        print(f"Server error ({e.code}): {message}")
+        return
+    except URLError as e:
+        print(f"Could not reach {args.server}: {e.reason}")
+        return
+
+    print("Hexcodes:", " ".join(result.get("hexcodes") or []))
+    print("Color-blind friendly:", result.get("colorblind_friendly"))
+    if "id" in result:
+        print(f"Palette saved as #{result['id']}")
+    else:
+        print("Palette not saved, pass --save to keep it (no preview is shown with --server)")
+
+
+def _swatch_line(update: dict) -> str:
+    """Return a terminal line showing ``update``'s colors as true color blocks."""
+
+    blocks = ""
+    for hexcode in update["hexcodes"]:
+        r, g, b = (int(hexcode[i : i + 2], 16) for i in (1, 3, 5))
+        blocks += f"\033[48;2;{r};{g};{b}m    \033[0m"
+    status = "done" if update["final"] else f"refining, {update['n_pixels']} pixels"
+    return f"{blocks} {' '.join(update['hexcodes'])}  quality {update['quality']:.0%} ({status})"
+
+
+def _generate_progressive(palette, hue: bool, options: dict):
+    """Show palettes from ``iter_palettes`` in place and return the last colormap.
+
+    Ctrl-C stops refining and keeps the palette shown last.
+    """
+
+    cmap = None
+    try:
+        for update in palette.iter_palettes(hue=hue, **options):
+            cmap = update["cmap"]
+            print("\r\033[K" + _swatch_line(update), end="", flush=True)
+    except KeyboardInterrupt:
+        if cmap is None:
+            raise
+    print()
+    return cmap
 
 
 def main() -> None:
@@ -16,15 +128,31 @@ def main() -> None:
         list_parser.add_argument(
             "--pdf", action="store_true", help="Show a PDF of all palettes"
         )
+        list_parser.add_argument(
+            "--sheet",
+            metavar="PATH",
+            default=None,
+            help="Write a PNG contact sheet of all palettes to PATH",
+        )
         args = list_parser.parse_args(sys.argv[2:])
 
+        from .convert import CoverPalette
+
+        if args.sheet:
+            if not CoverPalette.list_palettes():
+                print("No saved palettes found")
+                return
+            with open(args.sheet, "wb") as f:
+                f.write(CoverPalette.render_contact_sheet())
+            print(f"Contact sheet saved to {args.sheet}")
+            return
+
         if args.pdf:
             path = CoverPalette.create_palettes_pdf()
             if not path:
                 print("No saved palettes found")
                 return
             try:
-                import os
                 import subprocess
 
                 if sys.platform.startswith("darwin"):
@@ -57,12 +185,246 @@ def main() -> None:
         del_parser.add_argument("id", type=int, help="Palette id to delete")
         args = del_parser.parse_args(sys.argv[2:])
 
+        from .convert import CoverPalette
+
         if CoverPalette.delete_palette(args.id):
             print(f"Deleted palette {args.id}")
         else:
             print(f"Palette {args.id} not found")
         return
 
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        export_parser = argparse.ArgumentParser(
+            prog="coverpalette export",
+            description="Export all saved palettes into one memory-mappable file for bulk loading",
+        )
+        export_parser.add_argument(
+            "--format", choices=["npz", "binary"], default="npz", help="Container format (default: npz)"
+        )
+        export_parser.add_argument(
+            "-o", "--output", metavar="PATH", default=None, help="Output file (default: in the palette directory)"
+        )
+        args = export_parser.parse_args(sys.argv[2:])
+
+        from .library import export_library, load_library
+
+        path = export_library(args.output, fmt=args.format)
+        library = load_library(path)
+        print(f"Exported {len(library)} palettes ({len(library.colors)} colors) to {path}")
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == "mb-index":
+        index_parser = argparse.ArgumentParser(
+            prog="coverpalette mb-index",
+            description="Build a local MusicBrainz index for offline cover lookups",
+        )
+        index_parser.add_argument(
+            "dump", help="MusicBrainz JSON dump of release groups or releases (.json or .json.gz)"
+        )
+        index_parser.add_argument(
+            "-o", "--output", default=None, help="Index file (defaults to ~/.covers2colors/musicbrainz.sqlite)"
+        )
+        args = index_parser.parse_args(sys.argv[2:])
+
+        from .mb_index import LocalMusicBrainzIndex, build_mb_index
+
+        path = build_mb_index(args.dump, args.output)
+        print(f"Indexed {len(LocalMusicBrainzIndex(path))} release groups to {path}")
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == "fake-server":
+        fake_parser = argparse.ArgumentParser(
+            prog="coverpalette fake-server",
+            description="Run a local stand-in for the MusicBrainz, Cover Art Archive and Discogs APIs",
+        )
+        fake_parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+        fake_parser.add_argument("--port", type=int, default=8766, help="Port to bind")
+        catalog = fake_parser.add_mutually_exclusive_group()
+        catalog.add_argument(
+            "--albums",
+            metavar="JSON",
+            help='JSON file with a list of ["artist", "album"] pairs',
+        )
+        catalog.add_argument(
+            "--generate",
+            type=int,
+            default=100,
+            metavar="N",
+            help="Serve N generated albums named 'Artist i - Album i'",
+        )
+        fake_parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+        fake_parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency in seconds")
+        fake_parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 500 responses")
+        fake_parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of 503 responses")
+        fake_parser.add_argument("--seed", type=int, default=0, help="Seed for injected failures")
+        fake_parser.add_argument("--verbose", action="store_true", help="Log every HTTP request")
+        args = fake_parser.parse_args(sys.argv[2:])
+
+        from .fakeserver import FakeCatalog, make_fake_server
+
+        if args.albums:
+            with open(args.albums, "r") as f:
+                albums = FakeCatalog([tuple(pair) for pair in json.load(f)])
+        else:
+            albums = FakeCatalog.generated(args.generate)
+        server = make_fake_server(
+            albums,
+            host=args.host,
+            port=args.port,
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate,
+            seed=args.seed,
+            verbose=args.verbose,
+        )
+        print(f"Serving {len(albums.albums)} albums on {server.base_url}")
+        print(f"Use it with: coverpalette --providers {server.base_url} ARTIST - ALBUM")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        batch_parser = argparse.ArgumentParser(
+            prog="coverpalette batch",
+            description="Generate palettes for every 'artist - album' line of a file",
+        )
+        batch_parser.add_argument("albums", help="Text file with one 'artist - album' per line")
+        batch_parser.add_argument(
+            "-o", "--output", metavar="PATH", default=None, help="Write results as JSON lines to PATH"
+        )
+        batch_parser.add_argument("--workers", type=int, default=4, help="Covers processed concurrently")
+        batch_parser.add_argument("-n", "--n-colors", type=int, default=4, help="Number of colors in each palette")
+        batch_parser.add_argument(
+            "-m", "--max-colors", type=int, default=10, help="Maximum colors to consider per cover"
+        )
+        batch_parser.add_argument("--random-state", type=int, default=None, help="Random seed")
+        batch_parser.add_argument("--search", choices=["full", "adaptive"], default="full")
+        batch_parser.add_argument("--space", choices=list(SPACES), default="rgb")
+        batch_parser.add_argument("--hue", action="store_true", help="Maximize hue separation")
+        batch_parser.add_argument(
+            "--colorblind", action="store_true", help="Optimize colors for color vision deficiencies"
+        )
+        batch_parser.add_argument("--streaming", action="store_true", help="Bound memory on very large scans")
+        batch_parser.add_argument(
+            "--trim-borders", action="store_true", help="Ignore uniform frames and letterbox bars"
+        )
+        batch_parser.add_argument(
+            "--max-pixels", type=int, default=None, help="Cluster a random sample of at most this many pixels"
+        )
+        batch_parser.add_argument("--save", action="store_true", help="Save every palette")
+        batch_parser.add_argument(
+            "--aggregate",
+            type=int,
+            default=None,
+            metavar="N",
+            help="Also print one combined palette of N colors for all covers",
+        )
+        batch_parser.add_argument(
+            "--kmeans-batch",
+            type=int,
+            default=16,
+            metavar="N",
+            help="Covers clustered together by the batched k-means kernel, 0 to fit each separately",
+        )
+        batch_parser.add_argument("--no-cache", action="store_true", help="Do not use the result cache")
+        batch_parser.add_argument(
+            "--no-dedup",
+            action="store_true",
+            help="Cluster every cover even if the same artwork was already processed",
+        )
+        batch_parser.add_argument(
+            "--providers",
+            metavar="URL",
+            default=os.environ.get("COVERS2COLORS_PROVIDER_URL"),
+            help="Send provider requests to a 'coverpalette fake-server' at URL",
+        )
+        args = batch_parser.parse_args(sys.argv[2:])
+
+        from .aggregate import PaletteAggregator
+        from .batch import read_album_list, run_batch
+        from .cache import ResultCache
+
+        if args.providers:
+            from .album_art import use_endpoints
+
+            use_endpoints(args.providers)
+        albums = read_album_list(args.albums)
+        aggregator = PaletteAggregator() if args.aggregate else None
+        output = open(args.output, "w", encoding="utf-8") if args.output else None
+
+        def report(result):
+            if output is not None:
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+            name = f"{result['artist']} - {result['album']}"
+            if "error" in result:
+                print(f"{name}: {result['error']}")
+            else:
+                duplicate = f" (same cover as {result['duplicate_of']})" if "duplicate_of" in result else ""
+                print(f"{name}: {' '.join(result['hexcodes'] or [])}{duplicate}")
+
+        try:
+            results = run_batch(
+                albums,
+                workers=args.workers,
+                cache=None if args.no_cache else ResultCache(),
+                aggregator=aggregator,
+                on_result=report,
+                dedup=not args.no_dedup,
+                kmeans_batch=args.kmeans_batch,
+                n_colors=args.n_colors,
+                max_colors=args.max_colors,
+                random_state=args.random_state,
+                hue=args.hue,
+                search=args.search,
+                space=args.space,
+                colorblind=args.colorblind,
+                streaming=args.streaming,
+                prefilter=_prefilter(args),
+                save=args.save,
+            )
+        finally:
+            if output is not None:
+                output.close()
+        failed = sum("error" in r for r in results)
+        print(f"Processed {len(results)} albums, {failed} failed")
+        if aggregator is not None and len(aggregator):
+            aggregator.generate_cmap(args.aggregate, random_state=args.random_state, space=args.space)
+            print("Combined palette:", " ".join(aggregator.hexcodes))
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve_parser = argparse.ArgumentParser(
+            prog="coverpalette serve",
+            description="Run a local HTTP service that keeps palettes warm",
+        )
+        serve_parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+        serve_parser.add_argument("--port", type=int, default=8765, help="Port to bind")
+        serve_parser.add_argument(
+            "--workers", type=int, default=2, help="Threads running palette generation"
+        )
+        serve_parser.add_argument(
+            "--max-pending",
+            type=int,
+            default=16,
+            help="Queued jobs before new requests are rejected with 503",
+        )
+        serve_parser.add_argument(
+            "--verbose", action="store_true", help="Log every HTTP request"
+        )
+        args = serve_parser.parse_args(sys.argv[2:])
+
+        from .server import PaletteService, serve
+
+        service = PaletteService(workers=args.workers, max_pending=args.max_pending)
+        serve(args.host, args.port, service=service, verbose=args.verbose)
+        return
+
     # Support an unquoted "artist - album" form by rewriting sys.argv
     args = sys.argv[1:]
     if "-" in args:
@@ -96,11 +458,28 @@ def main() -> None:
         help="Maximum colors to consider when generating the palette",
     )
     parser.add_argument("--random-state", type=int, default=None, help="Random seed")
+    parser.add_argument(
+        "--search",
+        choices=["full", "adaptive"],
+        default="full",
+        help="Fit every candidate color count or only enough to find the knee",
+    )
+    parser.add_argument(
+        "--space",
+        choices=list(SPACES),
+        default="rgb",
+        help="Color space used for clustering and distinctness (lab and oklab are perceptual)",
+    )
     parser.add_argument(
         "--hue",
         action="store_true",
         help="Maximize hue separation when selecting colors",
     )
+    parser.add_argument(
+        "--colorblind",
+        action="store_true",
+        help="Pick the colors that stay most distinct for protanopia, deuteranopia and tritanopia",
+    )
     parser.add_argument("--light", action="store_true", help="Prefer lighter colors")
     parser.add_argument("--dark", action="store_true", help="Prefer darker colors")
     parser.add_argument(
@@ -111,38 +490,178 @@ def main() -> None:
         action="store_true",
         help="Save without previewing the palette",
     )
+    parser.add_argument(
+        "--renderer",
+        choices=["matplotlib", "pil"],
+        default="matplotlib",
+        help="Backend used to show the preview window",
+    )
+    parser.add_argument(
+        "--preview-out",
+        metavar="PATH",
+        default=None,
+        help="Write the preview to PATH (.png or .svg) instead of opening a window",
+    )
+    parser.add_argument(
+        "--previews",
+        action="store_true",
+        help="Store a cover thumbnail and swatch with the saved palette",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        default=None,
+        metavar="PATH",
+        help="Record per-stage timings and write them as JSON to PATH (stderr if omitted)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not reuse or store palettes generated with --random-state",
+    )
+    parser.add_argument(
+        "--no-progress",
+        action="store_true",
+        help="Do not show quick palettes from pixel samples while the full palette is computed",
+    )
+    parser.add_argument(
+        "--posterize",
+        metavar="PATH",
+        default=None,
+        help="Write the cover recolored with the palette to PATH and print each color's coverage",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Read the cover in strips into a color histogram to bound memory on very large scans",
+    )
+    parser.add_argument(
+        "--tile-pixels",
+        type=int,
+        default=DEFAULT_TILE_PIXELS,
+        help=f"Pixels per strip with --streaming (default: {DEFAULT_TILE_PIXELS})",
+    )
+    parser.add_argument(
+        "--trim-borders",
+        action="store_true",
+        help="Ignore uniform frames and letterbox bars around the artwork",
+    )
+    parser.add_argument(
+        "--max-pixels",
+        type=int,
+        default=None,
+        help="Cluster a random sample of at most this many pixels",
+    )
+    parser.add_argument(
+        "--filter-pixels",
+        action="store_true",
+        help="Apply --light, --dark and --bold to the cover's pixels before clustering",
+    )
+    parser.add_argument(
+        "--server",
+        metavar="URL",
+        default=os.environ.get("COVERPALETTE_SERVER"),
+        help="Generate through a running 'coverpalette serve' instance "
+        "(defaults to $COVERPALETTE_SERVER)",
+    )
+    parser.add_argument(
+        "--providers",
+        metavar="URL",
+        default=os.environ.get("COVERS2COLORS_PROVIDER_URL"),
+        help="Send MusicBrainz, Cover Art Archive and Discogs requests to a "
+        "'coverpalette fake-server' at URL",
+    )
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument(
+        "--record", metavar="DIR", help="Record provider lookups and cover downloads to DIR"
+    )
+    cassette.add_argument(
+        "--replay", metavar="DIR", help="Replay provider lookups and cover downloads from DIR"
+    )
     args = parser.parse_args()
 
-    palette = CoverPalette(args.artist, args.album)
-    if args.hue:
-        _, cmap = palette.generate_hue_distinct_optimal_cmap(
-            n_distinct_colors=args.n_colors,
-            max_colors=args.max_colors,
-            random_state=args.random_state,
-            light=args.light,
-            dark=args.dark,
-            bold=args.bold,
-        )
+    if args.server:
+        local_only = [
+            option for option, dest in LOCAL_ONLY_OPTIONS if getattr(args, dest) != parser.get_default(dest)
+        ]
+        if local_only:
+            parser.error(f"{', '.join(local_only)} cannot be combined with --server")
+        _generate_remote(args)
+        return
+
+    if args.providers:
+        from .album_art import use_endpoints
+
+        use_endpoints(args.providers)
+    if args.record or args.replay:
+        from .replay import Cassette, set_cassette
+
+        set_cassette(Cassette(args.record or args.replay, "record" if args.record else "replay"))
+
+    from .cache import ResultCache
+    from .convert import CoverPalette
+    from .profiling import Tracer
+
+    tracer = Tracer() if args.profile else None
+    cache = None if args.no_cache else ResultCache()
+    palette = CoverPalette(
+        args.artist,
+        args.album,
+        tracer=tracer,
+        cache=cache,
+        streaming=args.streaming,
+        tile_pixels=args.tile_pixels,
+        prefilter=_prefilter(args),
+    )
+    options = dict(
+        n_distinct_colors=args.n_colors,
+        max_colors=args.max_colors,
+        random_state=args.random_state,
+        light=args.light,
+        dark=args.dark,
+        bold=args.bold,
+        search=args.search,
+        space=args.space,
+        colorblind=args.colorblind,
+    )
+    if sys.stdout.isatty() and not args.no_progress:
+        cmap = _generate_progressive(palette, args.hue, options)
+    elif args.hue:
+        _, cmap = palette.generate_hue_distinct_optimal_cmap(**options)
     else:
-        _, cmap = palette.generate_distinct_optimal_cmap(
-            n_distinct_colors=args.n_colors,
-            max_colors=args.max_colors,
-            random_state=args.random_state,
-            light=args.light,
-            dark=args.dark,
-            bold=args.bold,
-        )
+        _, cmap = palette.generate_distinct_optimal_cmap(**options)
     print("Hexcodes:", " ".join(palette.hexcodes))
     print("Color-blind friendly:", palette.is_colorblind_friendly)
 
+    if args.posterize:
+        quantized, coverage, error = palette.apply_palette(cmap=cmap)
+        quantized.save(args.posterize)
+        for hexcode, fraction in zip(palette.hexcodes, coverage):
+            print(f"  {hexcode}: {fraction:.1%}")
+        print(f"Posterized cover saved to {args.posterize} (RMS error {error ** 0.5:.1f})")
+
+    if tracer is not None:
+        if args.profile == "-":
+            print(tracer.to_json(), file=sys.stderr)
+        else:
+            tracer.to_json(args.profile)
+            print(f"Profile saved to {args.profile}")
+
     if args.save:
-        pid = palette.save_palette()
+        pid = palette.save_palette(store_previews=args.previews)
         print(f"Palette saved as #{pid}")
     else:
-        palette.preview_palette(cmap)
+        if args.preview_out:
+            fmt = "svg" if args.preview_out.lower().endswith(".svg") else "png"
+            with open(args.preview_out, "wb") as f:
+                f.write(palette.render_preview(cmap, fmt=fmt))
+            print(f"Preview saved to {args.preview_out}")
+        else:
+            palette.preview_palette(cmap, backend=args.renderer)
         ans = input("Save this palette? [y/N] ").strip().lower()
         if ans in {"y", "yes"}:
-            pid = palette.save_palette()
+            pid = palette.save_palette(store_previews=args.previews)
             print(f"Palette saved as #{pid}")
 
 
@@ -0,0 +1,21 @@
+"""Thin client of a running ``coverpalette serve`` instance.
+
+Only the standard library is imported here, so ``coverpalette --server``
+starts without loading numpy, scikit-learn or matplotlib.
+"""
+
+import json
+from urllib.request import Request, urlopen
+
+
+def request_palette(server_url: str, params: dict, timeout: float = 300) -> dict:
+    """Ask a running ``coverpalette serve`` instance to generate a palette."""
+
+    request = Request(
+        server_url.rstrip("/") + "/generate",
+        data=json.dumps(params).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
@@ -2,7 +2,9 @@
 """
 
 import math
-from typing import Iterable, Tuple
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
 
 # Transformation matrices from Vischeck for simulating color vision deficiency
 # RGB values should be in the range 0-1
@@ -25,6 +27,9 @@ _CVD_MATRICES = {
 }
 
 
+DEFICIENCIES = tuple(_CVD_MATRICES)
+
+
 def _simulate_cvd(rgb: Tuple[float, float, float], deficiency: str) -> Tuple[float, float, float]:
     """Return ``rgb`` transformed to simulate a color vision deficiency."""
 
@@ -70,3 +75,135 @@ def is_colorblind_friendly(colors: Iterable[Tuple[float, float, float]], deficie
             if _color_distance(simulated[i], simulated[j]) < threshold:
                 return False
     return True
+
+
+def simulate_cvd(colors, deficiency: str) -> np.ndarray:
+    """Vectorized :func:`_simulate_cvd` for an ``(n, 3)`` array of 0-1 RGB colors."""
+
+    matrix = _CVD_MATRICES.get(deficiency)
+    if not matrix:
+        raise ValueError(f"Unknown deficiency: {deficiency}")
+    return np.asarray(colors, dtype=np.float64)[:, :3] @ np.array(matrix).T
+
+
+def cvd_distances(colors, deficiencies: Iterable[str] = DEFICIENCIES, space: str = "rgb") -> np.ndarray:
+    """Pairwise color distances under the worst of several deficiencies.
+
+    Parameters
+    ----------
+    colors:
+        ``(n, 3)`` array of RGB colors with values between 0 and 1.
+    deficiencies:
+        Deficiencies to simulate. Defaults to all three.
+    space:
+        Color space the simulated colors are compared in, see
+        :mod:`covers2colors.colorspace`.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(n, n)`` matrix holding for every pair the smallest distance
+        between the two simulated colors over ``deficiencies``.
+    """
+
+    from .colorspace import to_space
+
+    worst = None
+    for deficiency in deficiencies:
+        simulated = to_space(np.clip(simulate_cvd(colors, deficiency), 0, 1), space)
+        diff = simulated[:, None, :] - simulated[None, :, :]
+        distances = np.sqrt(np.einsum("ijk,ijk->ij", diff, diff))
+        worst = distances if worst is None else np.minimum(worst, distances)
+    return worst
+
+
+def _find_clique(far: np.ndarray, k: int) -> Optional[List[int]]:
+    """Return ``k`` vertices that are pairwise connected in ``far`` or ``None``.
+
+    Candidates are kept as integer bitsets and greedily colored at every step.
+    Vertices of one color are pairwise unconnected, so a set of candidates
+    needing fewer than ``k`` colors cannot contain a large enough clique.
+    """
+
+    neighbors = [sum(1 << int(j) for j in np.flatnonzero(row)) for row in far]
+
+    def color_sort(candidates: int):
+        order, colors = [], []
+        color = 0
+        uncolored = candidates
+        while uncolored:
+            color += 1
+            available = uncolored
+            while available:
+                v = (available & -available).bit_length() - 1
+                available &= ~(1 << v) & ~neighbors[v]
+                uncolored &= ~(1 << v)
+                order.append(v)
+                colors.append(color)
+        return order, colors
+
+    def expand(chosen: List[int], candidates: int) -> Optional[List[int]]:
+        need = k - len(chosen)
+        if need == 0:
+            return chosen
+        order, colors = color_sort(candidates)
+        for v, color in zip(reversed(order), reversed(colors)):
+            if color < need:
+                return None
+            found = expand(chosen + [v], candidates & neighbors[v])
+            if found is not None:
+                return found
+            candidates &= ~(1 << v)
+        return None
+
+    return expand([], (1 << len(far)) - 1)
+
+
+def max_min_subset(distances: np.ndarray, k: int) -> Tuple[List[int], float]:
+    """Pick ``k`` indices maximizing the smallest pairwise distance.
+
+    A farthest-point greedy choice gives the first bound. The search then
+    repeatedly looks for ``k`` colors that are all farther apart than the
+    best subset so far and stops once no such subset exists.
+
+    Returns
+    -------
+    tuple
+        The chosen indices and their smallest pairwise distance.
+    """
+
+    distances = np.asarray(distances, dtype=np.float64)
+    n = len(distances)
+    if k > n:
+        raise ValueError(f"Cannot pick {k} colors from {n} candidates")
+    if k <= 1:
+        return list(range(k)), math.inf
+
+    def score(indices) -> float:
+        sub = distances[np.ix_(indices, indices)]
+        return float(sub[np.triu_indices(len(indices), 1)].min())
+
+    # Greedy start: the farthest pair, then repeatedly the farthest color from the chosen ones
+    i, j = np.unravel_index(np.argmax(distances), distances.shape)
+    best = [int(i), int(j)]
+    while len(best) < k:
+        closest = distances[:, best].min(axis=1)
+        closest[best] = -1
+        best.append(int(np.argmax(closest)))
+    best_score = score(best)
+
+    while True:
+        found = _find_clique(distances > best_score, k)
+        if found is None:
+            return sorted(best), best_score
+        best, best_score = found, score(found)
+
+
+def colorblind_min_distance(colors, deficiencies: Optional[Iterable[str]] = None) -> float:
+    """Smallest simulated distance between any two ``colors`` over ``deficiencies``."""
+
+    colors = np.asarray(colors, dtype=np.float64)
+    if len(colors) < 2:
+        return math.inf
+    distances = cvd_distances(colors, deficiencies or DEFICIENCIES)
+    return float(distances[np.triu_indices(len(colors), 1)].min())
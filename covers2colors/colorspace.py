@@ -0,0 +1,133 @@
+"""Conversions between sRGB and the perceptual CIELAB and OKLab spaces.
+
+Clustering and distinctness in a perceptual space follow perceived color
+difference far better than raw sRGB. Converting millions of pixels with the
+full formulas would dominate the run time, so :func:`pixels_to_space` looks
+every pixel up in a table of ``2**LUT_BITS`` levels per channel that is built
+once per space on first use (3 MiB of float32 at the default 6 bits). The
+table stores the exact conversion of each bin's center, which keeps the
+quantization error of cluster means well below one CIELAB unit. Small arrays
+such as centroids or colormap colors use the exact :func:`to_space` and
+:func:`from_space`.
+"""
+
+from typing import Dict
+
+import numpy as np
+
+SPACES = ("rgb", "lab", "oklab")
+LUT_BITS = 6
+
+# Linear sRGB to CIE XYZ with a D65 white point
+_RGB_TO_XYZ = np.array(
+    [
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ]
+)
+_XYZ_TO_RGB = np.linalg.inv(_RGB_TO_XYZ)
+_WHITE = _RGB_TO_XYZ.sum(axis=1)
+_DELTA = 6 / 29
+
+# Linear sRGB to LMS and cube root LMS to OKLab, from Björn Ottosson
+_RGB_TO_LMS = np.array(
+    [
+        [0.4122214708, 0.5363325363, 0.0514459929],
+        [0.2119034982, 0.6806995451, 0.1073969566],
+        [0.0883024619, 0.2817188376, 0.6299787005],
+    ]
+)
+_LMS_TO_OKLAB = np.array(
+    [
+        [0.2104542553, 0.7936177850, -0.0040720468],
+        [1.9779984951, -2.4285922050, 0.4505937099],
+        [0.0259040371, 0.7827717662, -0.8086757660],
+    ]
+)
+_LMS_TO_RGB = np.linalg.inv(_RGB_TO_LMS)
+_OKLAB_TO_LMS = np.linalg.inv(_LMS_TO_OKLAB)
+
+_luts: Dict[str, np.ndarray] = {}
+
+
+def _check_space(space: str) -> None:
+    if space not in SPACES:
+        raise ValueError(f"Unknown color space: {space}")
+
+
+def _to_linear(rgb: np.ndarray) -> np.ndarray:
+    return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+
+
+def _from_linear(rgb: np.ndarray) -> np.ndarray:
+    rgb = np.clip(rgb, 0, 1)
+    return np.where(rgb <= 0.0031308, rgb * 12.92, 1.055 * rgb ** (1 / 2.4) - 0.055)
+
+
+def to_space(rgb, space: str) -> np.ndarray:
+    """Convert ``(n, 3)`` sRGB values between 0 and 1 to ``space`` exactly."""
+
+    _check_space(space)
+    rgb = np.asarray(rgb, dtype=np.float64)[..., :3]
+    if space == "rgb":
+        return rgb.copy()
+    linear = _to_linear(rgb)
+    if space == "lab":
+        t = linear @ _RGB_TO_XYZ.T / _WHITE
+        f = np.where(t > _DELTA**3, np.cbrt(t), t / (3 * _DELTA**2) + 4 / 29)
+        return np.stack(
+            [116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])],
+            axis=-1,
+        )
+    return np.cbrt(linear @ _RGB_TO_LMS.T) @ _LMS_TO_OKLAB.T
+
+
+def from_space(values, space: str) -> np.ndarray:
+    """Convert ``(n, 3)`` values in ``space`` back to sRGB between 0 and 1.
+
+    Colors outside the sRGB gamut are clipped.
+    """
+
+    _check_space(space)
+    values = np.asarray(values, dtype=np.float64)
+    if space == "rgb":
+        return np.clip(values, 0, 1)
+    if space == "lab":
+        fy = (values[..., 0] + 16) / 116
+        f = np.stack([fy + values[..., 1] / 500, fy, fy - values[..., 2] / 200], axis=-1)
+        t = np.where(f > _DELTA, f**3, 3 * _DELTA**2 * (f - 4 / 29))
+        linear = (t * _WHITE) @ _XYZ_TO_RGB.T
+    else:
+        linear = ((values @ _OKLAB_TO_LMS.T) ** 3) @ _LMS_TO_RGB.T
+    return np.clip(_from_linear(linear), 0, 1)
+
+
+def space_lut(space: str) -> np.ndarray:
+    """Return the ``(2**(3 * LUT_BITS), 3)`` float32 lookup table for ``space``."""
+
+    _check_space(space)
+    lut = _luts.get(space)
+    if lut is None:
+        levels = 1 << LUT_BITS
+        step = 256 / levels
+        centers = (np.arange(levels) * step + (step - 1) / 2) / 255
+        grid = np.stack(np.meshgrid(centers, centers, centers, indexing="ij"), axis=-1)
+        lut = to_space(grid.reshape(-1, 3), space).astype(np.float32)
+        _luts[space] = lut
+    return lut
+
+
+def pixels_to_space(pixels: np.ndarray, space: str) -> np.ndarray:
+    """Convert ``(n, 3)`` 0-255 integer pixels to ``space`` by table lookup.
+
+    ``"rgb"`` returns the pixels unchanged.
+    """
+
+    _check_space(space)
+    if space == "rgb":
+        return pixels
+    shift = 8 - LUT_BITS
+    q = np.asarray(pixels)[:, :3].astype(np.intp) >> shift
+    idx = (q[:, 0] << (2 * LUT_BITS)) | (q[:, 1] << LUT_BITS) | q[:, 2]
+    return space_lut(space)[idx]
@@ -1,32 +1,60 @@
+import asyncio
 import colorsys
+import copy
+import hashlib
+import io
+import threading
 from urllib.error import HTTPError
 from urllib.error import URLError
 from urllib.request import urlopen
 import json
 from pathlib import Path
 from typing import Optional, Union
-import matplotlib.pyplot as plt
 import matplotlib as mpl
-from mpl_toolkits.axes_grid1 import make_axes_locatable
 import numpy as np
-from kneed import KneeLocator
 from PIL import Image
 from sklearn.cluster import KMeans
 from matplotlib.colors import ListedColormap
 from sklearn.cluster import MiniBatchKMeans
-from .album_art import get_best_cover_art_url, load_api_keys
-from .colorblind import is_colorblind_friendly
+from .aio import aget_best_cover_art_url, run_cpu, run_io
+from .album_art import fetch_cover_bytes, get_best_cover_art_url, load_api_keys
+from .cache import ResultCache
+from .colorblind import DEFICIENCIES, cvd_distances, is_colorblind_friendly, max_min_subset
+from .colorspace import SPACES, from_space, pixels_to_space, to_space
+from .phash import color_signature, difference_hash
+from .prefilter import PixelFilter
+from .profiling import NULL_TRACER, Tracer
+from .quantize import histogram_coverage, quantize_image
+from .render import render_colorbar, render_contact_sheet, render_swatch, swatch_svg, to_png_bytes
+from .streaming import DEFAULT_BITS, DEFAULT_TILE_PIXELS, ColorHistogram, image_histogram
 from scipy.spatial.distance import pdist, squareform
 
 # Directory where palettes are stored
 PALETTE_DIR = Path.home() / ".covers2colors" / "palettes"
 INDEX_FILE = PALETTE_DIR / "index.json"
+# Thumbnails and swatch strips stored alongside saved palettes
+PREVIEW_DIR = PALETTE_DIR / "previews"
+THUMBNAIL_SIZE = 128
+SWATCH_SIZE = (256, 32)
+# Largest share of a cover's pixels that iter_palettes still samples
+PROGRESSIVE_MAX_FRACTION = 0.25
+
 
 def _ensure_palette_dir() -> None:
     """Create the palette directory if it does not exist."""
     PALETTE_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def _preview_path(entry: dict, key: str) -> Optional[Path]:
+    """Return the stored preview file ``key`` of an index ``entry`` if present."""
+
+    rel = entry.get(key)
+    if not rel:
+        return None
+    path = PALETTE_DIR / rel
+    return path if path.exists() else None
+
+
 def _load_index(assign_ids: bool = False) -> list:
     """Return the contents of ``index.json`` upgrading entries if needed.
 
@@ -59,6 +87,10 @@ def _load_index(assign_ids: bool = False) -> list:
 
     return data
 
+class GenerationCancelled(Exception):
+    """Raised inside a palette generation when its cancel event is set."""
+
+
 class CoverPalette:
     """
     A class to convert album artwork to a numpy array of RGB values.
@@ -71,18 +103,59 @@ class CoverPalette:
         image_path (str): The URL of the cover art image.
         album (str): The name of the album.
         image (PIL.Image): The PIL Image object of the cover art.
-        pixels (numpy.ndarray): A numpy array of RGB values representing the cover art.
+        pixels (numpy.ndarray): A uint8 numpy array of RGB values representing the cover art
+            after ``prefilter``. ``None`` in streaming mode.
+        histogram (ColorHistogram | None): Color histogram used instead of
+            ``pixels`` in streaming mode.
+        n_pixels (int): Number of pixels considered for clustering.
+        prefilter (PixelFilter | None): Pre-filter applied while decoding.
+        phash (int): 64 bit difference hash of the cover, see :mod:`covers2colors.phash`.
+        color_signature (numpy.ndarray): Coarse RGB thumbnail checked along with ``phash``.
         transparent_pixels (numpy.ndarray): A boolean numpy array where True indicates the corresponding pixel in the cover art is transparent.
-        kmeans (KMeans): The KMeans object after fitting to the RGB values. None if the `fit_kmeans` method has not been called.
+        kmeans (KMeans): The KMeans object after fitting to the RGB values. None if the `fit_kmeans` method has not been called
+            or the latest result came from the cache or from precomputed fits.
         hexcodes (list): The list of hexcodes representing the dominant colors in the cover art. None if the `get_hexcodes` method has not been called.
         is_colorblind_friendly (bool | None): Result of automatically checking
             the latest generated palette for color-blind friendliness.
+        tracer (Tracer): Records per-stage timings. A no-op tracer unless one
+            is passed to the constructor.
+        cache (ResultCache | None): Cache of generated palettes. Only seeded
+            runs (``random_state`` not None) are cached.
+        thumbnail_path (Path | None): Stored thumbnail of a palette loaded from
+            the index. Used instead of ``image_path`` when previewing.
     """
 
-    def __init__(self, artist, album):
+    # Event checked before every k-means fit, set while iter_palettes runs
+    _cancel = None
+
+    def __init__(
+        self,
+        artist,
+        album,
+        tracer: Optional[Tracer] = None,
+        cache: Optional[ResultCache] = None,
+        streaming: bool = False,
+        tile_pixels: int = DEFAULT_TILE_PIXELS,
+        prefilter: Optional[PixelFilter] = None,
+    ):
         """
         Initializes the CoverPalette object by fetching the cover art and converting it to a numpy array of RGB values.
+
+        ``tracer`` records the duration of provider lookups, the download,
+        decoding and every later palette generation step. ``cache`` stores
+        seeded palette results keyed by the cover's pixels so repeated runs
+        skip the clustering. With ``streaming`` the cover is read in strips
+        of at most ``tile_pixels`` pixels into a color histogram instead of a
+        full pixel array, which bounds memory for very large scans.
+        ``prefilter`` is a :class:`~covers2colors.prefilter.PixelFilter`
+        dropping borders, transparent or out-of-threshold pixels and
+        subsampling the rest while decoding.
         """
+        self.tracer = tracer or NULL_TRACER
+        self.cache = cache
+        self.streaming = streaming
+        self.tile_pixels = tile_pixels
+        self.prefilter = prefilter
         api_key, discogs_token = load_api_keys()
 
         cover_art_url = get_best_cover_art_url(
@@ -90,6 +163,7 @@ class CoverPalette:
             album,
             api_key=api_key,
             user_token=discogs_token,
+            tracer=self.tracer,
         )
         if not cover_art_url:
             raise ValueError(f"Cover art not found for {artist} - {album}")
@@ -97,23 +171,220 @@ class CoverPalette:
         self.artist = artist
         self.image_path = cover_art_url
         self.album = album
+        self._set_image(self._download(self.image_path, self.tracer))
+
+    @staticmethod
+    def _download(url: str, tracer: Tracer) -> Image.Image:
+        """Fetch the cover at ``url`` and open it without decoding the pixels."""
+
         try:
-            self.image = Image.open(urlopen(self.image_path))
+            data = fetch_cover_bytes(url, tracer)
+            return Image.open(io.BytesIO(data))
         except (URLError, HTTPError) as error:
-            raise URLError(f"Could not open {self.image_path} {error}") from error
-        except ValueError as error:
-            raise ValueError(f"Could not open {self.image_path} {error}") from error
+            raise URLError(f"Could not open {url} {error}") from error
+        except (ValueError, OSError) as error:
+            raise ValueError(f"Could not open {url} {error}") from error
+
+    @classmethod
+    async def acreate(
+        cls,
+        artist,
+        album,
+        tracer: Optional[Tracer] = None,
+        cache: Optional[ResultCache] = None,
+        streaming: bool = False,
+        tile_pixels: int = DEFAULT_TILE_PIXELS,
+        prefilter: Optional[PixelFilter] = None,
+        io_executor=None,
+        cpu_executor=None,
+    ):
+        """Async counterpart of the constructor for use inside an event loop.
+
+        Provider lookups and the download run on ``io_executor`` and decoding
+        on ``cpu_executor``. Both default to the shared executors of
+        :mod:`covers2colors.aio`.
 
-        # convert the image to a numpy array
-        self.image = self.image.convert("RGBA")
-        self.pixels = np.array(self.image.getdata())
+        Useage:
+            >>> palette = await CoverPalette.acreate("Nirvana", "Nevermind")
+        """
+        palette = cls.__new__(cls)
+        palette.tracer = tracer or NULL_TRACER
+        palette.cache = cache
+        palette.streaming = streaming
+        palette.tile_pixels = tile_pixels
+        palette.prefilter = prefilter
+        cover_art_url = await aget_best_cover_art_url(
+            artist, album, tracer=palette.tracer, executor=io_executor
+        )
+        if not cover_art_url:
+            raise ValueError(f"Cover art not found for {artist} - {album}")
+
+        palette.artist = artist
+        palette.image_path = cover_art_url
+        palette.album = album
+        image = await run_io(cls._download, cover_art_url, palette.tracer, executor=io_executor)
+        await run_cpu(palette._set_image, image, executor=cpu_executor)
+        return palette
+
+    @classmethod
+    def from_image(
+        cls,
+        image,
+        artist: Optional[str] = None,
+        album: Optional[str] = None,
+        tracer: Optional[Tracer] = None,
+        cache: Optional[ResultCache] = None,
+        streaming: bool = False,
+        tile_pixels: int = DEFAULT_TILE_PIXELS,
+        prefilter: Optional[PixelFilter] = None,
+    ):
+        """Create a ``CoverPalette`` from a local image without any API lookups.
+
+        Parameters
+        ----------
+        image : str, Path or PIL.Image.Image
+            Path to an image file or an already opened image.
+        artist, album : str, optional
+            Metadata recorded when the palette is saved.
+        tracer : Tracer, optional
+            Records the duration of decoding and palette generation.
+        cache : ResultCache, optional
+            Cache of seeded palette results.
+        streaming : bool, optional
+            Read the image in strips of ``tile_pixels`` pixels into a color
+            histogram instead of a full pixel array.
+        prefilter : PixelFilter, optional
+            Pixels dropped or subsampled while decoding, see
+            :mod:`covers2colors.prefilter`.
+        """
 
-        # Find transparent pixels and store them in case we want to remove transparency
-        self.transparent_pixels = self.pixels[:, 3] == 0
-        self.pixels = self.pixels[:, :3]
+        palette = cls.__new__(cls)
+        palette.tracer = tracer or NULL_TRACER
+        palette.cache = cache
+        palette.streaming = streaming
+        palette.tile_pixels = tile_pixels
+        palette.prefilter = prefilter
+        palette.artist = artist
+        palette.album = album
+        palette.image_path = None
+        if isinstance(image, (str, Path)):
+            palette.image_path = Path(image).resolve().as_uri()
+            image = Image.open(image)
+        palette._set_image(image)
+        return palette
+
+    def _set_image(self, image: Image.Image) -> None:
+        """Decode ``image`` into ``self.pixels`` (or ``self.histogram``) and reset generated results."""
+
+        with self.tracer.span("decode", size=list(image.size), streaming=self.streaming) as span:
+            if self.streaming:
+                # Only a color histogram is kept, the image is read strip by strip
+                self.image = image
+                self.pixels = None
+                self.transparent_pixels = None
+                if self.prefilter is None:
+                    self.histogram = image_histogram(image, self.tile_pixels)
+                else:
+                    self.histogram = self._filtered_histogram(image)
+                self.n_pixels = self.histogram.n_pixels
+            else:
+                # convert the image to a uint8 numpy array
+                self.image = image.convert("RGBA")
+                if self.prefilter is None:
+                    rgba = np.asarray(self.image).reshape(-1, 4)
+                else:
+                    box = self.prefilter.crop_box(self.image)
+                    cropped = self.image.crop(box) if box is not None else self.image
+                    rgba = self.prefilter.apply(np.asarray(cropped).reshape(-1, 4))
+
+                # Find transparent pixels and store them in case we want to remove transparency
+                self.transparent_pixels = rgba[:, 3] == 0
+                self.pixels = rgba[:, :3]
+                self.histogram = None
+                self.n_pixels = len(self.pixels)
+            span["pixels"] = self.n_pixels
+            # Perceptual hash and colors used to recognize the same artwork under another URL
+            self.phash = difference_hash(self.image)
+            self.color_signature = color_signature(self.image)
         self.kmeans = None
+        self.inertia = None
         self.hexcodes = None
         self.is_colorblind_friendly = None
+        self.thumbnail_path = None
+        self.fitted_k = None
+        self._pixels_hash = None
+        self._space_pixels = {}
+        self._color_histogram = None
+        self._fits = {}
+
+    def _filtered_histogram(self, image: Image.Image) -> ColorHistogram:
+        """Histogram of the pixels of ``image`` kept by ``self.prefilter``."""
+
+        histogram = ColorHistogram()
+        for strip in self.prefilter.iter_strips(image, self.tile_pixels):
+            histogram.add(strip)
+        if histogram.n_pixels == 0 and self.prefilter.thresholds:
+            # No pixel passes the HSV thresholds, fall back to ignoring them
+            histogram = ColorHistogram()
+            for strip in self.prefilter.iter_strips(image, self.tile_pixels, thresholds=False):
+                histogram.add(strip)
+        return histogram
+
+    @property
+    def pixels_hash(self) -> str:
+        """SHA-256 of ``self.pixels`` used to key cached results."""
+
+        if self._pixels_hash is None:
+            if self.histogram is not None:
+                digest = hashlib.sha256(f"histogram{self.histogram.bits}".encode("utf-8"))
+                digest.update(np.ascontiguousarray(self.histogram.counts).data)
+                digest.update(np.ascontiguousarray(self.histogram.sums).data)
+            else:
+                pixels = np.ascontiguousarray(self.pixels)
+                digest = hashlib.sha256(f"{pixels.dtype}{pixels.shape}".encode("utf-8"))
+                digest.update(pixels.data)
+            self._pixels_hash = digest.hexdigest()
+        return self._pixels_hash
+
+    def _cached(self, operation: str, params: dict, compute):
+        """Return ``compute()`` through ``self.cache`` when the run is seeded."""
+
+        if self.cache is None or params.get("random_state") is None:
+            return compute()
+        key = self._cache_key(operation, params)
+        value = self.cache.get(key)
+        if value is not None:
+            self.tracer.count("cache.hit")
+            return value
+        self.tracer.count("cache.miss")
+        value = compute()
+        self.cache.put(key, value)
+        return value
+
+    def _cache_key(self, operation: str, params: dict) -> str:
+        if self._fits:
+            # Batched fits differ from scikit-learn's for the same seed
+            params = dict(params, kernel="batched")
+        return self.cache.key(self.pixels_hash, operation, params)
+
+    def _is_cached(self, operation: str, params: dict) -> bool:
+        """Return whether :meth:`_cached` would answer ``operation`` from the cache."""
+
+        if self.cache is None or params.get("random_state") is None:
+            return False
+        return self.cache.get(self._cache_key(operation, params)) is not None
+
+    @staticmethod
+    def _optimal_params(max_colors, random_state, search, min_gain, space) -> dict:
+        """Return the cache parameters of :meth:`generate_optimal_cmap`."""
+
+        return {
+            "max_colors": max_colors,
+            "random_state": random_state,
+            "search": search,
+            "min_gain": min_gain if search == "adaptive" else None,
+            "space": space,
+        }
 
     def hexcodes_to_hsv(self):
         """Return ``self.hexcodes`` converted to HSV values."""
@@ -153,7 +424,7 @@ class CoverPalette:
         filtered = colors[mask]
         return filtered if len(filtered) > 0 else colors
 
-    def generate_cmap(self, n_colors=4, palette_name = None, random_state=None):
+    def generate_cmap(self, n_colors=4, palette_name = None, random_state=None, space: str = "rgb"):
         """Generates a matplotlib ListedColormap from an image.
 
         Args:
@@ -164,20 +435,101 @@ class CoverPalette:
                 The k-means algorithm has a random initialization step and doesn't always converge on the same
                 solution because of this. If None will be a different seed each time this method is called.
                 Defaults to None.
+            space (str, optional): Color space the pixels are clustered in, ``"rgb"``,
+                ``"lab"`` (CIELAB) or ``"oklab"``. The perceptual spaces group colors the
+                way they are seen and usually need fewer colors. Defaults to ``"rgb"``.
 
         Returns:
             matplotlib.colors.ListedColormap: A matplotlib ListedColormap object.
         """
-        # create a kmeans model
-        self.kmeans = MiniBatchKMeans(n_clusters=n_colors, random_state=random_state, n_init=3)
-        # fit the model to the pixels
-        self.kmeans.fit(self.pixels)
+        if space not in SPACES:
+            raise ValueError(f"Unknown color space: {space}")
+        # Only a fit sets an estimator, a cached or precomputed result leaves none
+        self.kmeans = None
+        result = self._cached(
+            "cmap",
+            {"n_colors": n_colors, "random_state": random_state, "space": space},
+            lambda: self._fit(n_colors, random_state, space),
+        )
+        self.inertia = result["inertia"]
         # get the cluster centers
-        centroids = self.kmeans.cluster_centers_ / 255
+        centroids = np.array(result["centroids"]) / 255
         # return the palette
         if not palette_name:
             palette_name = self.album
-        cmap = mpl.colors.ListedColormap(centroids, name=palette_name)
+        cmap = self._make_cmap(centroids, palette_name)
+
+        self.hexcodes = [mpl.colors.rgb2hex(c) for c in cmap.colors]
+        self.is_colorblind_friendly = self.colorblind_friendly(cmap)
+        return cmap
+
+    def _fit(self, n_colors: int, random_state: Optional[int], space: str = "rgb") -> dict:
+        """Fit k-means with ``n_colors`` clusters in ``space``.
+
+        Returns the centroids as 0-255 RGB values and the inertia measured in ``space``.
+        """
+
+        if self._cancel is not None and self._cancel.is_set():
+            raise GenerationCancelled(f"Cancelled before fitting k={n_colors}")
+        precomputed = self._fits.get((space, n_colors))
+        if precomputed is not None:
+            self.kmeans = None
+            self.tracer.count("fit.precomputed")
+            return precomputed
+        with self.tracer.span("fit", k=n_colors, pixels=self.n_pixels, space=space) as span:
+            if self.histogram is not None:
+                # The occupied bins are few enough for full k-means, weighted by pixel counts
+                means, counts = self.histogram.weighted_means()
+                if space != "rgb":
+                    means = to_space(means / 255, space)
+                self.kmeans = KMeans(n_clusters=n_colors, random_state=random_state, n_init=3)
+                self.kmeans.fit(means, sample_weight=counts)
+                inertia = self.kmeans.inertia_
+                if space == "rgb":
+                    inertia += self.histogram.within_ss
+            else:
+                # create a kmeans model
+                self.kmeans = MiniBatchKMeans(n_clusters=n_colors, random_state=random_state, n_init=3)
+                # fit the model to the pixels
+                self.kmeans.fit(self._pixels_in(space))
+                inertia = self.kmeans.inertia_
+            span["inertia"] = inertia
+        centroids = self.kmeans.cluster_centers_
+        if space != "rgb":
+            centroids = from_space(centroids, space) * 255
+        return {
+            "centroids": np.asarray(centroids, dtype=float).tolist(),
+            "inertia": float(inertia),
+        }
+
+    def add_fits(self, fits: dict, space: str = "rgb") -> None:
+        """Use precomputed k-means results instead of fitting those k values.
+
+        ``fits`` maps k to ``{"centroids": [...], "inertia": float}`` with
+        0-255 RGB centroids, as returned per cover by
+        :func:`covers2colors.kmeans.fit_histograms`. Later generation in
+        ``space`` reuses them, any other k is still fitted. The fits are
+        dropped when the cover's pixels change.
+        """
+
+        for k, result in fits.items():
+            self._fits[(space, int(k))] = result
+
+    def _pixels_in(self, space: str) -> np.ndarray:
+        """Return ``self.pixels`` converted to ``space``, converting once per image."""
+
+        if space == "rgb":
+            return self.pixels
+        if space not in self._space_pixels:
+            with self.tracer.span("convert", space=space, pixels=self.n_pixels):
+                self._space_pixels[space] = pixels_to_space(self.pixels, space)
+        return self._space_pixels[space]
+
+    @staticmethod
+    def _make_cmap(colors, palette_name: Optional[str]) -> ListedColormap:
+        """Return a hue sorted ListedColormap of 0-1 RGB(A) ``colors``."""
+
+        cmap = mpl.colors.ListedColormap(np.asarray(colors, dtype=float), name=palette_name)
 
         # Handle 4 dimension RGBA colors
         cmap.colors = cmap.colors[:, :3]
@@ -187,12 +539,17 @@ class CoverPalette:
         # Handle cases where all rgb values evaluate to 1 or 0. This is a temporary fix
         cmap.colors = np.where(np.isclose(cmap.colors, 1), 1 - 1e-6, cmap.colors)
         cmap.colors = np.where(np.isclose(cmap.colors, 0), 1e-6, cmap.colors)
-
-        self.hexcodes = [mpl.colors.rgb2hex(c) for c in cmap.colors]
-        self.is_colorblind_friendly = self.colorblind_friendly(cmap)
         return cmap
 
-    def generate_optimal_cmap(self, max_colors=10, palette_name=None, random_state=None):
+    def generate_optimal_cmap(
+        self,
+        max_colors=10,
+        palette_name=None,
+        random_state=None,
+        search: str = "full",
+        min_gain: float = 0.01,
+        space: str = "rgb",
+    ):
         """Generates an optimal matplotlib ListedColormap from an image by finding the optimal number of clusters using the elbow method.
 
         Useage:
@@ -203,10 +560,19 @@ class CoverPalette:
 
 
         Args:
-            max_colors (int, optional): _description_. Defaults to 10.
-            palette_name (_type_, optional): _description_. Defaults to None.
-            random_state (_type_, optional): _description_. Defaults to None.
-            remove_background (_type_, optional): _description_. Defaults to None.
+            max_colors (int, optional): The largest number of colors to consider. Defaults to 10.
+            palette_name (str, optional): A name for the created palettes. Defaults to the album name.
+            random_state (int, optional): The seed for the k-means initialization. Defaults to None.
+            search (str, optional): ``"full"`` fits every k from 2 to ``max_colors``.
+                ``"adaptive"`` fits a coarse set of k values, stops once the
+                inertia curve flattens and then refines around the knee, so
+                only a subset of k is fitted. Defaults to ``"full"``.
+            min_gain (float, optional): Used by the adaptive search. The sweep
+                stops growing k once the inertia drop per additional color falls
+                below this fraction of the inertia at k=2. Defaults to 0.01.
+            space (str, optional): ``"rgb"``, ``"lab"`` or ``"oklab"`` color space to
+                cluster in, see :meth:`generate_cmap`. The SSD values are measured in
+                this space. Defaults to ``"rgb"``.
 
         Returns:
             dict: A dictionary of matplotlib ListedColormap objects.
@@ -214,17 +580,27 @@ class CoverPalette:
             int: The optimal number of colors.
             dict: A dictionary of the sum of square distances from each point to the cluster center.
             Keys are the number of colors (clusters) and values are the SSD value.
+
+        The k values that were actually fitted are stored on ``self.fitted_k``.
         """
-        ssd = dict()
-        cmaps = dict()
         if not palette_name:
             palette_name = self.album
-        for n_colors in range(2, max_colors + 1):
-            cmap = self.generate_cmap(n_colors=n_colors, palette_name=palette_name, random_state=random_state)
-            cmaps[n_colors] = cmap
-            ssd[n_colors] = self.kmeans.inertia_
+        if search not in ("full", "adaptive"):
+            raise ValueError(f"Unknown search mode: {search}")
+        if space not in SPACES:
+            raise ValueError(f"Unknown color space: {space}")
+
+        params = self._optimal_params(max_colors, random_state, search, min_gain, space)
+        result = self._cached(
+            "optimal_cmap",
+            params,
+            lambda: self._sweep(max_colors, palette_name, random_state, search, min_gain, space),
+        )
+        cmaps = {int(k): self._make_cmap(c, palette_name) for k, c in result["colors"].items()}
+        ssd = {int(k): v for k, v in result["ssd"].items()}
+        best_n_colors = result["knee"]
+        self.fitted_k = list(ssd)
 
-        best_n_colors = KneeLocator(list(ssd.keys()), list(ssd.values()), curve="convex", direction="decreasing").knee
         try:
             self.hexcodes = [mpl.colors.rgb2hex(c) for c in cmaps[best_n_colors].colors]
         except KeyError:
@@ -233,7 +609,87 @@ class CoverPalette:
         if best_n_colors in cmaps:
             self.is_colorblind_friendly = self.colorblind_friendly(cmaps[best_n_colors])
         return cmaps, best_n_colors, ssd
-    
+
+    def _sweep(self, max_colors, palette_name, random_state, search, min_gain, space="rgb") -> dict:
+        """Fit the k values for ``search`` and return colors, SSD and knee."""
+
+        ssd = dict()
+        cmaps = dict()
+
+        def fit(n_colors):
+            cmaps[n_colors] = self.generate_cmap(
+                n_colors=n_colors, palette_name=palette_name, random_state=random_state, space=space
+            )
+            ssd[n_colors] = self.inertia
+
+        with self.tracer.span("sweep", max_colors=max_colors, search=search, space=space) as span:
+            if search == "full":
+                for n_colors in range(2, max_colors + 1):
+                    fit(n_colors)
+            else:
+                self._adaptive_sweep(fit, ssd, max_colors, min_gain)
+            span["fitted_k"] = sorted(ssd)
+
+        with self.tracer.span("knee") as span:
+            best_n_colors = self._knee(ssd)
+            span["knee"] = best_n_colors
+
+        return {
+            "colors": {str(k): np.asarray(cmaps[k].colors).tolist() for k in sorted(cmaps)},
+            "ssd": {str(k): float(ssd[k]) for k in sorted(ssd)},
+            "knee": best_n_colors,
+        }
+
+    @staticmethod
+    def _knee(ssd: dict) -> Optional[int]:
+        """Return the elbow of the ``{k: inertia}`` curve or ``None``."""
+
+        # kneed imports matplotlib.pyplot so it is only loaded when needed
+        from kneed import KneeLocator
+
+        ks = sorted(ssd)
+        if len(ks) < 3:
+            return None
+        knee = KneeLocator(ks, [ssd[k] for k in ks], curve="convex", direction="decreasing").knee
+        return int(knee) if knee is not None else None
+
+    def _adaptive_sweep(self, fit, ssd: dict, max_colors: int, min_gain: float) -> None:
+        """Fit a subset of k values that is enough to locate the knee.
+
+        k grows geometrically (2, 3, 4, 6, 8, 12, ...) until ``max_colors`` or
+        until the inertia drop per extra color falls below ``min_gain`` times
+        the inertia at k=2. The gaps around the current knee are then bisected
+        until the knee's neighbours are adjacent k values.
+        """
+
+        coarse = [2, 3, 4]
+        while coarse[-1] < max_colors:
+            coarse.append(coarse[-1] + max(1, coarse[-1] // 2))
+        coarse = sorted({min(k, max_colors) for k in coarse} - {0, 1}) or [2]
+
+        prev = None
+        for k in coarse:
+            fit(k)
+            if prev is not None and ssd[coarse[0]] > 0:
+                gain = (ssd[prev] - ssd[k]) / (k - prev) / ssd[coarse[0]]
+                if gain < min_gain:
+                    break
+            prev = k
+
+        while True:
+            knee = self._knee(ssd)
+            if knee is None:
+                return
+            fitted = sorted(ssd)
+            i = fitted.index(knee)
+            lower = fitted[i - 1] if i > 0 else knee
+            upper = fitted[i + 1] if i + 1 < len(fitted) else knee
+            missing = [k for k in ((lower + knee) // 2, (knee + upper) // 2) if k not in ssd]
+            if not missing:
+                return
+            for k in missing:
+                fit(k)
+
     def get_distinct_colors(
         self,
         cmap,
@@ -241,6 +697,7 @@ class CoverPalette:
         light: bool = False,
         dark: bool = False,
         bold: bool = False,
+        space: str = "rgb",
     ):
         """Get the most distinct colors from a colormap.
 
@@ -248,6 +705,7 @@ class CoverPalette:
             cmap (matplotlib.colors.ListedColormap): The colormap.
             n_colors (int): The number of distinct colors to get.
             light, dark, bold (bool): Apply brightness/saturation filters.
+            space (str): Color space the colors are grouped in. Defaults to ``"rgb"``.
 
         Returns:
             list: A list of the most distinct RGB color tuples.
@@ -258,8 +716,8 @@ class CoverPalette:
         if len(colors) < n_colors:
             colors = np.array(cmap.colors)
 
-        kmeans = KMeans(n_clusters=n_colors, random_state=0, n_init=1).fit(colors)
-        distinct_colors = np.array(kmeans.cluster_centers_)
+        kmeans = KMeans(n_clusters=n_colors, random_state=0, n_init=1).fit(to_space(colors, space))
+        distinct_colors = from_space(kmeans.cluster_centers_, space)
         distinct_cmap = ListedColormap(distinct_colors)
 
         return distinct_colors, distinct_cmap
@@ -274,6 +732,9 @@ class CoverPalette:
         light: bool = False,
         dark: bool = False,
         bold: bool = False,
+        search: str = "full",
+        space: str = "rgb",
+        colorblind: bool = False,
     ):
         """Generates an optimal colormap and then picks the most distinct colors from it.
 
@@ -286,6 +747,14 @@ class CoverPalette:
                 saturation before measuring distinctness. ``light`` keeps bright
                 colors, ``dark`` keeps dim colors and ``bold`` prefers saturated
                 colors. Defaults to False.
+            search (str, optional): ``"full"`` or ``"adaptive"`` k search, see
+                :meth:`generate_optimal_cmap`. Defaults to ``"full"``.
+            space (str, optional): ``"rgb"``, ``"lab"`` or ``"oklab"``. Used for both the
+                clustering and the pairwise distances that measure distinctness.
+                Defaults to ``"rgb"``.
+            colorblind (bool, optional): Pick the colors with
+                :meth:`get_colorblind_safe_colors` so they stay apart for
+                protanopia, deuteranopia and tritanopia at once. Defaults to False.
 
         Returns:
             list: A list of the most distinct RGB color tuples.
@@ -293,30 +762,36 @@ class CoverPalette:
         """
         # Generate the optimal colormap
         cmaps, best_n_colors, ssd = self.generate_optimal_cmap(
-            max_colors, palette_name, random_state
+            max_colors, palette_name, random_state, search=search, space=space
         )
 
+        if colorblind:
+            return self._use_colorblind_safe_colors(
+                cmaps, n_distinct_colors, light=light, dark=dark, bold=bold, space=space
+            )
+
         max_distinctness = 0
         best_distinct_colors = None
         best_distinct_cmap = None
         # Pick the most distinct colors from the optimal colormap
-        for n_colors, cmap in cmaps.items():
-            if len(cmap.colors) < n_distinct_colors:
-                continue
-            
-            distinct_colors, distinct_cmap = self.get_distinct_colors(
-                cmap, n_distinct_colors, light=light, dark=dark, bold=bold
-            )
+        with self.tracer.span("select", n_colors=n_distinct_colors):
+            for n_colors, cmap in cmaps.items():
+                if len(cmap.colors) < n_distinct_colors:
+                    continue
+
+                distinct_colors, distinct_cmap = self.get_distinct_colors(
+                    cmap, n_distinct_colors, light=light, dark=dark, bold=bold, space=space
+                )
 
-            # Calculate the total pairwise distance between the colors
-            distinctness = np.sum(squareform(pdist(distinct_colors)))
+                # Calculate the total pairwise distance between the colors
+                distinctness = np.sum(squareform(pdist(to_space(distinct_colors, space))))
+
+                # If this set of colors is more distinct than the best so far, update the best
+                if distinctness > max_distinctness:
+                    max_distinctness = distinctness
+                    best_distinct_colors = distinct_colors
+                    best_distinct_cmap = distinct_cmap
 
-            # If this set of colors is more distinct than the best so far, update the best
-            if distinctness > max_distinctness:
-                max_distinctness = distinctness
-                best_distinct_colors = distinct_colors
-                best_distinct_cmap = distinct_cmap
-        
         best_distinct_colors = np.array(best_distinct_colors)
         self.hexcodes = [mpl.colors.rgb2hex(c) for c in best_distinct_colors]
         if best_distinct_cmap is not None:
@@ -324,6 +799,56 @@ class CoverPalette:
 
         return best_distinct_colors, best_distinct_cmap
 
+    def get_colorblind_safe_colors(
+        self,
+        cmaps: dict,
+        n_colors: int,
+        light: bool = False,
+        dark: bool = False,
+        bold: bool = False,
+        space: str = "rgb",
+    ):
+        """Pick the ``n_colors`` that are easiest to tell apart with any color vision deficiency.
+
+        Every color of every colormap in ``cmaps`` is a candidate. The chosen
+        subset maximizes the smallest distance between any two colors as seen
+        with protanopia, deuteranopia or tritanopia, so a palette that passes
+        all three checks is found without re-rolling ``random_state``.
+
+        Args:
+            cmaps (dict): Colormaps from :meth:`generate_optimal_cmap`.
+            n_colors (int): The number of colors to pick.
+            light, dark, bold (bool): Apply brightness/saturation filters.
+            space (str): Color space the simulated colors are compared in.
+
+        Returns:
+            numpy.ndarray: The chosen RGB colors.
+            matplotlib.colors.ListedColormap: A colormap of the chosen colors.
+            float: Smallest simulated distance between two chosen colors.
+        """
+        colors = np.unique(np.concatenate([np.asarray(c.colors)[:, :3] for c in cmaps.values()]), axis=0)
+        filtered = self._filter_colors(colors, light=light, dark=dark, bold=bold)
+        if len(filtered) >= n_colors:
+            colors = filtered
+        if len(colors) < n_colors:
+            raise ValueError(f"Only {len(colors)} candidate colors for {n_colors} colors")
+
+        with self.tracer.span("select_cvd", n_colors=n_colors, candidates=len(colors)) as span:
+            indices, min_distance = max_min_subset(cvd_distances(colors, space=space), n_colors)
+            span["min_distance"] = min_distance
+        safe_colors = colors[indices]
+        return safe_colors, ListedColormap(safe_colors), min_distance
+
+    def _use_colorblind_safe_colors(self, cmaps, n_colors, light, dark, bold, space):
+        """Select colors with :meth:`get_colorblind_safe_colors` and record them."""
+
+        colors, cmap, _ = self.get_colorblind_safe_colors(
+            cmaps, n_colors, light=light, dark=dark, bold=bold, space=space
+        )
+        self.hexcodes = [mpl.colors.rgb2hex(c) for c in colors]
+        self.is_colorblind_friendly = all(self.colorblind_friendly(cmap, d) for d in DEFICIENCIES)
+        return colors, cmap
+
     @staticmethod
     def _hue_distinctness(colors: np.ndarray) -> float:
         """Return a metric representing the total hue separation."""
@@ -355,28 +880,43 @@ class CoverPalette:
         light: bool = False,
         dark: bool = False,
         bold: bool = False,
+        search: str = "full",
+        space: str = "rgb",
+        colorblind: bool = False,
     ):
-        """Generate a colormap maximizing hue distinction."""
+        """Generate a colormap maximizing hue distinction.
 
-        cmaps, _, _ = self.generate_optimal_cmap(max_colors, palette_name, random_state)
+        ``space`` selects the color space of the underlying clustering, see
+        :meth:`generate_optimal_cmap`. With ``colorblind`` the colors are
+        picked by :meth:`get_colorblind_safe_colors` instead.
+        """
+
+        cmaps, _, _ = self.generate_optimal_cmap(
+            max_colors, palette_name, random_state, search=search, space=space
+        )
+        if colorblind:
+            return self._use_colorblind_safe_colors(
+                cmaps, n_distinct_colors, light=light, dark=dark, bold=bold, space=space
+            )
 
         best_distinct = 0
         best_colors = None
         best_cmap = None
-        for cmap in cmaps.values():
-            colors = np.array(cmap.colors)
-            if len(colors) < n_distinct_colors:
-                continue
-            filtered = self._filter_colors(colors, light=light, dark=dark, bold=bold)
-            if len(filtered) < n_distinct_colors:
-                filtered = colors
-            tmp_cmap = ListedColormap(filtered)
-            distinct, dcmap = self.get_hue_distinct_colors(tmp_cmap, n_distinct_colors)
-            d = self._hue_distinctness(distinct)
-            if d > best_distinct:
-                best_distinct = d
-                best_colors = distinct
-                best_cmap = dcmap
+        with self.tracer.span("select_hue", n_colors=n_distinct_colors):
+            for cmap in cmaps.values():
+                colors = np.array(cmap.colors)
+                if len(colors) < n_distinct_colors:
+                    continue
+                filtered = self._filter_colors(colors, light=light, dark=dark, bold=bold)
+                if len(filtered) < n_distinct_colors:
+                    filtered = colors
+                tmp_cmap = ListedColormap(filtered)
+                distinct, dcmap = self.get_hue_distinct_colors(tmp_cmap, n_distinct_colors)
+                d = self._hue_distinctness(distinct)
+                if d > best_distinct:
+                    best_distinct = d
+                    best_colors = distinct
+                    best_cmap = dcmap
 
         if best_colors is None:
             raise ValueError("Unable to select distinct hues with the given parameters")
@@ -385,29 +925,268 @@ class CoverPalette:
         self.hexcodes = [mpl.colors.rgb2hex(c) for c in best_colors]
         return best_colors, best_cmap
 
+    def iter_palettes(
+        self,
+        max_colors: int = 10,
+        n_distinct_colors: int = 4,
+        random_state: Optional[int] = None,
+        *,
+        hue: bool = False,
+        light: bool = False,
+        dark: bool = False,
+        bold: bool = False,
+        search: str = "full",
+        space: str = "rgb",
+        colorblind: bool = False,
+        sample_sizes=(2048, 16384, 131072),
+        cancel=None,
+    ):
+        """Yield increasingly refined distinct palettes.
+
+        The first palettes come from random samples of ``sample_sizes``
+        pixels clustered with the adaptive k search, so a usable palette is
+        available after a fraction of the full run. Samples larger than
+        ``PROGRESSIVE_MAX_FRACTION`` of the cover's pixels are skipped, and
+        so are all of them when the seeded final result is already cached. The last one is the
+        result of :meth:`generate_distinct_optimal_cmap` (or
+        :meth:`generate_hue_distinct_optimal_cmap` with ``hue``) on every
+        pixel. Stop iterating to keep the current palette, or set the
+        ``cancel`` event (e.g. a ``threading.Event``) from another thread to
+        abort before the next k-means fit.
+
+        Useage:
+            >>> for update in palette.iter_palettes():
+            ...     print(update["hexcodes"], update["quality"])
+
+        Yields:
+            dict: ``colors`` and ``cmap`` as returned by the generators,
+            ``hexcodes``, ``n_pixels`` clustered, ``fitted_k``, ``quality``
+            (fraction of the cover's color variance the palette explains,
+            measured on every pixel from its color histogram) and ``final``.
+            Distinct color selection trades coverage for separation, so
+            ``quality`` is not guaranteed to grow from one step to the next.
+        """
+        method = "generate_hue_distinct_optimal_cmap" if hue else "generate_distinct_optimal_cmap"
+        options = dict(
+            max_colors=max_colors,
+            n_distinct_colors=n_distinct_colors,
+            random_state=random_state,
+            light=light,
+            dark=dark,
+            bold=bold,
+            space=space,
+            colorblind=colorblind,
+        )
+        rng = np.random.default_rng(random_state)
+        # A seeded result already in the cache is cheaper than any sample. The
+        # distinct generators use generate_optimal_cmap's default min_gain.
+        if self._is_cached("optimal_cmap", self._optimal_params(max_colors, random_state, search, 0.01, space)):
+            sample_sizes = ()
+        self._cancel = cancel
+        try:
+            for size in sample_sizes:
+                # Samples close to the cover's size cost nearly as much as the full run
+                if size > PROGRESSIVE_MAX_FRACTION * self.n_pixels:
+                    break
+                sample = CoverPalette.from_image(
+                    Image.fromarray(self._sample_pixels(size, rng)[:, None, :], "RGB"),
+                    self.artist,
+                    self.album,
+                    tracer=self.tracer,
+                )
+                sample._cancel = cancel
+                with self.tracer.span("progressive", pixels=size):
+                    colors, cmap = getattr(sample, method)(search="adaptive", **options)
+                self.is_colorblind_friendly = sample.is_colorblind_friendly
+                yield self._progress(colors, cmap, size, sample.fitted_k, final=False)
+
+            colors, cmap = getattr(self, method)(search=search, **options)
+            yield self._progress(colors, cmap, self.n_pixels, self.fitted_k, final=True)
+        except GenerationCancelled:
+            return
+        finally:
+            self._cancel = None
+
+    def _sample_pixels(self, size: int, rng) -> np.ndarray:
+        """Return ``size`` random uint8 RGB pixels of the cover."""
+
+        if self.pixels is not None:
+            return self.pixels[rng.choice(len(self.pixels), size, replace=False)].astype(np.uint8)
+        # Streaming mode: draw histogram bins in proportion to their pixel counts
+        means, counts = self.histogram.weighted_means()
+        picks = rng.choice(len(means), size, p=counts / counts.sum())
+        return np.round(means[picks]).astype(np.uint8)
+
+    def _progress(self, colors, cmap, n_pixels: int, fitted_k, final: bool) -> dict:
+        """Describe one :meth:`iter_palettes` step and make it the current palette."""
+
+        self.hexcodes = [mpl.colors.rgb2hex(c) for c in np.asarray(colors)]
+        _, error = self.palette_coverage(cmap)
+        histogram = self.color_histogram()
+        mean = histogram.sums.sum(axis=0) / max(1, histogram.n_pixels)
+        variance = histogram.sq_norm / max(1, histogram.n_pixels) - float(mean @ mean)
+        return {
+            "colors": colors,
+            "cmap": cmap,
+            "hexcodes": self.hexcodes,
+            "n_pixels": n_pixels,
+            "fitted_k": fitted_k,
+            "quality": float(1 - error / variance) if variance > 0 else 1.0,
+            "final": final,
+        }
+
+    async def _arun(self, method, *args, executor=None, **kwargs):
+        """Await a generation ``method`` on the CPU executor.
+
+        Cancelling the awaiting task sets the palette's cancel event, so the
+        worker stops before its next k-means fit instead of finishing a
+        result nobody will read.
+        """
+        cancel = threading.Event()
+
+        def call():
+            self._cancel = cancel
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._cancel = None
+
+        try:
+            return await run_cpu(call, executor=executor)
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+
+    async def agenerate_cmap(self, *args, executor=None, **kwargs):
+        """Async :meth:`generate_cmap` run on ``executor`` or the shared CPU executor."""
+        return await self._arun(self.generate_cmap, *args, executor=executor, **kwargs)
+
+    async def agenerate_optimal_cmap(self, *args, executor=None, **kwargs):
+        """Async :meth:`generate_optimal_cmap` run on ``executor`` or the shared CPU executor."""
+        return await self._arun(self.generate_optimal_cmap, *args, executor=executor, **kwargs)
+
+    async def agenerate_distinct_optimal_cmap(self, *args, executor=None, **kwargs):
+        """Async :meth:`generate_distinct_optimal_cmap` run on ``executor`` or the shared CPU executor."""
+        return await self._arun(self.generate_distinct_optimal_cmap, *args, executor=executor, **kwargs)
+
+    async def agenerate_hue_distinct_optimal_cmap(self, *args, executor=None, **kwargs):
+        """Async :meth:`generate_hue_distinct_optimal_cmap` run on ``executor`` or the shared CPU executor."""
+        return await self._arun(self.generate_hue_distinct_optimal_cmap, *args, executor=executor, **kwargs)
+
+    async def aapply_palette(self, *args, executor=None, **kwargs):
+        """Async :meth:`apply_palette` run on ``executor`` or the shared CPU executor."""
+        return await self._arun(self.apply_palette, *args, executor=executor, **kwargs)
+
+    def color_histogram(self, bits: int = DEFAULT_BITS) -> ColorHistogram:
+        """Return a compact color histogram of the cover's pixels.
+
+        In streaming mode the histogram built while decoding is returned as is.
+        """
+
+        if self.histogram is not None:
+            return self.histogram
+        if self._color_histogram is None or self._color_histogram.bits != bits:
+            self._color_histogram = ColorHistogram(bits)
+            self._color_histogram.add(self.pixels.astype(np.uint8))
+        return self._color_histogram
+
+    def _palette_colors(self, cmap=None) -> np.ndarray:
+        """Return the 0-1 RGB colors of ``cmap`` or of ``self.hexcodes``."""
+
+        if cmap is not None:
+            return np.asarray(cmap.colors, dtype=float)[:, :3]
+        if not self.hexcodes:
+            raise ValueError("No palette has been generated")
+        return np.array([mpl.colors.to_rgb(h) for h in self.hexcodes])
+
+    def apply_palette(self, image=None, cmap=None, space: str = "rgb"):
+        """Recolor an image with the nearest color of a palette.
+
+        Every pixel is looked up in a cached table mapping RGB cells to the
+        nearest palette color (see :mod:`covers2colors.quantize`), so large
+        images cost one gather per pixel.
+
+        Args:
+            image (PIL.Image.Image | str | Path, optional): Image to recolor. Defaults to the cover.
+            cmap (matplotlib.colors.ListedColormap, optional): Palette to use.
+                Defaults to the last generated palette.
+            space (str, optional): Color space nearest colors are measured in. Defaults to ``"rgb"``.
+
+        Returns:
+            PIL.Image.Image: The posterized image in ``"P"`` mode.
+            numpy.ndarray: Fraction of pixels mapped to each palette color.
+            float: Mean squared RGB error per pixel, lower means the palette covers the image better.
+        """
+        colors = self._palette_colors(cmap)
+        if image is None:
+            image = self.image
+        elif isinstance(image, (str, Path)):
+            image = Image.open(image)
+        with self.tracer.span("apply_palette", colors=len(colors), size=list(image.size)) as span:
+            quantized, coverage, error = quantize_image(
+                image, colors, space=space, tile_pixels=self.tile_pixels
+            )
+            span["error"] = error
+        return quantized, coverage, error
+
+    def palette_coverage(self, cmap=None, space: str = "rgb"):
+        """Return the coverage and error :meth:`apply_palette` would report for the cover.
+
+        Computed from the cover's color histogram without recoloring any
+        pixels, which makes it a cheap way to compare palettes of different
+        sizes, e.g. every colormap returned by :meth:`generate_optimal_cmap`.
+
+        Returns:
+            numpy.ndarray: Fraction of pixels mapped to each palette color.
+            float: Mean squared RGB error per pixel.
+        """
+        return histogram_coverage(self.color_histogram(), self._palette_colors(cmap), space)
+
     def remove_transparent(self):
         """Removes the transparent pixels from an image array.
 
         Returns:
             None
         """
-        self.pixels = self.pixels[~self.transparent_pixels]
-
-    def display_with_colorbar(self, cmap):
+        if self.streaming:
+            if self.prefilter is None:
+                self.histogram = image_histogram(self.image, self.tile_pixels, drop_transparent=True)
+            elif not self.prefilter.transparent:
+                self.prefilter = copy.copy(self.prefilter)
+                self.prefilter.transparent = True
+                self.histogram = self._filtered_histogram(self.image)
+            self.n_pixels = self.histogram.n_pixels
+        else:
+            self.pixels = self.pixels[~self.transparent_pixels]
+            self.n_pixels = len(self.pixels)
+        self._pixels_hash = None
+        self._space_pixels = {}
+        self._color_histogram = None
+        self._fits = {}
+
+    def display_with_colorbar(self, cmap, backend: str = "matplotlib"):
         """
         Display an image with a colorbar.
 
         Parameters:
         cmap (matplotlib.colors.Colormap): The colormap to use.
+        backend (str): ``"matplotlib"`` opens an interactive figure while
+            ``"pil"`` renders the composite with PIL and opens it with the
+            system image viewer.
 
         Returns:
         None
         """
         try:
-            # Open the image from the URL
-            with urlopen(self.image_path) as url:
-                with Image.open(url) as img:
-                    img_array = np.array(img)
+            if backend == "pil":
+                self.render_preview(cmap, fmt="image").show()
+                return
+
+            import matplotlib.pyplot as plt
+            from mpl_toolkits.axes_grid1 import make_axes_locatable
+
+            # Open the stored thumbnail or the image from the URL
+            img_array = np.array(self._open_cover())
 
             # Create the plot
             fig, ax = plt.subplots(figsize=(7, 5))
@@ -426,13 +1205,22 @@ class CoverPalette:
         except Exception as e:
             print(f"Error displaying image with colorbar: {e}")
 
-    def preview_palette(self, cmap):
-        """Show the album cover alongside a sample plot using ``cmap``."""
+    def preview_palette(self, cmap, backend: str = "matplotlib"):
+        """Show the album cover alongside a sample plot using ``cmap``.
+
+        With ``backend="pil"`` a cover-plus-colorbar composite is rendered
+        without matplotlib and opened with the system image viewer.
+        """
 
         try:
-            with urlopen(self.image_path) as url:
-                with Image.open(url) as img:
-                    img_array = np.array(img)
+            if backend == "pil":
+                self.render_preview(cmap, fmt="image").show()
+                return
+
+            import matplotlib.pyplot as plt
+            from mpl_toolkits.axes_grid1 import make_axes_locatable
+
+            img_array = np.array(self._open_cover())
 
             fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4))
 
@@ -456,6 +1244,28 @@ class CoverPalette:
         except Exception as e:
             print(f"Error displaying preview: {e}")
 
+    def render_preview(self, cmap, fmt: str = "png"):
+        """Render the cover with a colorbar of ``cmap`` without matplotlib.
+
+        Parameters
+        ----------
+        cmap : matplotlib.colors.ListedColormap or sequence
+            Colormap or sequence of colors to draw.
+        fmt : str, optional
+            ``"png"`` returns PNG bytes of the composite, ``"svg"`` returns a
+            swatch strip as SVG bytes and ``"image"`` returns the PIL image.
+        """
+
+        colors = getattr(cmap, "colors", cmap)
+        if fmt == "svg":
+            return swatch_svg(colors, SWATCH_SIZE)
+        composite = render_colorbar(self._open_cover(), colors)
+        if fmt == "image":
+            return composite
+        if fmt == "png":
+            return to_png_bytes(composite)
+        raise ValueError(f"Unknown preview format: {fmt}")
+
     def colorblind_friendly(self, cmap, deficiency: str = "deuteranopia", threshold: float = 0.1) -> bool:
         """Return ``True`` if ``cmap`` remains distinct for a color vision deficiency.
 
@@ -471,9 +1281,11 @@ class CoverPalette:
         """
 
         colors = getattr(cmap, "colors", [])
-        return is_colorblind_friendly(colors, deficiency=deficiency, threshold=threshold)
+        with self.tracer.span("cvd_check", deficiency=deficiency) as span:
+            span["friendly"] = is_colorblind_friendly(colors, deficiency=deficiency, threshold=threshold)
+        return span["friendly"]
 
-    def save_palette(self, path: Optional[str] = None):
+    def save_palette(self, path: Optional[str] = None, store_previews: bool = False):
         """Save ``self.hexcodes`` and metadata and return the palette id.
 
         When ``path`` is ``None`` the palette is recorded only in
@@ -484,6 +1296,11 @@ class CoverPalette:
         numerical ``id`` which can be used for listing, loading and deleting
         palettes.
 
+        When ``store_previews`` is ``True`` a downsampled thumbnail of the
+        cover and a rendered swatch strip are written to ``PREVIEW_DIR`` and
+        referenced from the index so saved palettes can be previewed and
+        listed in the PDF without fetching the cover again.
+
         Returns
         -------
         int
@@ -524,12 +1341,48 @@ class CoverPalette:
             "path": str(json_path) if json_path else None,
         }
 
+        if store_previews:
+            metadata.update(self._store_previews(next_id))
+
         data.append(metadata)
         with INDEX_FILE.open("w") as f:
             json.dump(data, f, indent=2)
 
         return next_id
 
+    def _store_previews(self, palette_id: int) -> dict:
+        """Write a thumbnail and swatch for ``palette_id`` and return index fields."""
+
+        fields = {}
+        try:
+            PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+            if self.image is not None:
+                thumb = self.image.convert("RGB")
+                thumb.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+                thumb_path = PREVIEW_DIR / f"{palette_id}-thumb.jpg"
+                thumb.save(thumb_path, "JPEG", quality=85)
+                fields["thumbnail"] = str(thumb_path.relative_to(PALETTE_DIR))
+            swatch_path = PREVIEW_DIR / f"{palette_id}-swatch.png"
+            render_swatch(self.hexcodes, SWATCH_SIZE).save(swatch_path, "PNG", optimize=True)
+            fields["swatch"] = str(swatch_path.relative_to(PALETTE_DIR))
+        except OSError as e:
+            print(f"Error storing previews for palette {palette_id}: {e}")
+        return fields
+
+    def _open_cover(self) -> Image.Image:
+        """Return the cover image, preferring a stored thumbnail over the URL."""
+
+        if self.thumbnail_path:
+            with Image.open(self.thumbnail_path) as img:
+                img.load()
+                return img
+        if not self.image_path:
+            return self.image
+        with urlopen(self.image_path) as url:
+            with Image.open(url) as img:
+                img.load()
+                return img
+
     def load_palette(self, path: Union[str, Path]):
         """Load hexcodes from ``path`` and set ``self.hexcodes``.
 
@@ -569,6 +1422,7 @@ class CoverPalette:
                 else:
                     raise FileNotFoundError(f"Palette data for '{name}' missing")
                 self.image_path = entry.get("image_url", self.image_path)
+                self.thumbnail_path = _preview_path(entry, "thumbnail")
                 return
 
         raise FileNotFoundError(f"Saved palette '{name}' not found")
@@ -591,6 +1445,7 @@ class CoverPalette:
                 self.image_path = entry.get("image_url", self.image_path)
                 self.artist = entry.get("artist", self.artist)
                 self.album = entry.get("album", self.album)
+                self.thumbnail_path = _preview_path(entry, "thumbnail")
                 return
 
         raise FileNotFoundError(f"Saved palette id {palette_id} not found")
@@ -635,6 +1490,14 @@ class CoverPalette:
             except OSError:
                 pass
 
+        for key in ("thumbnail", "swatch"):
+            preview = _preview_path(removed_entry, key)
+            if preview:
+                try:
+                    preview.unlink()
+                except OSError:
+                    pass
+
         return True
 
     @staticmethod
@@ -673,12 +1536,63 @@ class CoverPalette:
         return PALETTE_DIR / "palettes.pdf"
 
     @staticmethod
-    def create_palettes_pdf(force: bool = False) -> Optional[Path]:
+    def _contact_sheet_rows(entries: list) -> list:
+        """Return ``(thumbnail, hexcodes, label)`` rows for ``entries``."""
+
+        rows = []
+        for entry in entries:
+            hexcodes = entry.get("hexcodes") or []
+            artist = (entry.get("artist") or "").title()
+            album = (entry.get("album") or "").title()
+            label = (
+                f"#{entry.get('id')} {artist} - {album}\n"
+                f"({entry.get('n_colors')} colors)\n"
+                + " ".join(hexcodes)
+            )
+
+            thumbnail = None
+            thumbnail_path = _preview_path(entry, "thumbnail")
+            img_url = entry.get("image_url")
+            try:
+                if thumbnail_path:
+                    with Image.open(thumbnail_path) as img:
+                        thumbnail = img.convert("RGB")
+                elif img_url:
+                    with urlopen(img_url) as url:
+                        with Image.open(url) as img:
+                            thumbnail = img.convert("RGB")
+                            thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            except Exception:
+                thumbnail = None
+            rows.append((thumbnail, hexcodes, label))
+        return rows
+
+    @staticmethod
+    def render_contact_sheet(entries: Optional[list] = None, fmt: str = "png"):
+        """Render saved palettes as a contact sheet without matplotlib.
+
+        ``entries`` defaults to every palette in ``index.json``. Returns PNG
+        bytes, or the PIL image when ``fmt`` is ``"image"``.
+        """
+
+        if entries is None:
+            entries = sorted(_load_index(assign_ids=True), key=lambda d: d.get("id", 0))
+        sheet = render_contact_sheet(CoverPalette._contact_sheet_rows(entries))
+        if fmt == "image":
+            return sheet
+        if fmt == "png":
+            return to_png_bytes(sheet)
+        raise ValueError(f"Unknown contact sheet format: {fmt}")
+
+    @staticmethod
+    def create_palettes_pdf(force: bool = False, backend: str = "pil") -> Optional[Path]:
         """Generate a PDF listing saved palettes and return its path.
 
         The PDF is stored under ``PALETTE_DIR`` as ``palettes.pdf``. If the
         PDF already exists and is newer than ``index.json`` it is reused unless
         ``force`` is ``True``. Returns ``None`` when no palettes are saved.
+        ``backend`` selects the PIL contact sheet renderer (``"pil"``) or the
+        original matplotlib layout (``"matplotlib"``).
         """
 
         data = _load_index(assign_ids=True)
@@ -691,9 +1605,20 @@ class CoverPalette:
             if pdf_path.stat().st_mtime >= INDEX_FILE.stat().st_mtime:
                 return pdf_path
 
+        per_page = 10
+
+        if backend == "pil":
+            data.sort(key=lambda d: d.get("id", 0))
+            pages = [
+                CoverPalette.render_contact_sheet(data[i : i + per_page], fmt="image")
+                for i in range(0, len(data), per_page)
+            ]
+            pages[0].save(pdf_path, "PDF", save_all=True, append_images=pages[1:])
+            return pdf_path
+
+        import matplotlib.pyplot as plt
         from matplotlib.backends.backend_pdf import PdfPages
 
-        per_page = 10
         with PdfPages(pdf_path) as pdf:
             for i in range(0, len(data), per_page):
                 chunk = data[i : i + per_page]
@@ -713,10 +1638,14 @@ class CoverPalette:
                         ax.axis("off")
 
                     hexcodes = entry.get("hexcodes") or []
-                    cmap = ListedColormap([mpl.colors.to_rgb(h) for h in hexcodes])
-
-                    gradient = np.linspace(0, 1, 256).reshape(1, -1)
-                    bar_ax.imshow(gradient, aspect="auto", cmap=cmap)
+                    swatch = _preview_path(entry, "swatch")
+                    if swatch:
+                        with Image.open(swatch) as img:
+                            bar_ax.imshow(np.array(img), aspect="auto")
+                    else:
+                        cmap = ListedColormap([mpl.colors.to_rgb(h) for h in hexcodes])
+                        gradient = np.linspace(0, 1, 256).reshape(1, -1)
+                        bar_ax.imshow(gradient, aspect="auto", cmap=cmap)
 
                     artist = (entry.get("artist") or "").title()
                     album = (entry.get("album") or "").title()
@@ -728,8 +1657,12 @@ class CoverPalette:
                     )
                     text_ax.text(0, 0.5, text, va="center", ha="left", fontsize=8)
 
+                    thumbnail = _preview_path(entry, "thumbnail")
                     img_url = entry.get("image_url")
-                    if img_url:
+                    if thumbnail:
+                        with Image.open(thumbnail) as img:
+                            img_ax.imshow(np.array(img))
+                    elif img_url:
                         try:
                             with urlopen(img_url) as url:
                                 with Image.open(url) as img:
@@ -0,0 +1,297 @@
+"""Local stand-in for the MusicBrainz, Cover Art Archive and Discogs APIs.
+
+The server answers the requests made by :mod:`covers2colors.album_art` for a
+fixed catalog of ``(artist, album)`` pairs and serves deterministic synthetic
+covers. Latency, random server errors and ``503`` throttling can be injected
+so batch throughput, retries and rate limiting can be load tested without a
+network::
+
+    server = make_fake_server([("Nirvana", "Nevermind")], latency=0.05, throttle_rate=0.1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    use_endpoints(f"http://127.0.0.1:{server.server_address[1]}")
+
+Last.fm is not emulated because pylast only connects over https.
+"""
+
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+import numpy as np
+from fuzzywuzzy import fuzz
+from PIL import Image
+
+MB_NAMESPACE = "http://musicbrainz.org/ns/mmd-2.0#"
+EXT_NAMESPACE = "http://musicbrainz.org/ns/ext#-2.0"
+_LUCENE_FIELD = re.compile(r"(\w+):\((.*?)\)(?=\s+\w+:\(|$)")
+_LUCENE_ESCAPE = re.compile(r"\\(.)")
+
+
+class FakeCatalog:
+    """Albums known to the stand-in server with stable identifiers."""
+
+    def __init__(self, albums: Iterable[Tuple[str, str]], cover_size: int = 500):
+        self.cover_size = cover_size
+        self.albums = []
+        for i, (artist, album) in enumerate(albums):
+            name = f"{artist} - {album}"
+            self.albums.append(
+                {
+                    "artist": artist,
+                    "album": album,
+                    "release_group": str(uuid.uuid5(uuid.NAMESPACE_URL, "rg:" + name)),
+                    "release": str(uuid.uuid5(uuid.NAMESPACE_URL, "release:" + name)),
+                    "discogs_id": i + 1,
+                }
+            )
+        self._by_group = {a["release_group"]: a for a in self.albums}
+        self._by_release = {a["release"]: a for a in self.albums}
+        self._by_discogs = {a["discogs_id"]: a for a in self.albums}
+        self._covers = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def generated(cls, size: int, cover_size: int = 500) -> "FakeCatalog":
+        """Return a catalog of ``size`` albums named ``Artist N - Album N``."""
+
+        return cls(((f"Artist {i}", f"Album {i}") for i in range(size)), cover_size)
+
+    def search(self, artist: str, album: str, limit: int = 5) -> list:
+        """Return up to ``limit`` albums ordered by fuzzy similarity."""
+
+        name = f"{artist} - {album}".lower()
+        scored = [
+            (fuzz.ratio(name, f"{a['artist']} - {a['album']}".lower()), a) for a in self.albums
+        ]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [(score, a) for score, a in scored[:limit] if score > 0]
+
+    def by_group(self, group_id: str) -> Optional[dict]:
+        return self._by_group.get(group_id)
+
+    def by_release(self, release_id: str) -> Optional[dict]:
+        return self._by_release.get(release_id)
+
+    def by_discogs(self, discogs_id: int) -> Optional[dict]:
+        return self._by_discogs.get(discogs_id)
+
+    def cover(self, release_id: str) -> bytes:
+        """Return deterministic JPEG bytes for ``release_id``."""
+
+        with self._lock:
+            if release_id in self._covers:
+                return self._covers[release_id]
+        rng = np.random.default_rng(uuid.UUID(release_id).int % 2**32)
+        n_regions = int(rng.integers(3, 8))
+        base = rng.integers(0, 256, size=(n_regions, 3))
+        size = self.cover_size
+        yy, xx = np.mgrid[0:size, 0:size]
+        region = ((xx * n_regions) // size + (yy * 3) // size) % n_regions
+        pixels = base[region] + rng.normal(0, 10, size=(size, size, 3))
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=90)
+        data = buffer.getvalue()
+        with self._lock:
+            self._covers[release_id] = data
+        return data
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    """Serve MusicBrainz XML, Cover Art Archive images and Discogs JSON."""
+
+    server_version = "covers2colors-fake"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _count(self, key: str) -> None:
+        with self.server.stats_lock:
+            self.server.stats[key] += 1
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+        self._count(f"{status}")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, data):
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json")
+
+    def _xml(self, body: str):
+        xml = (
+            f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<metadata xmlns="{MB_NAMESPACE}" xmlns:ext="{EXT_NAMESPACE}">{body}</metadata>'
+        )
+        self._send(200, xml.encode("utf-8"), "application/xml")
+
+    def _inject_faults(self) -> bool:
+        """Apply latency and random failures. Returns ``True`` if a failure was sent."""
+
+        server = self.server
+        with server.rng_lock:
+            jitter = server.rng.uniform(0, server.jitter)
+            roll = server.rng.random()
+        time.sleep(server.latency + jitter)
+        if roll < server.throttle_rate:
+            self._send(503, b"Rate limit exceeded", "text/plain", {"Retry-After": "1"})
+            return True
+        if roll < server.throttle_rate + server.error_rate:
+            self._send(500, b"Internal server error", "text/plain")
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split("/") if p]
+        self._count("requests")
+        if parts == ["_stats"]:
+            with self.server.stats_lock:
+                stats = dict(self.server.stats)
+            return self._json(200, stats)
+        if self._inject_faults():
+            return
+
+        catalog = self.server.catalog
+        if parts[:2] == ["ws", "2"]:
+            return self._musicbrainz(parts[2:], query)
+        if len(parts) == 3 and parts[0] == "release" and parts[2].startswith("front"):
+            if catalog.by_release(parts[1]) is None:
+                return self._send(404, b"Not found", "text/plain")
+            return self._send(200, catalog.cover(parts[1]), "image/jpeg")
+        if parts[:1] == ["discogs"]:
+            return self._discogs(parts[1:], query)
+        return self._send(404, b"Not found", "text/plain")
+
+    def _musicbrainz(self, parts, query):
+        catalog = self.server.catalog
+        if parts == ["release-group"]:
+            fields = {
+                key: _LUCENE_ESCAPE.sub(r"\1", value)
+                for key, value in _LUCENE_FIELD.findall(query.get("query", ""))
+            }
+            matches = catalog.search(
+                fields.get("artist", ""), fields.get("release", ""), int(query.get("limit", 5))
+            )
+            groups = "".join(
+                f'<release-group id="{a["release_group"]}" type="Album" ext:score="{score}">'
+                f'<title>{escape(a["album"])}</title>'
+                f'<artist-credit><name-credit><artist id="{uuid.uuid5(uuid.NAMESPACE_URL, a["artist"])}">'
+                f'<name>{escape(a["artist"])}</name><sort-name>{escape(a["artist"])}</sort-name>'
+                f"</artist></name-credit></artist-credit></release-group>"
+                for score, a in matches
+            )
+            return self._xml(
+                f'<release-group-list count="{len(matches)}" offset="0">{groups}</release-group-list>'
+            )
+        if parts == ["release"] and "release-group" in query:
+            album = catalog.by_group(query["release-group"])
+            releases = []
+            if album is not None:
+                releases.append(
+                    f'<release id="{album["release"]}"><title>{escape(album["album"])}</title></release>'
+                )
+            return self._xml(
+                f'<release-list count="{len(releases)}" offset="0">{"".join(releases)}</release-list>'
+            )
+        return self._send(404, b"Not found", "text/plain")
+
+    def _discogs(self, parts, query):
+        catalog = self.server.catalog
+        base = self.server.base_url + "/discogs"
+        if parts == ["database", "search"]:
+            matches = catalog.search(query.get("artist", ""), query.get("release_title", ""))
+            results = [
+                {
+                    "id": a["discogs_id"],
+                    "type": "release",
+                    "title": f"{a['artist']} - {a['album']}",
+                    "resource_url": f"{base}/releases/{a['discogs_id']}",
+                }
+                for score, a in matches
+                if score >= 80
+            ]
+            return self._json(
+                200,
+                {
+                    "pagination": {"page": 1, "pages": 1, "per_page": 50, "items": len(results)},
+                    "results": results,
+                },
+            )
+        if len(parts) == 2 and parts[0] == "releases" and parts[1].isdigit():
+            album = catalog.by_discogs(int(parts[1]))
+            if album is None:
+                return self._json(404, {"message": "Release not found."})
+            cover = f"{self.server.base_url}/release/{album['release']}/front-500"
+            return self._json(
+                200,
+                {
+                    "id": album["discogs_id"],
+                    "title": album["album"],
+                    "resource_url": f"{base}/releases/{album['discogs_id']}",
+                    "images": [{"type": "primary", "uri": cover, "uri150": cover}],
+                },
+            )
+        return self._json(404, {"message": "The requested resource was not found."})
+
+
+def make_fake_server(
+    albums,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    throttle_rate: float = 0.0,
+    seed: int = 0,
+    cover_size: int = 500,
+    verbose: bool = False,
+) -> ThreadingHTTPServer:
+    """Return a stand-in provider server for ``albums``.
+
+    Parameters
+    ----------
+    albums : iterable of (str, str) or FakeCatalog
+        Artist and album pairs the server knows about.
+    port : int, optional
+        Port to bind. ``0`` picks a free port, see ``server.server_address``.
+    latency, jitter : float, optional
+        Seconds added to every response, plus a uniform random extra of up
+        to ``jitter`` seconds.
+    error_rate, throttle_rate : float, optional
+        Fraction of requests answered with ``500`` or ``503`` respectively.
+    seed : int, optional
+        Seed of the random failures so runs are reproducible.
+    """
+
+    catalog = albums if isinstance(albums, FakeCatalog) else FakeCatalog(albums, cover_size)
+    server = ThreadingHTTPServer((host, port), FakeProviderHandler)
+    server.daemon_threads = True
+    server.catalog = catalog
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.throttle_rate = throttle_rate
+    server.rng = random.Random(seed)
+    server.rng_lock = threading.Lock()
+    server.stats = Counter()
+    # Handler threads update the counts concurrently
+    server.stats_lock = threading.Lock()
+    server.verbose = verbose
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    return server
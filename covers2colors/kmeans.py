@@ -0,0 +1,280 @@
+"""Batched k-means over many covers and many k values at once.
+
+Covers fetched in a batch run are mostly small, so fitting them one
+scikit-learn estimator at a time is dominated by per-call overhead: roughly
+nine k values, three initializations each, for every cover. :func:`fit_histograms`
+instead reduces each cover to the weighted means of its occupied color
+histogram bins and runs weighted k-means++ seeding and Lloyd iterations for
+every (cover, k, initialization) triple together on padded arrays. Each
+iteration is one batched matrix product and a few ``bincount`` calls, so the
+cost grows with the array sizes rather than with the number of fits.
+
+The results have the shape :meth:`CoverPalette._fit` returns and can be handed
+to :meth:`CoverPalette.add_fits`, after which the usual knee and distinct
+color selection consume them unchanged::
+
+    fits = fit_histograms([p.color_histogram() for p in palettes], range(2, 11), random_state=0)
+    for palette, cover_fits in zip(palettes, fits):
+        palette.add_fits(cover_fits)
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .colorspace import SPACES, from_space, to_space
+from .streaming import ColorHistogram
+
+# Histogram bins per cover before neighbouring bins are merged
+MAX_POINTS = 2048
+# Distance matrix entries computed at once, bounds memory to about 128 MiB
+MAX_ELEMENTS = 1 << 24
+
+
+def histogram_points(histogram: ColorHistogram, max_points: int = MAX_POINTS) -> Tuple[np.ndarray, np.ndarray, float]:
+    """Return ``(means, weights, within_ss)`` of at most ``max_points`` bins.
+
+    Neighbouring bins are merged, one bit per channel at a time, until few
+    enough are occupied. ``within_ss`` is the exact sum of squared distances
+    of every pixel to its (merged) bin mean, so adding it to the weighted
+    inertia of the means gives the inertia over all pixels.
+    """
+
+    bits = histogram.bits
+    bins = np.flatnonzero(histogram.counts)
+    counts = histogram.counts[bins].astype(np.float64)
+    sums = histogram.sums[bins]
+    level = (1 << bits) - 1
+    q = np.stack([bins >> (2 * bits), (bins >> bits) & level, bins & level], axis=1)
+    shift = 0
+    while len(counts) > max_points and shift < bits - 1:
+        shift += 1
+        coarse = bits - shift
+        c = q >> shift
+        _, inverse = np.unique((c[:, 0] << (2 * coarse)) | (c[:, 1] << coarse) | c[:, 2], return_inverse=True)
+        inverse = inverse.ravel()
+        counts = np.bincount(inverse, weights=histogram.counts[bins].astype(np.float64))
+        sums = np.stack(
+            [np.bincount(inverse, weights=histogram.sums[bins, channel]) for channel in range(3)], axis=1
+        )
+    means = sums / counts[:, None]
+    within = histogram.sq_norm - float(np.einsum("ij,ij->", sums, means))
+    return means, counts, max(0.0, within)
+
+
+def _seed(points, weights, n_seeds, n_centers, rng) -> np.ndarray:
+    """Greedy weighted k-means++ seeding, ``n_seeds`` sequences per cover.
+
+    ``points`` is ``(C, P, D)`` and ``weights`` ``(C, P)``. Like
+    scikit-learn, every step draws ``2 + log(n_centers)`` candidates and keeps
+    the one that lowers the potential most. Any prefix of a sequence is a
+    valid seeding for a smaller k, so all k share the same sequences.
+    Returns ``(C, n_seeds, n_centers, D)`` centroids.
+    """
+
+    n_covers, n_points, dim = points.shape
+    n_candidates = 2 + int(np.log(n_centers))
+    covers = np.arange(n_covers)[:, None]
+    centers = np.empty((n_covers, n_seeds, n_centers, dim))
+
+    def draw(mass, n):
+        # n indices per row of ``mass`` (C, S, P) with probability proportional to it
+        cumulative = np.cumsum(mass, axis=-1)
+        u = rng.random(cumulative.shape[:2] + (n,)) * cumulative[..., -1:]
+        return np.minimum((cumulative[..., None, :] < u[..., None]).sum(axis=-1), n_points - 1)
+
+    def sq_dist(index):
+        # Squared distances (C, S, n, P) from every point to the points at ``index`` (C, S, n)
+        chosen = points[covers[:, :, None], index]
+        return ((points[:, None, None, :, :] - chosen[..., None, :]) ** 2).sum(axis=-1)
+
+    first = draw(np.broadcast_to(weights[:, None, :], (n_covers, n_seeds, n_points)), 1)
+    centers[:, :, 0] = points[covers, first[..., 0]]
+    d2 = sq_dist(first)[:, :, 0]
+    for j in range(1, n_centers):
+        candidates = draw(weights[:, None, :] * d2, n_candidates)
+        trial = np.minimum(d2[:, :, None, :], sq_dist(candidates))
+        best = (trial * weights[:, None, None, :]).sum(axis=-1).argmin(axis=-1)
+        pick = np.take_along_axis(candidates, best[..., None], axis=-1)[..., 0]
+        centers[:, :, j] = points[covers, pick]
+        d2 = np.take_along_axis(trial, best[..., None, None], axis=2)[:, :, 0]
+    return centers
+
+
+def _labels(points, centers, invalid) -> np.ndarray:
+    """Index ``(C, P, R)`` of the nearest valid center of every point and run.
+
+    ``centers`` is ``(C, R, K, D)``. All runs of a cover are scored with one
+    float32 matrix product, the ``|x|^2`` term is dropped as it does not
+    change the argmin.
+    """
+
+    n_covers, n_runs, n_centers, dim = centers.shape
+    flat = centers.reshape(n_covers, n_runs * n_centers, dim).astype(np.float32)
+    scores = np.matmul(points, flat.transpose(0, 2, 1))
+    scores *= -2
+    scores += (flat**2).sum(axis=-1)[:, None, :]
+    scores += invalid.reshape(1, 1, -1)
+    return scores.reshape(n_covers, -1, n_runs, n_centers).argmin(axis=-1)
+
+
+def batched_kmeans(
+    points: np.ndarray,
+    weights: np.ndarray,
+    ks: Sequence[int],
+    n_init: int = 3,
+    max_iter: int = 100,
+    tol: float = 1e-4,
+    random_state: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Weighted k-means for every cover and every k in one set of array operations.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        ``(C, P, D)`` points of ``C`` covers padded to the same length.
+    weights : numpy.ndarray
+        ``(C, P)`` point weights, zero for padding.
+    ks : sequence of int
+        Numbers of clusters to fit for every cover.
+    n_init : int, optional
+        Initializations per k, the one with the lowest inertia is kept.
+    max_iter : int, optional
+        Maximum Lloyd iterations.
+    tol : float, optional
+        A cover stops iterating once no centroid of any of its runs moves by
+        more than ``tol`` times the mean per-dimension variance of its points
+        (squared distance), the criterion scikit-learn uses.
+    random_state : int, optional
+        Seed of the k-means++ seeding.
+
+    Returns
+    -------
+    tuple
+        ``(C, len(ks), max(ks), D)`` centroids with ``nan`` rows beyond each
+        k, and ``(C, len(ks))`` weighted inertia of the points.
+    """
+
+    points = np.asarray(points, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    ks = [int(k) for k in ks]
+    n_covers, n_points, dim = points.shape
+    n_centers = max(ks)
+    # Run r fits k = ks[r // n_init] from seed sequence r % n_init
+    run_k = np.repeat(ks, n_init)
+    n_runs = len(run_k)
+    invalid = np.where(np.arange(n_centers)[None, :] < run_k[:, None], 0.0, np.inf).astype(np.float32)
+    rng = np.random.default_rng(random_state)
+
+    seeds = _seed(points, weights, n_init, n_centers, rng)
+    centers = seeds[:, np.tile(np.arange(n_init), len(ks))]
+    total = np.maximum(weights.sum(axis=1), 1e-12)
+    mean = (weights[..., None] * points).sum(axis=1) / total[:, None]
+    variance = (weights * ((points - mean[:, None]) ** 2).sum(axis=-1)).sum(axis=1) / total / dim
+    threshold = tol * variance
+
+    points32 = points.astype(np.float32)
+    weighted = np.concatenate([weights[..., None], weights[..., None] * points], axis=-1)
+    active = np.arange(n_covers)
+    for _ in range(max_iter):
+        n_active = len(active)
+        labels = _labels(points32[active], centers[active], invalid)
+        # Flat (cover, run, label) bin of every point for the centroid updates
+        flat = (np.arange(n_active)[:, None, None] * n_runs + np.arange(n_runs)[None, None, :]) * n_centers + labels
+        size = n_active * n_runs * n_centers
+        moments = np.stack(
+            [
+                np.bincount(flat.ravel(), weights=np.broadcast_to(weighted[active, :, None, c], flat.shape).ravel(), minlength=size)
+                for c in range(dim + 1)
+            ],
+            axis=-1,
+        ).reshape(n_active, n_runs, n_centers, dim + 1)
+        mass = moments[..., :1]
+        old = centers[active]
+        # Empty clusters keep their previous centroid
+        updated = np.where(mass > 0, moments[..., 1:] / np.maximum(mass, 1e-300), old)
+        shift = ((updated - old) ** 2).sum(axis=-1).max(axis=(1, 2))
+        centers[active] = updated
+        active = active[shift > threshold[active]]
+        if len(active) == 0:
+            break
+
+    # Exact float64 inertia from the final assignment
+    labels = _labels(points32, centers, invalid)
+    nearest = centers[np.arange(n_covers)[:, None, None], np.arange(n_runs)[None, None, :], labels]
+    inertia = (((points[:, :, None, :] - nearest) ** 2).sum(axis=-1) * weights[..., None]).sum(axis=1)
+    inertia = inertia.reshape(n_covers, len(ks), n_init)
+    best = inertia.argmin(axis=-1)
+    covers = np.arange(n_covers)[:, None]
+    runs = np.arange(len(ks))[None, :] * n_init + best
+    best_centers = centers[covers, runs]
+    best_centers[:, np.arange(n_centers)[None, :] >= np.asarray(ks)[:, None]] = np.nan
+    return best_centers, inertia[covers, np.arange(len(ks))[None, :], best]
+
+
+def fit_histograms(
+    histograms: Sequence[ColorHistogram],
+    ks,
+    space: str = "rgb",
+    n_init: int = 3,
+    random_state: Optional[int] = None,
+    max_points: int = MAX_POINTS,
+    max_iter: int = 100,
+) -> List[Dict[int, dict]]:
+    """Fit every k in ``ks`` to every histogram with :func:`batched_kmeans`.
+
+    Covers are grouped by size and padded so each group's distance matrix
+    stays below ``MAX_ELEMENTS`` entries. In RGB the reported inertia covers
+    every pixel, in the other spaces it is measured on the bin means, like
+    the streaming path of :meth:`CoverPalette._fit`.
+
+    Returns
+    -------
+    list of dict
+        For every histogram ``{k: {"centroids": [...], "inertia": float}}``
+        with centroids as 0-255 RGB values. Empty histograms get ``{}``.
+    """
+
+    if space not in SPACES:
+        raise ValueError(f"Unknown color space: {space}")
+    ks = sorted({int(k) for k in ks})
+    if not ks or ks[0] < 1:
+        raise ValueError("ks must contain positive numbers of clusters")
+    results = [{} for _ in histograms]
+    covers = []
+    for i, histogram in enumerate(histograms):
+        if histogram.n_pixels == 0:
+            continue
+        means, counts, within = histogram_points(histogram, max_points)
+        values = means if space == "rgb" else to_space(means / 255, space)
+        covers.append((i, values, counts, within if space == "rgb" else 0.0))
+
+    # Similar sizes share a group so little work is spent on padding
+    covers.sort(key=lambda cover: len(cover[2]))
+    per_cover = len(ks) * n_init * max(ks)
+    start = 0
+    while start < len(covers):
+        stop = start + 1
+        while stop < len(covers) and (stop - start + 1) * len(covers[stop][2]) * per_cover <= MAX_ELEMENTS:
+            stop += 1
+        group = covers[start:stop]
+        n_points = len(group[-1][2])
+        points = np.zeros((len(group), n_points, 3))
+        weights = np.zeros((len(group), n_points))
+        for j, (_, values, counts, _) in enumerate(group):
+            points[j, : len(counts)] = values
+            weights[j, : len(counts)] = counts
+        centers, inertia = batched_kmeans(
+            points, weights, ks, n_init=n_init, max_iter=max_iter, random_state=random_state
+        )
+        for j, (i, _, _, within) in enumerate(group):
+            for m, k in enumerate(ks):
+                centroids = centers[j, m, :k]
+                if space != "rgb":
+                    centroids = from_space(centroids, space) * 255
+                results[i][k] = {
+                    "centroids": np.asarray(centroids, dtype=float).tolist(),
+                    "inertia": float(inertia[j, m] + within),
+                }
+        start = stop
+    return results
@@ -0,0 +1,287 @@
+"""Compact binary export of the saved palette library for bulk loading.
+
+Loading palettes one by one with :meth:`CoverPalette.load_palette_by_id`
+parses the whole ``index.json`` and converts every hex string for each call.
+:func:`export_library` writes all saved palettes once into flat arrays:
+
+* ``ids`` - ``(N,)`` int64 palette ids in ascending order,
+* ``color_offsets`` - ``(N + 1,)`` int64 offsets of each palette in ``colors``,
+* ``colors`` - ``(N_total_colors, 3)`` float32 RGB values between 0 and 1,
+* ``meta_offsets`` and ``metadata`` - UTF-8 JSON of every index entry
+  concatenated into one uint8 buffer.
+
+Two containers are supported. ``"npz"`` is an uncompressed NumPy archive
+readable by :func:`numpy.load`. ``"binary"`` is a small JSON header followed
+by 64 byte aligned raw arrays. :func:`load_library` memory-maps either, so
+opening a library reads only the headers and :meth:`PaletteLibrary.cmap`
+slices colormaps straight out of the mapped ``colors`` array::
+
+    export_library("palettes.npz")
+    library = load_library("palettes.npz")
+    cmaps = [library.cmap(palette_id) for palette_id in library.ids]
+"""
+
+import json
+import struct
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import matplotlib as mpl
+import numpy as np
+from matplotlib.colors import ListedColormap
+
+from .convert import PALETTE_DIR, _load_index
+
+FORMATS = ("npz", "binary")
+BINARY_MAGIC = b"C2CPAL01"
+ALIGNMENT = 64
+ARRAYS = ("ids", "color_offsets", "colors", "meta_offsets", "metadata")
+
+
+def default_library_path(fmt: str = "npz") -> Path:
+    """Return where ``coverpalette export`` writes a library of format ``fmt``."""
+
+    return PALETTE_DIR / ("library.npz" if fmt == "npz" else "library.c2cp")
+
+
+def _hex_to_rgb(hexcodes: List[str]) -> np.ndarray:
+    """Convert ``hexcodes`` to a ``(n, 3)`` float32 array."""
+
+    if all(len(h) == 7 and h.startswith("#") for h in hexcodes):
+        try:
+            raw = bytes.fromhex("".join(h[1:] for h in hexcodes))
+            return np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.float32) / 255
+        except ValueError:
+            pass
+    return np.array([mpl.colors.to_rgb(h) for h in hexcodes], dtype=np.float32).reshape(-1, 3)
+
+
+def _entry_hexcodes(entry: dict) -> Optional[List[str]]:
+    if entry.get("hexcodes"):
+        return entry["hexcodes"]
+    if entry.get("path"):
+        try:
+            with open(entry["path"], "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Skipping palette {entry.get('id')}: {e}")
+    return None
+
+
+def library_arrays(entries: Optional[list] = None) -> Dict[str, np.ndarray]:
+    """Return the export arrays of ``entries``, by default every saved palette."""
+
+    if entries is None:
+        entries = _load_index(assign_ids=True)
+    entries = sorted(entries, key=lambda d: d.get("id", 0))
+
+    ids, colors, metadata = [], [], []
+    color_offsets, meta_offsets = [0], [0]
+    for entry in entries:
+        hexcodes = _entry_hexcodes(entry)
+        if not hexcodes:
+            continue
+        rgb = _hex_to_rgb(hexcodes)
+        meta = json.dumps({k: v for k, v in entry.items() if k != "hexcodes"}).encode("utf-8")
+        ids.append(entry["id"])
+        colors.append(rgb)
+        metadata.append(meta)
+        color_offsets.append(color_offsets[-1] + len(rgb))
+        meta_offsets.append(meta_offsets[-1] + len(meta))
+
+    return {
+        "ids": np.array(ids, dtype=np.int64),
+        "color_offsets": np.array(color_offsets, dtype=np.int64),
+        "colors": np.concatenate(colors) if colors else np.zeros((0, 3), dtype=np.float32),
+        "meta_offsets": np.array(meta_offsets, dtype=np.int64),
+        "metadata": np.frombuffer(b"".join(metadata), dtype=np.uint8),
+    }
+
+
+def _write_binary(path: Path, arrays: Dict[str, np.ndarray]) -> None:
+    layout = {}
+    offset = 0
+    for name in ARRAYS:
+        array = arrays[name]
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps(layout).encode("utf-8")
+    # Data starts at the first aligned position after magic, header length and header
+    start = -(-(len(BINARY_MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+    with path.open("wb") as f:
+        f.write(BINARY_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name in ARRAYS:
+            f.seek(start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(arrays[name]).tobytes())
+        f.truncate(start + offset)
+
+
+def export_library(
+    path: Optional[Union[str, Path]] = None,
+    fmt: str = "npz",
+    entries: Optional[list] = None,
+) -> Path:
+    """Write every saved palette to ``path`` and return the path.
+
+    Parameters
+    ----------
+    path : str or Path, optional
+        Output file. Defaults to :func:`default_library_path` for ``fmt``.
+    fmt : str, optional
+        ``"npz"`` or ``"binary"``. Defaults to ``"npz"``.
+    entries : list of dict, optional
+        Index entries to export instead of the contents of ``index.json``.
+    """
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown library format: {fmt}")
+    path = Path(path) if path else default_library_path(fmt)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrays = library_arrays(entries)
+    if fmt == "npz":
+        # Uncompressed so every member can be memory-mapped in place
+        with path.open("wb") as f:
+            np.savez(f, **arrays)
+    else:
+        _write_binary(path, arrays)
+    return path
+
+
+def _map_npz(path: Path) -> Dict[str, np.ndarray]:
+    """Memory-map the members of an uncompressed ``.npz`` archive."""
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, path.open("rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} is compressed and cannot be memory-mapped")
+            # The local file header is 30 bytes plus the name and extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(
+                    path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                    order="F" if fortran else "C",
+                )
+    return arrays
+
+
+def _map_binary(path: Path) -> Dict[str, np.ndarray]:
+    with path.open("rb") as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"{path} is not a palette library")
+        (length,) = struct.unpack("<Q", f.read(8))
+        layout = json.loads(f.read(length).decode("utf-8"))
+    start = -(-(len(BINARY_MAGIC) + 8 + length) // ALIGNMENT) * ALIGNMENT
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, spec in layout.items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        offset = start + spec["offset"]
+        arrays[name] = buffer[offset : offset + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    return arrays
+
+
+class PaletteLibrary:
+    """Read-only view of an exported palette library.
+
+    Use :func:`load_library` to open one. All arrays are views of the
+    memory-mapped file, so colors are only read from disk when a palette is
+    used.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], path: Optional[Path] = None):
+        missing = set(ARRAYS) - set(arrays)
+        if missing:
+            raise ValueError(f"Palette library is missing {', '.join(sorted(missing))}")
+        self.path = path
+        # Plain ndarray views of the maps, slicing np.memmap objects is several times slower
+        self.ids = np.asarray(arrays["ids"])
+        self.color_offsets = np.asarray(arrays["color_offsets"])
+        self.colors = np.asarray(arrays["colors"])
+        self.meta_offsets = np.asarray(arrays["meta_offsets"])
+        self._metadata = np.asarray(arrays["metadata"])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, palette_id: int) -> bool:
+        i = np.searchsorted(self.ids, palette_id)
+        return bool(i < len(self.ids) and self.ids[i] == palette_id)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids.tolist())
+
+    def index(self, palette_id: int) -> int:
+        """Return the position of ``palette_id`` in the library."""
+
+        i = int(np.searchsorted(self.ids, palette_id))
+        if i >= len(self.ids) or self.ids[i] != palette_id:
+            raise FileNotFoundError(f"Saved palette id {palette_id} not found")
+        return i
+
+    def palette_colors(self, palette_id: int) -> np.ndarray:
+        """Return the ``(n, 3)`` float32 colors of ``palette_id`` as a view."""
+
+        i = self.index(palette_id)
+        return self.colors[self.color_offsets[i] : self.color_offsets[i + 1]]
+
+    def metadata(self, palette_id: int) -> dict:
+        """Return the index entry of ``palette_id`` without its hexcodes."""
+
+        i = self.index(palette_id)
+        raw = self._metadata[self.meta_offsets[i] : self.meta_offsets[i + 1]]
+        return json.loads(raw.tobytes().decode("utf-8"))
+
+    def hexcodes(self, palette_id: int) -> List[str]:
+        """Return the colors of ``palette_id`` as hex strings."""
+
+        return [mpl.colors.rgb2hex(c) for c in self.palette_colors(palette_id)]
+
+    def cmap(self, palette_id: int, name: Optional[str] = None) -> ListedColormap:
+        """Return a ListedColormap backed by the library's colors without copying."""
+
+        return ListedColormap(self.palette_colors(palette_id), name=name or f"palette_{palette_id}")
+
+    def cmaps(self) -> Dict[int, ListedColormap]:
+        """Return a colormap for every palette keyed by id."""
+
+        offsets = self.color_offsets.tolist()
+        return {
+            palette_id: ListedColormap(self.colors[offsets[i] : offsets[i + 1]], name=f"palette_{palette_id}")
+            for i, palette_id in enumerate(self.ids.tolist())
+        }
+
+
+def load_library(path: Optional[Union[str, Path]] = None) -> PaletteLibrary:
+    """Memory-map the palette library exported to ``path``.
+
+    The format is detected from the file contents. Without ``path`` the
+    default ``npz`` export location is used.
+    """
+
+    path = Path(path) if path else default_library_path("npz")
+    if not path.exists():
+        raise FileNotFoundError(f"Palette library not found: {path}")
+    with path.open("rb") as f:
+        magic = f.read(len(BINARY_MAGIC))
+    if magic == BINARY_MAGIC:
+        arrays = _map_binary(path)
+    elif zipfile.is_zipfile(path):
+        arrays = _map_npz(path)
+    else:
+        raise ValueError(f"{path} is not a palette library")
+    return PaletteLibrary(arrays, path)
@@ -0,0 +1,278 @@
+"""Offline cover art resolver backed by a local MusicBrainz dump.
+
+:func:`build_mb_index` reads a MusicBrainz JSON dump (one release-group or
+release document per line, optionally gzip compressed) into a SQLite file
+holding one row per release group and a trigram index over the normalized
+``"artist - title"`` string. :class:`LocalMusicBrainzIndex` answers exact
+matches of the normalized string directly. Otherwise it finds candidates by
+overlap with the rarest trigrams of the query, so common grams such as
+``"the"`` never make a lookup scan a large part of the index, and rescores
+them with the same ``fuzz.ratio`` threshold used by
+:func:`covers2colors.album_art.get_mb_cover_art_url`.
+
+Release-group lines may carry a ``releases`` list. Release lines are grouped
+by their ``release-group`` and releases with Cover Art Archive front artwork
+are preferred.
+"""
+
+import gzip
+import json
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from fuzzywuzzy import fuzz
+
+MB_INDEX_FILE = Path.home() / ".covers2colors" / "musicbrainz.sqlite"
+MATCH_THRESHOLD = 80
+CANDIDATES = 20
+# Trigrams of a query used to find candidates, rarest first
+QUERY_GRAMS = 12
+# Index rows a lookup may read for its trigrams, the rarest one is always read
+MAX_POSTINGS = 5000
+
+_SPACE = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    return _SPACE.sub(" ", text.lower()).strip()
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _artist_name(doc: dict) -> str:
+    credits = doc.get("artist-credit") or []
+    if not credits:
+        return ""
+    first = credits[0]
+    return (first.get("artist") or {}).get("name") or first.get("name") or ""
+
+
+def _has_front(release: dict) -> Optional[bool]:
+    """Return whether ``release`` has front artwork, ``None`` if unknown."""
+
+    caa = release.get("cover-art-archive")
+    if not caa:
+        return None
+    return bool(caa.get("front"))
+
+
+def _read_dump(dump_path: Union[str, Path]) -> Iterator[dict]:
+    opener = gzip.open if str(dump_path).endswith(".gz") else open
+    with opener(dump_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _collect_groups(docs: Iterable[dict]) -> dict:
+    """Return ``{group_id: {"artist", "title", "release", "front"}}`` from dump documents."""
+
+    groups = {}
+
+    def add_release(group, release):
+        front = _has_front(release)
+        if front is False:
+            return
+        # A release known to have front artwork beats one with unknown status
+        if group["release"] is None or (front and not group["front"]):
+            group["release"] = release.get("id")
+            group["front"] = bool(front)
+
+    for doc in docs:
+        parent = doc.get("release-group")
+        if parent:
+            group_doc, releases = parent, [doc]
+        else:
+            group_doc, releases = doc, doc.get("releases") or []
+        group_id = group_doc.get("id")
+        if not group_id:
+            continue
+        group = groups.setdefault(
+            group_id,
+            {
+                "artist": _artist_name(group_doc) or _artist_name(doc),
+                "title": group_doc.get("title") or doc.get("title") or "",
+                "release": None,
+                "front": False,
+            },
+        )
+        for release in releases:
+            add_release(group, release)
+    return groups
+
+
+def build_mb_index(
+    dump_path: Union[str, Path],
+    index_path: Optional[Union[str, Path]] = None,
+) -> Path:
+    """Build a local index from the MusicBrainz dump at ``dump_path``.
+
+    The index is written to ``index_path`` (``MB_INDEX_FILE`` by default),
+    replacing any existing file, and its path is returned.
+    """
+
+    index_path = Path(index_path) if index_path else MB_INDEX_FILE
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(index_path.suffix + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    groups = _collect_groups(_read_dump(dump_path))
+    conn = sqlite3.connect(str(tmp_path))
+    try:
+        conn.executescript(
+            """
+            CREATE TABLE groups (
+                id INTEGER PRIMARY KEY,
+                mbid TEXT NOT NULL,
+                artist TEXT NOT NULL,
+                title TEXT NOT NULL,
+                name TEXT NOT NULL,
+                release TEXT,
+                front INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE grams (gram TEXT NOT NULL, group_id INTEGER NOT NULL);
+            """
+        )
+        for mbid, group in groups.items():
+            if not group["release"]:
+                continue
+            name = _normalize(f"{group['artist']} - {group['title']}")
+            cursor = conn.execute(
+                "INSERT INTO groups (mbid, artist, title, name, release, front) VALUES (?, ?, ?, ?, ?, ?)",
+                (mbid, group["artist"], group["title"], name, group["release"], int(group["front"])),
+            )
+            conn.executemany(
+                "INSERT INTO grams (gram, group_id) VALUES (?, ?)",
+                [(gram, cursor.lastrowid) for gram in _trigrams(name)],
+            )
+        conn.executescript(
+            """
+            CREATE INDEX grams_gram ON grams (gram, group_id);
+            CREATE INDEX groups_name ON groups (name);
+            CREATE TABLE gram_counts AS SELECT gram, COUNT(*) AS n FROM grams GROUP BY gram;
+            CREATE UNIQUE INDEX gram_counts_gram ON gram_counts (gram);
+            """
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+class LocalMusicBrainzIndex:
+    """Fuzzy ``artist - album`` lookups against an index built by :func:`build_mb_index`."""
+
+    def __init__(self, index_path: Union[str, Path]):
+        self.index_path = Path(index_path)
+        self._conn = sqlite3.connect(
+            f"{self.index_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+        )
+        # Indexes built before gram counts and front artwork status were stored still work
+        tables = {row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(groups)")}
+        self._has_counts = "gram_counts" in tables
+        self._front = "g.front" if "front" in columns else "NULL"
+
+    def _gram_counts(self, grams: list) -> dict:
+        """Return the number of release groups containing each of ``grams``."""
+
+        placeholders = ",".join("?" * len(grams))
+        if self._has_counts:
+            query = f"SELECT gram, n FROM gram_counts WHERE gram IN ({placeholders})"
+        else:
+            query = f"SELECT gram, COUNT(*) FROM grams WHERE gram IN ({placeholders}) GROUP BY gram"
+        return dict(self._conn.execute(query, grams).fetchall())
+
+    def _candidates(self, name: str) -> list:
+        """Return candidate rows sharing the most of the rarest trigrams of ``name``."""
+
+        counts = self._gram_counts(list(_trigrams(name)))
+        grams = []
+        postings = 0
+        for gram, n in sorted(counts.items(), key=lambda item: (item[1], item[0])):
+            if len(grams) >= QUERY_GRAMS or (grams and postings + n > MAX_POSTINGS):
+                break
+            grams.append(gram)
+            postings += n
+        if not grams:
+            return []
+        placeholders = ",".join("?" * len(grams))
+        return self._conn.execute(
+            f"""
+            SELECT g.mbid, g.artist, g.title, g.name, g.release, {self._front}
+            FROM (
+                SELECT group_id, COUNT(*) AS hits FROM grams
+                WHERE gram IN ({placeholders})
+                GROUP BY group_id
+                ORDER BY hits DESC
+                LIMIT ?
+            ) AS top JOIN groups AS g ON g.id = top.group_id
+            ORDER BY top.hits DESC
+            """,
+            grams + [CANDIDATES],
+        ).fetchall()
+
+    def find(self, artist_name: str, album_name: str) -> Optional[dict]:
+        """Return the best matching release group or ``None``.
+
+        ``"front"`` in the result is ``True`` when the release is known to
+        have front artwork and ``None`` when that is unknown.
+        """
+
+        name = _normalize(f"{artist_name} - {album_name}")
+        rows = self._conn.execute(
+            f"SELECT g.mbid, g.artist, g.title, g.name, g.release, {self._front} FROM groups AS g WHERE g.name = ? LIMIT 1",
+            (name,),
+        ).fetchall()
+        if not rows:
+            rows = self._candidates(name)
+
+        best_match = None
+        highest_ratio = 0
+        for mbid, artist, title, candidate, release, front in rows:
+            ratio = fuzz.ratio(name, candidate)
+            if ratio > highest_ratio and ratio >= MATCH_THRESHOLD:
+                highest_ratio = ratio
+                best_match = {
+                    "release_group": mbid,
+                    "release": release,
+                    "artist": artist,
+                    "title": title,
+                    "ratio": ratio,
+                    "front": True if front else None,
+                }
+        return best_match
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM groups").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_default_index = None
+
+
+def load_mb_index() -> Optional[LocalMusicBrainzIndex]:
+    """Open the local index from ``$COVERS2COLORS_MB_INDEX`` or ``MB_INDEX_FILE``.
+
+    Returns ``None`` when no index has been built.
+    """
+
+    global _default_index
+    path = Path(os.environ.get("COVERS2COLORS_MB_INDEX") or MB_INDEX_FILE)
+    if _default_index is not None and _default_index.index_path == path:
+        return _default_index
+    if not path.exists():
+        return None
+    _default_index = LocalMusicBrainzIndex(path)
+    return _default_index
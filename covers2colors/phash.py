@@ -0,0 +1,146 @@
+"""Perceptual hashes for spotting the same artwork under different URLs.
+
+Reissues, deluxe editions and regional variants often share one cover while
+Discogs and the Cover Art Archive serve it from different URLs, with
+different sizes and JPEG settings. :func:`difference_hash` and
+:func:`average_hash` reduce an image to a tiny grayscale thumbnail and encode
+it as a 64 bit integer that barely changes under rescaling or recompression.
+Being grayscale, such a hash cannot tell a red cover from a blue one with the
+same layout, so :func:`color_signature` adds a coarse RGB thumbnail.
+:class:`HashIndex` finds previously seen hashes within a Hamming distance
+whose colors also match.
+"""
+
+import threading
+from typing import Any, Optional
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8
+MAX_DISTANCE = 6
+# Side of the RGB thumbnail compared by color_signature
+SIGNATURE_SIZE = 4
+# Largest mean absolute difference (0-255) of two signatures of the same artwork
+MAX_COLOR_DISTANCE = 16.0
+
+# Number of set bits of every byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _reduced(image: Image.Image, size) -> Image.Image:
+    """Return ``image`` box-reduced to a few times ``size`` (width, height)."""
+
+    # reduce() does not support palette and other exotic modes
+    if image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGBA")
+    # reduce() box filters large covers cheaply before the final resize
+    factor = max(1, min(image.size) // (4 * max(size)))
+    if factor > 1:
+        image = image.reduce(factor)
+    return image
+
+
+def _thumbnail(image: Image.Image, size) -> np.ndarray:
+    """Return ``image`` as a grayscale float array of ``size`` (width, height)."""
+
+    gray = _reduced(image, size).convert("L").resize(size, Image.BOX)
+    return np.asarray(gray, dtype=np.float64)
+
+
+def _to_int(bits: np.ndarray) -> int:
+    return int("".join("1" if b else "0" for b in bits.ravel()), 2)
+
+
+def average_hash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """Hash of which thumbnail pixels are brighter than the mean."""
+
+    pixels = _thumbnail(image, (hash_size, hash_size))
+    return _to_int(pixels > pixels.mean())
+
+
+def difference_hash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """Hash of the brightness gradient between horizontally adjacent pixels."""
+
+    pixels = _thumbnail(image, (hash_size + 1, hash_size))
+    return _to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def color_signature(image: Image.Image, size: int = SIGNATURE_SIZE) -> np.ndarray:
+    """Return the ``size`` x ``size`` RGB thumbnail of ``image`` as a flat float array."""
+
+    small = _reduced(image, (size, size)).convert("RGB").resize((size, size), Image.BOX)
+    return np.asarray(small, dtype=np.float32).ravel()
+
+
+def color_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute channel difference of two color signatures."""
+
+    return float(np.abs(a - b).mean())
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+
+    return bin(a ^ b).count("1")
+
+
+class HashIndex:
+    """Hashes seen so far with a value attached to each.
+
+    Parameters
+    ----------
+    max_distance : int, optional
+        Largest Hamming distance at which two 64 bit hashes are treated as
+        the same artwork. Defaults to 6.
+    max_color_distance : float, optional
+        Largest :func:`color_distance` between the color signatures of the
+        same artwork. Only checked when both hashes have a signature.
+        Defaults to 16.
+    """
+
+    def __init__(self, max_distance: int = MAX_DISTANCE, max_color_distance: float = MAX_COLOR_DISTANCE):
+        self.max_distance = max_distance
+        self.max_color_distance = max_color_distance
+        # Grown by doubling so adding n hashes copies O(n) entries in total
+        self._hashes = np.zeros(64, dtype=np.uint64)
+        self._signatures = []
+        self._values = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, hash_value: int, value: Any, signature: Optional[np.ndarray] = None) -> None:
+        """Remember ``value`` for ``hash_value`` and its optional color ``signature``."""
+
+        with self._lock:
+            n = len(self._values)
+            if n == len(self._hashes):
+                self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+            self._hashes[n] = np.uint64(hash_value)
+            self._signatures.append(signature)
+            self._values.append(value)
+
+    def find(self, hash_value: int, signature: Optional[np.ndarray] = None) -> Optional[Any]:
+        """Return the value of the closest hash within ``max_distance`` or ``None``.
+
+        Hashes whose color signature differs from ``signature`` by more than
+        ``max_color_distance`` are skipped.
+        """
+
+        with self._lock:
+            if not self._values:
+                return None
+            xor = np.bitwise_xor(self._hashes[: len(self._values)], np.uint64(hash_value))
+            distances = _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+            close = np.flatnonzero(distances <= self.max_distance)
+            for i in close[np.argsort(distances[close], kind="stable")]:
+                stored = self._signatures[i]
+                if (
+                    signature is None
+                    or stored is None
+                    or color_distance(signature, stored) <= self.max_color_distance
+                ):
+                    return self._values[i]
+            return None
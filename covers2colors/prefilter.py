@@ -0,0 +1,199 @@
+"""Reduce a cover's pixels before they are clustered.
+
+Scans often come with a solid frame or letterboxing, PNG covers with
+transparent padding, and large covers have far more pixels than k-means
+needs. A :class:`PixelFilter` is applied while a cover is decoded:
+
+* uniform borders are detected on a reduced copy of the image and cropped
+  away before any pixel is decoded at full size,
+* transparent pixels and, optionally, pixels failing the light, dark and
+  bold HSV thresholds are masked in one vectorized pass over the uint8
+  buffer,
+* the survivors are subsampled to at most ``max_pixels`` with a single
+  gather.
+
+Clustering then sees fewer and more relevant pixels, which makes every
+later k-means fit cheaper::
+
+    palette = CoverPalette.from_image("scan.png", prefilter=PixelFilter(borders=True, max_pixels=200_000))
+"""
+
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .streaming import DEFAULT_TILE_PIXELS
+
+# Longest side of the reduced copy used for border detection
+BORDER_PREVIEW_SIZE = 256
+
+
+class PixelFilter:
+    """Settings of the pixel pre-filter applied while decoding a cover.
+
+    Parameters
+    ----------
+    transparent : bool, optional
+        Drop fully transparent pixels. Defaults to ``True``.
+    borders : bool, optional
+        Crop uniform frames and letterbox bars. Defaults to ``False``.
+    border_tolerance : int, optional
+        Largest per-channel difference from a border's color still counted
+        as border, which absorbs JPEG noise. Defaults to 16.
+    light, dark, bold : bool, optional
+        Keep only pixels passing the same HSV thresholds
+        :meth:`CoverPalette._filter_colors` applies to palette colors. If no
+        pixel passes, the thresholds are ignored.
+    light_thresh, dark_thresh, bold_thresh : float, optional
+        Value and saturation thresholds between 0 and 1.
+    max_pixels : int, optional
+        Randomly subsample the remaining pixels to at most this many.
+    random_state : int, optional
+        Seed of the subsampling, fixed by default so cached results stay valid.
+    """
+
+    def __init__(
+        self,
+        transparent: bool = True,
+        borders: bool = False,
+        border_tolerance: int = 16,
+        light: bool = False,
+        dark: bool = False,
+        bold: bool = False,
+        light_thresh: float = 0.6,
+        dark_thresh: float = 0.4,
+        bold_thresh: float = 0.6,
+        max_pixels: Optional[int] = None,
+        random_state: Optional[int] = 0,
+    ):
+        if max_pixels is not None and max_pixels < 1:
+            raise ValueError("max_pixels must be at least 1")
+        self.transparent = transparent
+        self.borders = borders
+        self.border_tolerance = border_tolerance
+        self.light = light
+        self.dark = dark
+        self.bold = bold
+        self.light_thresh = light_thresh
+        self.dark_thresh = dark_thresh
+        self.bold_thresh = bold_thresh
+        self.max_pixels = max_pixels
+        self.random_state = random_state
+
+    @property
+    def thresholds(self) -> bool:
+        """Whether any HSV threshold is applied."""
+
+        return self.light or self.dark or self.bold
+
+    def crop_box(self, image: Image.Image) -> Optional[Tuple[int, int, int, int]]:
+        """Return the box inside uniform borders of ``image`` or ``None``.
+
+        Each side is scanned inward on a reduced copy while rows (or columns)
+        match that side's outer color. Reduction blends the last border row
+        with the artwork, so the box errs on the side of keeping a few border
+        pixels rather than cutting into the cover.
+        """
+
+        if not self.borders:
+            return None
+        width, height = image.size
+        factor = max(1, max(width, height) // BORDER_PREVIEW_SIZE)
+        small = image if image.mode in ("RGB", "RGBA", "L") else image.convert("RGBA")
+        if factor > 1:
+            small = small.reduce(factor)
+        a = np.asarray(small.convert("RGB"), dtype=np.int16)
+        h, w = a.shape[:2]
+
+        def depth(lines: np.ndarray) -> int:
+            # lines: (n_lines, line_length, 3) ordered from the outside in
+            color = np.median(lines[0], axis=0)
+            close = (np.abs(lines - color).max(axis=-1) <= self.border_tolerance).mean(axis=1) >= 0.98
+            return len(close) if close.all() else int(np.argmin(close))
+
+        top = depth(a)
+        if top == h:
+            # A uniform image has no artwork to crop to
+            return None
+        bottom = depth(a[::-1])
+        left = depth(a.transpose(1, 0, 2))
+        right = depth(a.transpose(1, 0, 2)[::-1])
+        if top + bottom >= h or left + right >= w or not (top or bottom or left or right):
+            return None
+        return (
+            left * factor,
+            top * factor,
+            width - right * factor if right else width,
+            height - bottom * factor if bottom else height,
+        )
+
+    def mask(self, pixels: np.ndarray, thresholds: bool = True) -> np.ndarray:
+        """Return which ``(n, 3)`` or ``(n, 4)`` uint8 pixels are kept.
+
+        Transparency is read from the fourth column when present.
+        """
+
+        keep = np.ones(len(pixels), dtype=bool)
+        if self.transparent and pixels.shape[1] == 4:
+            keep &= pixels[:, 3] != 0
+        if thresholds and self.thresholds:
+            rgb = pixels[:, :3]
+            high = rgb.max(axis=1)
+            # HSV value is max / 255, saturation (max - min) / max
+            if self.light and not self.dark:
+                keep &= high >= int(np.ceil(self.light_thresh * 255))
+            if self.dark and not self.light:
+                keep &= high <= int(np.floor(self.dark_thresh * 255))
+            if self.bold:
+                spread = high - rgb.min(axis=1)
+                keep &= (spread > 0) & (spread >= self.bold_thresh * high.astype(np.float32))
+        return keep
+
+    def _subsample(self, index: np.ndarray) -> np.ndarray:
+        if self.max_pixels is None or len(index) <= self.max_pixels:
+            return index
+        rng = np.random.default_rng(self.random_state)
+        index = rng.choice(index, self.max_pixels, replace=False)
+        index.sort()
+        return index
+
+    def apply(self, pixels: np.ndarray) -> np.ndarray:
+        """Return the kept rows of an ``(n, 3)`` or ``(n, 4)`` uint8 pixel array."""
+
+        keep = self.mask(pixels)
+        if self.thresholds and not keep.any():
+            keep = self.mask(pixels, thresholds=False)
+        return pixels[self._subsample(np.flatnonzero(keep))]
+
+    def iter_strips(
+        self,
+        image: Image.Image,
+        tile_pixels: int = DEFAULT_TILE_PIXELS,
+        thresholds: bool = True,
+    ) -> Iterator[np.ndarray]:
+        """Yield filtered ``(n, 3)`` uint8 strips of ``image`` for streaming decodes.
+
+        Subsampling keeps every pixel with probability ``max_pixels`` over
+        the cropped image size, so the total is only approximately
+        ``max_pixels``. Pass ``thresholds=False`` to skip the HSV thresholds.
+        """
+
+        box = self.crop_box(image)
+        if box is not None:
+            image = image.crop(box)
+        width, height = image.size
+        fraction = 1.0
+        if self.max_pixels is not None and width * height > self.max_pixels:
+            fraction = self.max_pixels / (width * height)
+        rng = np.random.default_rng(self.random_state)
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        rows = max(1, tile_pixels // max(width, 1))
+        for top in range(0, height, rows):
+            strip = image.crop((0, top, width, min(height, top + rows)))
+            pixels = np.asarray(strip.convert("RGBA" if has_alpha else "RGB")).reshape(-1, 4 if has_alpha else 3)
+            keep = self.mask(pixels, thresholds)
+            if fraction < 1:
+                keep &= rng.random(len(keep)) < fraction
+            yield pixels[keep, :3]
+
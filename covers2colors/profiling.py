@@ -0,0 +1,122 @@
+"""Per-stage timing and counters for ``CoverPalette`` operations.
+
+A :class:`Tracer` records one event per traced stage (provider lookups,
+download, decode, every k-means fit, knee detection, color selection) with
+its duration and attributes such as pixel counts, ``k`` and inertia. Events
+can be exported as JSON or forwarded to a metrics system through ``hook``::
+
+    tracer = Tracer()
+    palette = CoverPalette("Nirvana", "Nevermind", tracer=tracer)
+    palette.generate_distinct_optimal_cmap()
+    print(tracer.to_json())
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+class Tracer:
+    """Collect timed events and counters.
+
+    Parameters
+    ----------
+    hook : callable, optional
+        Called with every finished event dictionary, e.g. to forward
+        durations to a metrics client.
+    """
+
+    def __init__(self, hook: Optional[Callable[[dict], None]] = None):
+        self.hook = hook
+        self.events = []
+        self.counters = {}
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time the enclosed block as event ``name``.
+
+        The yielded dictionary holds ``attrs`` and can be updated inside the
+        block to attach results such as inertia to the event.
+        """
+
+        stack = self._local.__dict__.setdefault("stack", [])
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            event = {
+                "name": name,
+                "parent": parent,
+                "start": start - self._origin,
+                "duration": duration,
+                "attrs": attrs,
+            }
+            with self._lock:
+                self.events.append(event)
+            if self.hook is not None:
+                self.hook(event)
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Add ``value`` to counter ``name``."""
+
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> dict:
+        """Return total duration and call count per event name."""
+
+        totals = {}
+        for event in self.events:
+            entry = totals.setdefault(event["name"], {"calls": 0, "duration": 0.0})
+            entry["calls"] += 1
+            entry["duration"] += event["duration"]
+        return totals
+
+    def to_dict(self) -> dict:
+        """Return all events, counters and the per-stage summary."""
+
+        return {
+            "events": list(self.events),
+            "counters": dict(self.counters),
+            "summary": self.summary(),
+        }
+
+    def to_json(self, path: Optional[str] = None, indent: int = 2) -> str:
+        """Return the trace as JSON and optionally write it to ``path``."""
+
+        text = json.dumps(self.to_dict(), indent=indent, default=_json_default)
+        if path:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+
+class NullTracer(Tracer):
+    """Tracer that records nothing. Used when profiling is disabled."""
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        yield attrs
+
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+def _json_default(value):
+    """Convert NumPy scalars and other objects for ``json.dumps``."""
+
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
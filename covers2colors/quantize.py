@@ -0,0 +1,152 @@
+"""Map images onto a palette through a cached 3D lookup table.
+
+:func:`palette_lut` assigns every cell of a ``2**bits`` per channel RGB grid
+to its nearest palette color once. Quantizing an image is then one integer
+index computation and one gather per pixel instead of a distance to every
+palette color. With the default 6 bits the table cells are the bins of
+:class:`covers2colors.streaming.ColorHistogram`, so :func:`histogram_coverage`
+reports coverage and error of a palette from a cover's histogram without
+touching its pixels again.
+"""
+
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+from .colorspace import to_space
+from .streaming import DEFAULT_BITS, DEFAULT_TILE_PIXELS, ColorHistogram
+
+LUT_BITS = DEFAULT_BITS
+
+
+def _palette_key(colors) -> tuple:
+    """Return 0-1 RGB ``colors`` as a hashable tuple of 8 bit triples."""
+
+    rgb = np.clip(np.round(np.asarray(colors, dtype=np.float64)[:, :3] * 255), 0, 255)
+    return tuple(map(tuple, rgb.astype(int).tolist()))
+
+
+@lru_cache(maxsize=32)
+def _cached_lut(key: tuple, bits: int, space: str) -> np.ndarray:
+    palette = np.array(key, dtype=np.float64) / 255
+    levels = 1 << bits
+    step = 256 / levels
+    centers = (np.arange(levels) * step + (step - 1) / 2) / 255
+    grid = np.stack(np.meshgrid(centers, centers, centers, indexing="ij"), axis=-1).reshape(-1, 3)
+    grid = to_space(grid, space)
+    palette = to_space(palette, space)
+    # Squared distances expanded as |g|^2 - 2 g.p + |p|^2, the |g|^2 term does not change the argmin
+    scores = grid @ palette.T * -2 + np.einsum("ij,ij->i", palette, palette)
+    lut = np.argmin(scores, axis=1).astype(np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+
+def palette_lut(colors, bits: int = LUT_BITS, space: str = "rgb") -> np.ndarray:
+    """Return the table mapping every RGB grid cell to the index of its nearest color.
+
+    Parameters
+    ----------
+    colors : array-like
+        Up to 256 palette colors as 0-1 RGB values.
+    bits : int, optional
+        Bits per channel of the grid. Defaults to 6 (64^3 cells).
+    space : str, optional
+        Color space distances are measured in, see :mod:`covers2colors.colorspace`.
+    """
+
+    key = _palette_key(colors)
+    if not 0 < len(key) <= 256:
+        raise ValueError("A palette needs between 1 and 256 colors")
+    return _cached_lut(key, bits, space)
+
+
+def lut_index(pixels: np.ndarray, bits: int = LUT_BITS) -> np.ndarray:
+    """Return the grid cell of every ``(n, 3)`` 0-255 RGB pixel."""
+
+    q = np.asarray(pixels)[:, :3] >> (8 - bits)
+    if q.dtype != np.uint8:
+        q = q.astype(np.uint32)
+    # Built in place in 32 bit integers, which is markedly faster than intp on large strips
+    idx = q[:, 0].astype(np.uint32)
+    idx <<= bits
+    idx |= q[:, 1]
+    idx <<= bits
+    idx |= q[:, 2]
+    return idx
+
+
+def quantize_pixels(pixels: np.ndarray, colors, bits: int = LUT_BITS, space: str = "rgb") -> np.ndarray:
+    """Return the palette index of every ``(n, 3)`` 0-255 RGB pixel."""
+
+    return palette_lut(colors, bits, space)[lut_index(pixels, bits)]
+
+
+def quantize_image(
+    image: Image.Image,
+    colors,
+    bits: int = LUT_BITS,
+    space: str = "rgb",
+    tile_pixels: int = DEFAULT_TILE_PIXELS,
+) -> Tuple[Image.Image, np.ndarray, float]:
+    """Recolor ``image`` with the nearest palette color of every pixel.
+
+    The image is processed in row strips of at most ``tile_pixels`` pixels.
+
+    Returns
+    -------
+    tuple
+        A ``"P"`` mode image using the palette, the fraction of pixels
+        assigned to each color and the mean squared RGB error per pixel.
+    """
+
+    lut = palette_lut(colors, bits, space)
+    key = _palette_key(colors)
+    palette = np.array(key, dtype=np.int16)
+    width, height = image.size
+    rows = max(1, tile_pixels // max(width, 1))
+    labels = np.empty((height, width), dtype=np.uint8)
+    counts = np.zeros(len(key), dtype=np.int64)
+    squared_error = 0
+    for top in range(0, height, rows):
+        strip = np.asarray(image.crop((0, top, width, min(height, top + rows))).convert("RGB"))
+        pixels = strip.reshape(-1, 3)
+        strip_labels = lut[lut_index(pixels, bits)]
+        labels[top : top + len(strip)] = strip_labels.reshape(strip.shape[:2])
+        counts += np.bincount(strip_labels, minlength=len(key))
+        diff = pixels.astype(np.int16)
+        diff -= palette[strip_labels]
+        squared_error += int(np.einsum("ij,ij->", diff, diff, dtype=np.int64))
+
+    quantized = Image.fromarray(labels, "P")
+    quantized.putpalette(np.asarray(key, dtype=np.uint8).ravel().tolist())
+    n_pixels = max(1, width * height)
+    return quantized, counts / n_pixels, squared_error / n_pixels
+
+
+def histogram_coverage(histogram: ColorHistogram, colors, space: str = "rgb") -> Tuple[np.ndarray, float]:
+    """Coverage and mean squared RGB error of ``colors`` for a histogram's pixels.
+
+    Every pixel of a histogram bin is assigned to the color the table picks
+    for that bin, which is what :func:`quantize_image` does, so the error is
+    exact up to that assignment and needs no per-pixel work.
+    """
+
+    lut = palette_lut(colors, histogram.bits, space)
+    palette = np.array(_palette_key(colors), dtype=np.float64)
+    bins = np.flatnonzero(histogram.counts)
+    counts = histogram.counts[bins].astype(np.float64)
+    sums = histogram.sums[bins]
+    labels = lut[bins]
+    assigned = palette[labels]
+    # sum |p - c|^2 over a bin = sum |p|^2 - 2 c . sum p + n |c|^2
+    squared_error = (
+        histogram.sq_norm
+        - 2 * float(np.einsum("ij,ij->", sums, assigned))
+        + float(counts @ np.einsum("ij,ij->i", assigned, assigned))
+    )
+    n_pixels = max(1.0, counts.sum())
+    coverage = np.bincount(labels, weights=counts, minlength=len(palette)) / n_pixels
+    return coverage, max(0.0, squared_error) / n_pixels
@@ -0,0 +1,156 @@
+"""Lightweight palette rendering with PIL and NumPy.
+
+These helpers produce swatches, cover-plus-colorbar composites and contact
+sheets without importing ``matplotlib.pyplot`` so they can be used headless on
+servers and in batch jobs. Images are returned as PIL images which can be
+turned into PNG bytes with :func:`to_png_bytes`. Swatches can also be written
+as SVG with :func:`swatch_svg`.
+"""
+
+import io
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+Color = Union[str, Sequence[float]]
+
+BACKGROUND = (255, 255, 255)
+TEXT_COLOR = (0, 0, 0)
+
+
+def _to_rgb_array(colors: Iterable[Color]) -> np.ndarray:
+    """Return ``colors`` (hexcodes or 0-1 RGB triples) as an ``(n, 3)`` uint8 array."""
+
+    rgb = []
+    for color in colors:
+        if isinstance(color, str):
+            hexcode = color.lstrip("#")
+            rgb.append([int(hexcode[i : i + 2], 16) for i in (0, 2, 4)])
+        else:
+            rgb.append([int(round(float(v) * 255)) for v in list(color)[:3]])
+    if not rgb:
+        return np.zeros((0, 3), dtype=np.uint8)
+    return np.clip(np.array(rgb), 0, 255).astype(np.uint8)
+
+
+def _to_hex(rgb: np.ndarray) -> List[str]:
+    return ["#{:02x}{:02x}{:02x}".format(*c) for c in rgb]
+
+
+def _blocks(n_colors: int, length: int) -> np.ndarray:
+    """Return the color index of each of ``length`` pixels split in equal blocks."""
+
+    if n_colors == 0:
+        return np.zeros(length, dtype=np.intp)
+    return np.arange(length) * n_colors // length
+
+
+def render_swatch(
+    colors: Iterable[Color],
+    size: Tuple[int, int] = (256, 32),
+    vertical: bool = False,
+) -> Image.Image:
+    """Return a swatch strip with ``colors`` drawn as equal sized blocks.
+
+    ``vertical`` stacks the colors from bottom to top like a matplotlib
+    colorbar instead of left to right.
+    """
+
+    width, height = size
+    rgb = _to_rgb_array(colors)
+    if len(rgb) == 0:
+        return Image.new("RGB", size, BACKGROUND)
+    if vertical:
+        idx = _blocks(len(rgb), height)[::-1]
+        arr = np.broadcast_to(rgb[idx][:, None, :], (height, width, 3))
+    else:
+        idx = _blocks(len(rgb), width)
+        arr = np.broadcast_to(rgb[idx][None, :, :], (height, width, 3))
+    return Image.fromarray(np.ascontiguousarray(arr), "RGB")
+
+
+def render_colorbar(
+    image: Image.Image,
+    colors: Iterable[Color],
+    height: Optional[int] = 400,
+    bar_ratio: float = 0.1,
+    pad: int = 6,
+) -> Image.Image:
+    """Return ``image`` with a vertical color bar of ``colors`` on its right.
+
+    The cover is resized to ``height`` pixels (keeping its aspect ratio)
+    unless ``height`` is ``None``.
+    """
+
+    cover = image.convert("RGB")
+    if height and cover.height != height:
+        width = max(1, round(cover.width * height / cover.height))
+        cover = cover.resize((width, height), Image.BILINEAR)
+    bar_width = max(1, round(cover.width * bar_ratio))
+    bar = render_swatch(colors, (bar_width, cover.height), vertical=True)
+
+    canvas = Image.new("RGB", (cover.width + pad + bar_width, cover.height), BACKGROUND)
+    canvas.paste(cover, (0, 0))
+    canvas.paste(bar, (cover.width + pad, 0))
+    return canvas
+
+
+def render_contact_sheet(
+    rows: Sequence[Tuple[Optional[Image.Image], Sequence[Color], str]],
+    row_height: int = 64,
+    swatch_width: int = 256,
+    text_width: int = 320,
+    pad: int = 8,
+) -> Image.Image:
+    """Return a sheet with one ``(thumbnail, colors, label)`` row per palette.
+
+    Rows without a thumbnail leave the cover cell empty. Labels may contain
+    newlines and are drawn with PIL's default bitmap font.
+    """
+
+    width = pad + row_height + pad + swatch_width + pad + text_width
+    height = pad + len(rows) * (row_height + pad)
+    sheet = Image.new("RGB", (width, max(height, pad)), BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+
+    for i, (thumbnail, colors, label) in enumerate(rows):
+        top = pad + i * (row_height + pad)
+        left = pad
+        if thumbnail is not None:
+            thumb = thumbnail.convert("RGB")
+            thumb.thumbnail((row_height, row_height))
+            sheet.paste(thumb, (left, top + (row_height - thumb.height) // 2))
+        left += row_height + pad
+        sheet.paste(render_swatch(colors, (swatch_width, row_height)), (left, top))
+        left += swatch_width + pad
+        draw.multiline_text((left, top + 4), label, fill=TEXT_COLOR)
+    return sheet
+
+
+def to_png_bytes(image: Image.Image) -> bytes:
+    """Return ``image`` encoded as PNG."""
+
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def swatch_svg(colors: Iterable[Color], size: Tuple[int, int] = (256, 32)) -> bytes:
+    """Return a swatch strip of ``colors`` as SVG bytes."""
+
+    width, height = size
+    hexcodes = _to_hex(_to_rgb_array(colors))
+    n = max(len(hexcodes), 1)
+    rects = []
+    for i, hexcode in enumerate(hexcodes):
+        left = i * width // n
+        right = (i + 1) * width // n
+        rects.append(
+            f'<rect x="{left}" y="0" width="{right - left}" height="{height}" fill="{hexcode}"/>'
+        )
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">' + "".join(rects) + "</svg>"
+    )
+    return svg.encode("utf-8")
@@ -0,0 +1,145 @@
+"""Record and replay provider lookups and cover downloads.
+
+A :class:`Cassette` stores the URL every provider returned for an
+``artist``/``album`` pair in ``lookups.json`` and the bytes of every
+downloaded cover under ``covers/``. In ``"record"`` mode live results are
+written to the cassette. In ``"replay"`` mode they are served from it without
+touching the network and anything missing raises :class:`CassetteMiss`::
+
+    with use_cassette("cassettes/nevermind", mode="record"):
+        CoverPalette("Nirvana", "Nevermind")
+
+    with use_cassette("cassettes/nevermind", mode="replay"):
+        CoverPalette("Nirvana", "Nevermind")  # fully offline
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+MODES = ("record", "replay")
+
+
+class CassetteMiss(LookupError):
+    """Raised when a replayed request was never recorded."""
+
+
+class Cassette:
+    """Directory of recorded provider lookups and cover bytes.
+
+    Parameters
+    ----------
+    directory : str or Path
+        Where the recordings are stored.
+    mode : str, optional
+        ``"record"`` or ``"replay"``. Defaults to ``"replay"``.
+    """
+
+    def __init__(self, directory: Union[str, Path], mode: str = "replay"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.directory = Path(directory)
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._lookups_file = self.directory / "lookups.json"
+        try:
+            with self._lookups_file.open("r") as f:
+                self._lookups = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            if mode == "replay":
+                raise FileNotFoundError(f"No recorded lookups in {self.directory}")
+            self._lookups = {}
+
+    @staticmethod
+    def _lookup_key(provider: str, artist_name: str, album_name: str) -> str:
+        return f"{provider}|{artist_name.lower()}|{album_name.lower()}"
+
+    def _cover_path(self, url: str) -> Path:
+        return self.directory / "covers" / hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def lookup(
+        self,
+        provider: str,
+        artist_name: str,
+        album_name: str,
+        func: Callable[[], Optional[str]],
+    ) -> Optional[str]:
+        """Return the cover URL ``provider`` found, recording or replaying it."""
+
+        key = self._lookup_key(provider, artist_name, album_name)
+        if self.mode == "replay":
+            if key not in self._lookups:
+                raise CassetteMiss(f"No recorded {provider} lookup for {artist_name} - {album_name}")
+            return self._lookups[key]
+
+        url = func()
+        with self._lock:
+            self._lookups[key] = url
+            data = json.dumps(self._lookups, indent=2, sort_keys=True).encode("utf-8")
+            self._write_atomic(self._lookups_file, data)
+        return url
+
+    def fetch(self, url: str, func: Callable[[], bytes]) -> bytes:
+        """Return the bytes at ``url``, recording or replaying them."""
+
+        path = self._cover_path(url)
+        if self.mode == "replay":
+            try:
+                return path.read_bytes()
+            except OSError as e:
+                raise CassetteMiss(f"No recorded download for {url}") from e
+
+        data = func()
+        self._write_atomic(path, data)
+        return data
+
+
+_active = None
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Return the active cassette.
+
+    When none was set with :func:`use_cassette` the ``COVERS2COLORS_CASSETTE``
+    and ``COVERS2COLORS_CASSETTE_MODE`` environment variables are used.
+    """
+
+    global _active
+    if _active is None and os.environ.get("COVERS2COLORS_CASSETTE"):
+        _active = Cassette(
+            os.environ["COVERS2COLORS_CASSETTE"],
+            os.environ.get("COVERS2COLORS_CASSETTE_MODE", "replay"),
+        )
+    return _active
+
+
+def set_cassette(cassette: Optional[Cassette]) -> None:
+    """Make ``cassette`` active for all later lookups and downloads."""
+
+    global _active
+    _active = cassette
+
+
+@contextmanager
+def use_cassette(directory: Union[str, Path], mode: str = "replay"):
+    """Record or replay provider traffic inside the ``with`` block."""
+
+    previous = _active
+    cassette = Cassette(directory, mode)
+    set_cassette(cassette)
+    try:
+        yield cassette
+    finally:
+        set_cassette(previous)
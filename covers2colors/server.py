@@ -0,0 +1,349 @@
+"""Long-running palette service with a local HTTP/JSON API.
+
+``coverpalette serve`` keeps API keys, provider clients, decoded covers and
+the result cache warm in one process. Generation requests run on a bounded
+worker pool, identical requests that are already in flight share one result
+and requests beyond ``max_pending`` are rejected with ``503`` so clients can
+back off.
+
+Endpoints:
+
+* ``POST /generate`` - generate a palette, JSON body with ``artist``,
+  ``album`` and optional ``n_colors``, ``max_colors``, ``random_state``,
+  ``hue``, ``light``, ``dark``, ``bold``, ``search``, ``space``, ``colorblind`` and
+  ``save``
+* ``GET /palettes`` - list saved palettes (``page``, ``per_page`` and
+  ``n_colors`` query parameters)
+* ``GET /palettes/<id>`` - a single saved palette
+* ``DELETE /palettes/<id>`` - delete a saved palette
+* ``GET /palettes/<id>/swatch.png`` or ``swatch.svg`` - render a swatch
+* ``GET /sheet.png`` - contact sheet of all saved palettes
+* ``GET /health`` - worker pool status
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from .album_art import load_api_keys
+from .cache import ResultCache
+from .colorspace import SPACES
+from .convert import SWATCH_SIZE, CoverPalette, _load_index
+from .render import render_swatch, swatch_svg, to_png_bytes
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+GENERATE_DEFAULTS = {
+    "n_colors": 4,
+    "max_colors": 10,
+    "random_state": None,
+    "hue": False,
+    "light": False,
+    "dark": False,
+    "bold": False,
+    "search": "full",
+    "space": "rgb",
+    "colorblind": False,
+    "save": False,
+}
+
+
+SEARCH_MODES = ("full", "adaptive")
+
+
+def validate_params(params) -> dict:
+    """Return ``params`` merged with ``GENERATE_DEFAULTS`` or raise ``ValueError``.
+
+    Requests are checked before they are queued so malformed ones are
+    answered with ``400`` instead of failing inside a worker.
+    """
+
+    if not isinstance(params, dict):
+        raise ValueError("Request body must be a JSON object")
+    unknown = set(params) - set(GENERATE_DEFAULTS) - {"artist", "album"}
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+    params = dict(GENERATE_DEFAULTS, **params)
+    for name in ("artist", "album"):
+        if not isinstance(params.get(name), str) or not params[name].strip():
+            raise ValueError("artist and album are required")
+    for name, minimum in (("n_colors", 1), ("max_colors", 2)):
+        value = params[name]
+        if not isinstance(value, int) or isinstance(value, bool) or value < minimum:
+            raise ValueError(f"{name} must be an integer of at least {minimum}")
+    random_state = params["random_state"]
+    if random_state is not None and (not isinstance(random_state, int) or isinstance(random_state, bool)):
+        raise ValueError("random_state must be an integer or null")
+    for name in ("hue", "light", "dark", "bold", "colorblind", "save"):
+        if not isinstance(params[name], bool):
+            raise ValueError(f"{name} must be true or false")
+    if params["search"] not in SEARCH_MODES:
+        raise ValueError(f"search must be one of {', '.join(SEARCH_MODES)}")
+    if params["space"] not in SPACES:
+        raise ValueError(f"space must be one of {', '.join(SPACES)}")
+    return params
+
+
+class ServiceBusy(Exception):
+    """Raised when the worker pool queue is full."""
+
+
+class PaletteService:
+    """Warm state and worker pool shared by all HTTP requests.
+
+    Parameters
+    ----------
+    workers : int, optional
+        Number of threads running palette generation. Defaults to 2.
+    max_pending : int, optional
+        Maximum number of queued or running generation jobs. Defaults to 16.
+    cache : ResultCache, optional
+        Result cache shared by every job. Defaults to ``ResultCache()``.
+    max_covers : int, optional
+        Number of decoded covers kept in memory. Defaults to 32.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_pending: int = 16,
+        cache: Optional[ResultCache] = None,
+        max_covers: int = 32,
+    ):
+        load_api_keys()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="palette")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cache = cache if cache is not None else ResultCache()
+        self.max_covers = max_covers
+        self._covers = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        # save/delete rewrite index.json so they must not interleave
+        self.index_lock = threading.Lock()
+
+    def _palette(self, artist: str, album: str):
+        """Return a warm ``(CoverPalette, lock)`` for ``artist`` and ``album``."""
+
+        key = (artist.lower(), album.lower())
+        with self._lock:
+            if key in self._covers:
+                self._covers.move_to_end(key)
+                return self._covers[key]
+        entry = (CoverPalette(artist, album, cache=self.cache), threading.Lock())
+        with self._lock:
+            entry = self._covers.setdefault(key, entry)
+            self._covers.move_to_end(key)
+            while len(self._covers) > self.max_covers:
+                self._covers.popitem(last=False)
+        return entry
+
+    def _generate(self, params: dict) -> dict:
+        palette, lock = self._palette(params["artist"], params["album"])
+        with lock:
+            method = (
+                palette.generate_hue_distinct_optimal_cmap
+                if params["hue"]
+                else palette.generate_distinct_optimal_cmap
+            )
+            method(
+                n_distinct_colors=params["n_colors"],
+                max_colors=params["max_colors"],
+                random_state=params["random_state"],
+                light=params["light"],
+                dark=params["dark"],
+                bold=params["bold"],
+                search=params["search"],
+                space=params["space"],
+                colorblind=params["colorblind"],
+            )
+            result = {
+                "artist": palette.artist,
+                "album": palette.album,
+                "image_url": palette.image_path,
+                "hexcodes": palette.hexcodes,
+                "colorblind_friendly": palette.is_colorblind_friendly,
+                "fitted_k": palette.fitted_k,
+            }
+            if params["save"]:
+                with self.index_lock:
+                    result["id"] = palette.save_palette(store_previews=True)
+        return result
+
+    def submit(self, params: dict):
+        """Queue a generation job and return its future.
+
+        Identical requests share the future of the job already in flight.
+        Raises ``ValueError`` for invalid ``params`` (see :func:`validate_params`)
+        and :class:`ServiceBusy` when ``max_pending`` jobs are queued.
+        """
+
+        params = validate_params(params)
+        key = json.dumps(params, sort_keys=True)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            if len(self._inflight) >= self.max_pending:
+                raise ServiceBusy(f"{len(self._inflight)} jobs pending")
+            future = self.executor.submit(self._generate, params)
+            self._inflight[key] = future
+
+        def done(_):
+            with self._lock:
+                self._inflight.pop(key, None)
+
+        future.add_done_callback(done)
+        return future
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": len(self._inflight),
+                "max_pending": self.max_pending,
+                "warm_covers": len(self._covers),
+            }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False)
+
+
+class PaletteRequestHandler(BaseHTTPRequestHandler):
+    """Route HTTP requests to the server's :class:`PaletteService`."""
+
+    server_version = "coverpalette"
+
+    @property
+    def service(self) -> PaletteService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, data, headers: Optional[dict] = None):
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+    def _entry(self, palette_id: int) -> Optional[dict]:
+        for entry in _load_index(assign_ids=True):
+            if entry.get("id") == palette_id:
+                return entry
+        return None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split("/") if p]
+        try:
+            if parts == ["health"]:
+                return self._json(200, self.service.status())
+            if parts == ["palettes"]:
+                page = int(query.get("page", 1))
+                per_page = int(query.get("per_page", 10))
+                if "n_colors" in query:
+                    entries = CoverPalette.find_palettes_by_color_count(
+                        int(query["n_colors"]), page=page, per_page=per_page
+                    )
+                else:
+                    entries = CoverPalette.list_palettes(page=page, per_page=per_page)
+                return self._json(200, entries)
+            if parts == ["sheet.png"]:
+                entries = CoverPalette.list_palettes(page=1, per_page=int(query.get("limit", 100)))
+                return self._send(200, CoverPalette.render_contact_sheet(entries), "image/png")
+            if len(parts) >= 2 and parts[0] == "palettes":
+                entry = self._entry(int(parts[1]))
+                if entry is None:
+                    return self._json(404, {"error": f"Palette {parts[1]} not found"})
+                if len(parts) == 2:
+                    return self._json(200, entry)
+                hexcodes = entry.get("hexcodes") or []
+                if parts[2:] == ["swatch.png"]:
+                    body = to_png_bytes(render_swatch(hexcodes, SWATCH_SIZE))
+                    return self._send(200, body, "image/png")
+                if parts[2:] == ["swatch.svg"]:
+                    return self._send(200, swatch_svg(hexcodes, SWATCH_SIZE), "image/svg+xml")
+        except ValueError as e:
+            return self._json(400, {"error": str(e)})
+        return self._json(404, {"error": f"Unknown path {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/generate":
+            return self._json(404, {"error": f"Unknown path {url.path}"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            params = json.loads(self.rfile.read(length) or b"{}")
+            future = self.service.submit(params)
+        except ServiceBusy as e:
+            return self._json(503, {"error": str(e)}, {"Retry-After": "1"})
+        except (ValueError, TypeError) as e:
+            return self._json(400, {"error": str(e)})
+        try:
+            result = future.result(timeout=self.server.timeout_seconds)
+        except FutureTimeoutError:
+            return self._json(504, {"error": "Palette generation timed out"})
+        except Exception as e:
+            return self._json(500, {"error": str(e)})
+        return self._json(200, result)
+
+    def do_DELETE(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if len(parts) != 2 or parts[0] != "palettes":
+            return self._json(404, {"error": f"Unknown path {self.path}"})
+        try:
+            palette_id = int(parts[1])
+        except ValueError as e:
+            return self._json(400, {"error": str(e)})
+        with self.service.index_lock:
+            deleted = CoverPalette.delete_palette(palette_id)
+        if not deleted:
+            return self._json(404, {"error": f"Palette {palette_id} not found"})
+        return self._json(200, {"deleted": palette_id})
+
+
+def make_server(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    service: Optional[PaletteService] = None,
+    timeout: float = 300,
+    verbose: bool = False,
+) -> ThreadingHTTPServer:
+    """Return an HTTP server bound to ``host``:``port`` serving ``service``."""
+
+    server = ThreadingHTTPServer((host, port), PaletteRequestHandler)
+    server.daemon_threads = True
+    server.service = service or PaletteService()
+    server.timeout_seconds = timeout
+    server.verbose = verbose
+    return server
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, **kwargs) -> None:
+    """Run the palette service until interrupted."""
+
+    server = make_server(host, port, **kwargs)
+    print(f"Serving palettes on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.service.shutdown()
+        server.server_close()
+
@@ -0,0 +1,116 @@
+"""Bounded-memory color statistics for very large covers.
+
+:func:`image_histogram` walks an image in horizontal strips of at most
+``tile_pixels`` pixels and accumulates a :class:`ColorHistogram`: the pixel
+count, per-channel sum and total squared norm of every bin of a
+``2**bits`` per channel grid. Clustering the bin means weighted by their
+counts reproduces the full-resolution k-means result within tolerance, and
+the exact within-bin sum of squares is added back to the inertia so SSD
+curves stay comparable with the in-memory path. Working memory is the fixed
+size of the histogram plus one strip, regardless of image dimensions.
+"""
+
+from typing import Iterator, Optional
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_TILE_PIXELS = 1 << 20
+DEFAULT_BITS = 6
+
+
+class ColorHistogram:
+    """Running color histogram with per-bin means.
+
+    Parameters
+    ----------
+    bits : int, optional
+        Bits per channel used to bin colors. Defaults to 6 (262144 bins).
+    """
+
+    def __init__(self, bits: int = DEFAULT_BITS):
+        self.bits = bits
+        n_bins = 1 << (3 * bits)
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.sums = np.zeros((n_bins, 3), dtype=np.float64)
+        self.sq_norm = 0.0
+
+    def add(self, pixels: np.ndarray) -> None:
+        """Accumulate an ``(n, 3)`` uint8 array of RGB pixels."""
+
+        if len(pixels) == 0:
+            return
+        shift = 8 - self.bits
+        q = (pixels >> shift).astype(np.intp)
+        idx = (q[:, 0] << (2 * self.bits)) | (q[:, 1] << self.bits) | q[:, 2]
+        n_bins = len(self.counts)
+        self.counts += np.bincount(idx, minlength=n_bins)
+        values = pixels.astype(np.float64)
+        for channel in range(3):
+            self.sums[:, channel] += np.bincount(idx, weights=values[:, channel], minlength=n_bins)
+        self.sq_norm += float(np.einsum("ij,ij->", values, values))
+
+    def merge(self, other: "ColorHistogram", sign: int = 1) -> None:
+        """Add (or with ``sign=-1`` remove) the contents of ``other``."""
+
+        if other.bits != self.bits:
+            raise ValueError("Cannot merge histograms with different bit depths")
+        self.counts += sign * other.counts
+        self.sums += sign * other.sums
+        self.sq_norm += sign * other.sq_norm
+
+    @property
+    def n_pixels(self) -> int:
+        return int(self.counts.sum())
+
+    def weighted_means(self):
+        """Return ``(means, counts)`` of the non-empty bins."""
+
+        occupied = self.counts > 0
+        counts = self.counts[occupied]
+        return self.sums[occupied] / counts[:, None], counts
+
+    @property
+    def within_ss(self) -> float:
+        """Sum of squared distances from every pixel to its bin mean."""
+
+        occupied = self.counts > 0
+        sums = self.sums[occupied]
+        between = np.einsum("ij,ij->i", sums, sums) / self.counts[occupied]
+        return max(0.0, self.sq_norm - float(between.sum()))
+
+
+def iter_strips(
+    image: Image.Image,
+    tile_pixels: int = DEFAULT_TILE_PIXELS,
+    drop_transparent: bool = False,
+) -> Iterator[np.ndarray]:
+    """Yield ``(n, 3)`` uint8 RGB arrays covering ``image`` strip by strip."""
+
+    width, height = image.size
+    rows = max(1, tile_pixels // max(width, 1))
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    for top in range(0, height, rows):
+        strip = image.crop((0, top, width, min(height, top + rows)))
+        if has_alpha:
+            arr = np.asarray(strip.convert("RGBA")).reshape(-1, 4)
+            if drop_transparent:
+                arr = arr[arr[:, 3] != 0]
+            yield arr[:, :3]
+        else:
+            yield np.asarray(strip.convert("RGB")).reshape(-1, 3)
+
+
+def image_histogram(
+    image: Image.Image,
+    tile_pixels: int = DEFAULT_TILE_PIXELS,
+    bits: int = DEFAULT_BITS,
+    drop_transparent: bool = False,
+    histogram: Optional[ColorHistogram] = None,
+) -> ColorHistogram:
+    """Return the :class:`ColorHistogram` of ``image`` built strip by strip."""
+
+    histogram = histogram or ColorHistogram(bits)
+    for pixels in iter_strips(image, tile_pixels, drop_transparent):
+        histogram.add(pixels)
+    return histogram
@@ -0,0 +1,146 @@
+"""Offline tests of the local MusicBrainz index and its place in the provider order."""
+
+from pathlib import Path
+
+import pytest
+
+from covers2colors import album_art, mb_index
+from covers2colors.mb_index import LocalMusicBrainzIndex, build_mb_index, load_mb_index
+
+FIXTURE_DUMP = Path(__file__).parent / "fixtures" / "musicbrainz_dump.jsonl"
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return build_mb_index(FIXTURE_DUMP, tmp_path / "musicbrainz.sqlite")
+
+
+@pytest.fixture
+def index(index_path):
+    index = LocalMusicBrainzIndex(index_path)
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Replace the network providers with stubs and record which ones are called."""
+
+    calls = []
+
+    def musicbrainz(artist_name, album_name):
+        calls.append("musicbrainz")
+        return "https://musicbrainz.example/cover.jpg"
+
+    def fail(*args, **kwargs):
+        raise AssertionError("unexpected network access")
+
+    monkeypatch.setattr(album_art, "load_api_keys", lambda: (None, None))
+    monkeypatch.setattr(album_art, "get_mb_cover_art_url", musicbrainz)
+    monkeypatch.setattr(album_art, "get_lastfm_cover_art_url", fail)
+    monkeypatch.setattr(album_art, "get_discogs_cover_art_url", fail)
+    monkeypatch.setattr(album_art.requests, "get", fail)
+    return calls
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_build_keeps_groups_with_possible_artwork(index):
+    # rg-blue and rg-noart only have releases without front artwork
+    assert len(index) == 4
+
+
+def test_release_with_front_artwork_is_preferred(index):
+    match = index.find("Nirvana", "Nevermind")
+    assert match["release_group"] == "rg-nevermind"
+    assert match["release"] == "rel-nevermind"
+    assert match["front"] is True
+    assert match["ratio"] == 100
+
+
+def test_release_lines_are_grouped(index):
+    match = index.find("Radiohead", "OK Computer")
+    assert match["release_group"] == "rg-okc"
+    assert match["release"] == "rel-okc"
+    assert match["front"] is True
+
+
+def test_unknown_front_artwork_status(index):
+    match = index.find("Iron Maiden", "Powerslave")
+    assert match["release"] == "rel-powerslave"
+    assert match["front"] is None
+
+
+def test_exact_match_ignores_case_and_spacing(index):
+    match = index.find("  PINK floyd", "The   Wall ")
+    assert match["release_group"] == "rg-the-wall"
+    assert match["ratio"] == 100
+
+
+def test_typo_match(index):
+    match = index.find("Nirvana", "Nevermnd")
+    assert match["release_group"] == "rg-nevermind"
+    assert 80 <= match["ratio"] < 100
+
+
+@pytest.mark.parametrize(
+    "artist, album",
+    [("Joni Mitchell", "Blue"), ("Nobody", "No Artwork Anywhere"), ("Metallica", "Master of Puppets")],
+)
+def test_miss(index, artist, album):
+    assert index.find(artist, album) is None
+
+
+def test_load_mb_index_from_environment(index_path, monkeypatch):
+    monkeypatch.setattr(mb_index, "_default_index", None)
+    monkeypatch.setenv("COVERS2COLORS_MB_INDEX", str(index_path))
+    loaded = load_mb_index()
+    assert loaded is not None
+    assert loaded.find("Nirvana", "Nevermind")["release"] == "rel-nevermind"
+    monkeypatch.setenv("COVERS2COLORS_MB_INDEX", str(index_path.with_name("missing.sqlite")))
+    assert load_mb_index() is None
+
+
+def test_local_index_answers_before_musicbrainz(index, providers):
+    url = album_art.get_best_cover_art_url("Nirvana", "Nevermind", mb_index=index)
+    assert url == album_art.COVER_ART_URL_TEMPLATE.format("rel-nevermind")
+    assert providers == []
+
+
+def test_local_miss_falls_back_to_musicbrainz(index, providers):
+    url = album_art.get_best_cover_art_url("Metallica", "Master of Puppets", mb_index=index)
+    assert url == "https://musicbrainz.example/cover.jpg"
+    assert providers == ["musicbrainz"]
+
+
+def test_index_from_environment_is_used(index_path, providers, monkeypatch):
+    monkeypatch.setattr(mb_index, "_default_index", None)
+    monkeypatch.setenv("COVERS2COLORS_MB_INDEX", str(index_path))
+    url = album_art.get_best_cover_art_url("Radiohead", "OK Computer")
+    assert url == album_art.COVER_ART_URL_TEMPLATE.format("rel-okc")
+    assert providers == []
+
+
+@pytest.mark.parametrize("status, expected_calls", [(200, []), (404, ["musicbrainz"])])
+def test_unknown_artwork_is_checked(index, providers, monkeypatch, status, expected_calls):
+    checked = []
+
+    def get(url, stream=False):
+        checked.append(url)
+        return _Response(status)
+
+    monkeypatch.setattr(album_art.requests, "get", get)
+    url = album_art.get_best_cover_art_url("Iron Maiden", "Powerslave", mb_index=index)
+    local_url = album_art.COVER_ART_URL_TEMPLATE.format("rel-powerslave")
+    assert checked == [local_url]
+    assert url == (local_url if status == 200 else "https://musicbrainz.example/cover.jpg")
+    assert providers == expected_calls